@@ -0,0 +1,191 @@
+# Admission control for the API blueprint
+# Under overload it's cheaper to turn excess requests away at the door than to
+# let every request queue behind the SQLite writer lock until clients time out.
+# 1. Separate concurrency limits for reads and writes
+# 2. A bounded wait queue; queued requests give up after a deadline
+# 3. Per-client token buckets for rate limiting
+# 4. Rejections are fast 429 (rate limited) or 503 (busy) with Retry-After
+
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, g, jsonify, request
+
+from batch import is_subrequest
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# POST only to carry a long list of ids; they read and take read slots
+READ_ENDPOINTS = {'api.lookup_orders', 'api.lookup_details_for_orders'}
+
+# Left out of admission so the API can still be observed while it sheds load
+EXEMPT_ENDPOINTS = {'api.get_metrics'}
+
+
+class TokenBuckets:
+    """Per-client token buckets, keeping the most recently seen clients"""
+
+    def __init__(self, rate, burst, max_clients=10000):
+        if burst < 1:
+            raise ValueError('ADMISSION_BURST must be at least 1, or no request is ever allowed')
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()  # client -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def take(self, client):
+        """Take a token for ``client``; returns 0 if allowed, else seconds until a token is available"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[client] = (tokens, now)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return 0 if allowed else (1 - tokens) / self.rate
+
+
+class Admission:
+    """
+    Concurrency slots, wait queue and rate limits for one app
+    ---
+    Config:
+        ADMISSION_ENABLED: Turn admission control on or off (default: True)
+        ADMISSION_MAX_READS: Read requests handled at once (default: 64)
+        ADMISSION_MAX_WRITES: Write requests handled at once (default: 16)
+        ADMISSION_QUEUE_SIZE: Requests allowed to wait for a slot (default: 128)
+        ADMISSION_QUEUE_TIMEOUT: Seconds a request waits for a slot (default: 1.0)
+        ADMISSION_RATE: Requests per second per client, or None for no limit (default: None)
+        ADMISSION_BURST: Requests a client may make at once, at least 1 (default: 2 * ADMISSION_RATE, at least 1)
+        ADMISSION_TRUST_PROXY: Identify clients by X-Forwarded-For (default: False)
+    """
+
+    def __init__(self, app):
+        config = app.config
+        self.slots = {
+            'read': threading.BoundedSemaphore(config.get('ADMISSION_MAX_READS', 64)),
+            'write': threading.BoundedSemaphore(config.get('ADMISSION_MAX_WRITES', 16)),
+        }
+        self.queue_size = config.get('ADMISSION_QUEUE_SIZE', 128)
+        self.queue_timeout = config.get('ADMISSION_QUEUE_TIMEOUT', 1.0)
+        rate = config.get('ADMISSION_RATE')
+        self.buckets = TokenBuckets(rate, config.get('ADMISSION_BURST', max(1, 2 * rate))) if rate else None
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.in_flight = {'read': 0, 'write': 0}
+        self.admitted = 0
+        self.queued = 0
+        self.rate_limited = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def take_token(self, client):
+        """Rate limit ``client``; returns 0 if allowed, else seconds until it may retry"""
+        if self.buckets is None:
+            return 0
+        wait = self.buckets.take(client)
+        if wait:
+            with self._lock:
+                self.rate_limited += 1
+        return wait
+
+    def acquire(self, kind):
+        """Take a slot for ``kind``, waiting in the queue if needed; returns whether one was taken"""
+        slot = self.slots[kind]
+        if not slot.acquire(blocking=False):
+            with self._lock:
+                if self.waiting >= self.queue_size:
+                    self.rejected += 1
+                    return False
+                self.waiting += 1
+                self.queued += 1
+            try:
+                acquired = slot.acquire(timeout=self.queue_timeout)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+            if not acquired:
+                with self._lock:
+                    self.timed_out += 1
+                return False
+        with self._lock:
+            self.admitted += 1
+            self.in_flight[kind] += 1
+        return True
+
+    def release(self, kind):
+        with self._lock:
+            self.in_flight[kind] -= 1
+        self.slots[kind].release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'admitted': self.admitted,
+                'queued': self.queued,
+                'rate_limited': self.rate_limited,
+                'rejected': self.rejected,
+                'timed_out': self.timed_out,
+                'waiting': self.waiting,
+                'in_flight_reads': self.in_flight['read'],
+                'in_flight_writes': self.in_flight['write'],
+            }
+
+
+def get_admission(app=None):
+    """The app's admission state, created on first use"""
+    app = app or current_app
+    admission = app.extensions.get('admission')
+    if admission is None:
+        admission = app.extensions.setdefault('admission', Admission(app))
+    return admission
+
+
+def _client():
+    if current_app.config.get('ADMISSION_TRUST_PROXY', False):
+        forwarded = request.headers.get('X-Forwarded-For', '')
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+    return request.remote_addr
+
+
+def _reject(status, message, retry_after):
+    response = jsonify({'status': 'error', 'message': message})
+    response.status_code = status
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def admit():
+    """Before-request hook: rate limit the client, then take a read or write slot"""
+    if not current_app.config.get('ADMISSION_ENABLED', True) or request.endpoint in EXEMPT_ENDPOINTS:
+        return None
+    admission = get_admission()
+
+    # Each request of a batch counts against the rate limit
+    wait = admission.take_token(_client())
+    if wait:
+        return _reject(429, 'Too many requests', wait)
+    if is_subrequest():
+        return None  # but runs in the batch's slot
+
+    kind = 'read' if request.method in READ_METHODS or request.endpoint in READ_ENDPOINTS else 'write'
+    if not admission.acquire(kind):
+        return _reject(503, 'Server busy, please retry', 1)
+    g.admission_slot = kind
+    return None
+
+
+def release(exc=None):
+    """Teardown hook: give back the slot taken by admit()"""
+    if is_subrequest():
+        return  # the slot is the batch's
+    kind = g.pop('admission_slot', None)
+    if kind is not None:
+        get_admission().release(kind)
@@ -0,0 +1,217 @@
+# Batch requests for the API blueprint
+# A client on a high-latency link can send many API calls in one POST /api/batch.
+# Each sub-request is dispatched in-process through the blueprint's own views, in
+# a request context nested in the batch's, so it gets exactly the validation,
+# caching, conditional headers and errors of the same call over HTTP.
+# 1. Sub-requests run in order and each gets its status, headers and body back
+# 2. The batch is admitted and time-budgeted once; its sub-requests share that
+#    slot and budget instead of taking their own, but each takes a rate-limit token
+# 3. With "atomic": true they share one transaction: the views' commits only
+#    release savepoints, and the first failing sub-request rolls back them all
+
+from flask import current_app, g, request
+from werkzeug.test import EnvironBuilder
+
+from models import db, OUTER_TRANSACTION
+from cache import response_cache
+from entity_cache import evict_committed
+from outbox import get_change_feed
+
+# Set in a sub-request's WSGI environ
+SUBREQUEST = 'orders.batch_subrequest'
+
+METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+
+# Views that can't run inside a batch: the batch itself and the long-lived streams
+EXCLUDED_VIEWS = {'batch_requests', 'stream_events', 'get_changes'}
+
+# Left to the batch's own request
+DROPPED_HEADERS = {'content-length', 'content-type', 'accept-encoding', 'x-request-timeout'}
+
+
+def is_subrequest():
+    """Whether the current request is a sub-request of a batch"""
+    return bool(request.environ.get(SUBREQUEST))
+
+
+class _ConnectionSession(db.session.session_factory.class_):
+    """A session that runs every statement on the connection it was given"""
+
+    def get_bind(self, *args, **kwargs):
+        # Flask-SQLAlchemy's get_bind picks the engine and ignores bind=
+        return self.bind
+
+
+def parse_batch(data, limit):
+    """
+    Validate a batch body
+    ---
+    Parameters:
+        data: A list of sub-requests, or an object with "requests" and optional "atomic"
+        limit: Most sub-requests accepted
+    Returns:
+        (sub-requests, atomic); raises ValueError with a message for the client
+    """
+    if isinstance(data, list):
+        data = {'requests': data}
+    if not isinstance(data, dict) or not isinstance(data.get('requests'), list) or not data['requests']:
+        raise ValueError('Provide a non-empty list of requests')
+    if len(data['requests']) > limit:
+        raise ValueError(f'At most {limit} requests per batch')
+    atomic = data.get('atomic', False)
+    if not isinstance(atomic, bool):
+        raise ValueError('atomic must be true or false')
+
+    subrequests = []
+    for index, item in enumerate(data['requests']):
+        if not isinstance(item, dict):
+            raise ValueError(f'Request {index} must be an object')
+        method = item.get('method', 'GET')
+        path = item.get('path')
+        headers = item.get('headers') or {}
+        if not isinstance(method, str) or method.upper() not in METHODS:
+            raise ValueError(f'Request {index}: method must be one of {", ".join(METHODS)}')
+        if not isinstance(path, str) or not path.startswith('/'):
+            raise ValueError(f'Request {index}: path must start with /')
+        if not isinstance(headers, dict):
+            raise ValueError(f'Request {index}: headers must be an object')
+        headers = {str(name): str(value) for name, value in headers.items()
+                   if str(name).lower() not in DROPPED_HEADERS}
+        if atomic and any(name.lower() == 'idempotency-key' for name in headers):
+            raise ValueError(f'Request {index}: send the Idempotency-Key on the atomic batch, not its requests')
+        subrequests.append({'method': method.upper(), 'path': path, 'headers': headers,
+                            'body': item.get('body')})
+    return subrequests, atomic
+
+
+def _error(status, message):
+    return {'status': status, 'headers': {}, 'body': {'status': 'error', 'message': message}}
+
+
+def _describe(response):
+    if response.is_json:
+        body = response.get_json(silent=True)
+    else:
+        body = response.get_data(as_text=True) or None
+    headers = {name: value for name, value in response.headers.items()
+               if name not in ('Content-Length', 'Content-Type')}
+    return {'status': response.status_code, 'headers': headers, 'body': body}
+
+
+def _dispatch(app, subrequest, blueprint, prefix):
+    base_url = request.host_url + request.script_root.lstrip('/')
+    builder = EnvironBuilder(path=prefix + subrequest['path'], method=subrequest['method'], base_url=base_url,
+                             headers=subrequest['headers'], json=subrequest['body'],
+                             environ_base={'REMOTE_ADDR': request.remote_addr, SUBREQUEST: True})
+    try:
+        environ = builder.get_environ()
+    finally:
+        builder.close()
+
+    with app.request_context(environ):
+        if request.routing_exception is None:
+            if request.blueprint != blueprint:
+                return _error(404, 'Not found')
+            if request.endpoint.split('.')[-1] in EXCLUDED_VIEWS:
+                return _error(400, f'{request.path} is not available in a batch')
+        try:
+            response = app.full_dispatch_request()
+        except Exception:
+            app.logger.exception('Batch request %s %s failed', subrequest['method'], subrequest['path'])
+            return _error(500, 'Internal server error')
+        return _describe(response)
+
+
+_OUT_OF_TIME = 'Not run: the batch ran out of its time budget'
+
+
+def _out_of_time(budget):
+    return budget is not None and (budget.expired or budget.remaining() <= 0)
+
+
+def _not_run(subrequests, responses, status, message):
+    return responses + [_error(status, message) for _ in subrequests[len(responses):]]
+
+
+def _run_atomic(app, subrequests, blueprint, prefix, budget):
+    connection = db.engine.connect()
+    # pysqlite only opens a transaction before DML; open it now so the views'
+    # savepoints nest inside it instead of committing when released. A batch
+    # that writes takes the write lock up front: upgrading a read transaction
+    # fails with SQLITE_BUSY if another writer got in first.
+    writes = any(subrequest['method'] != 'GET' for subrequest in subrequests)
+    connection.exec_driver_sql('BEGIN IMMEDIATE' if writes else 'BEGIN')
+    db.session.remove()
+    session = _ConnectionSession(**dict(db.session.session_factory.kw, bind=connection),
+                                 join_transaction_mode='create_savepoint')
+    session.info[OUTER_TRANSACTION] = True
+    db.session.registry.set(session)
+    g.held_invalidations = set()
+
+    responses = []
+    committed = False
+    try:
+        for subrequest in subrequests:
+            if _out_of_time(budget):
+                break
+            responses.append(_dispatch(app, subrequest, blueprint, prefix))
+            if responses[-1]['status'] >= 400:
+                break
+        if len(responses) == len(subrequests) and responses[-1]['status'] < 400:
+            connection.commit()
+            committed = True
+    finally:
+        if not committed:
+            connection.rollback()
+        tags = g.pop('held_invalidations')
+        del session.info[OUTER_TRANSACTION]
+        if committed:
+            evict_committed(session)
+            response_cache.invalidate(*tags)
+            if session.info.pop('outbox_written', False):
+                get_change_feed().notify()
+        db.session.remove()
+        connection.close()
+
+    if responses and responses[-1]['status'] >= 400:
+        return _not_run(subrequests, responses, 424, 'Not run: an earlier request of the atomic batch failed'), False
+    return _not_run(subrequests, responses, 504, _OUT_OF_TIME), committed
+
+
+def run_batch(subrequests, atomic, blueprint, budget=None):
+    """
+    Run a batch's sub-requests in order
+    ---
+    Parameters:
+        subrequests: Validated sub-requests from parse_batch()
+        atomic: Run them in one transaction, committed only if every one succeeds
+        blueprint: Name of the blueprint whose views sub-requests may reach
+        budget (optional): The batch's deadlines.Budget, shared by its sub-requests
+    Returns:
+        (list of {status, headers, body}, whether the writes were committed)
+    Notes:
+        Without atomic, each sub-request commits on its own like a separate
+        call and a failure doesn't stop the ones after it.
+        Once the batch's time budget is spent no more sub-requests start; they
+        are reported with status 504, and the batch itself still answers 200
+        so the results of the ones that ran aren't lost.
+    """
+    app = current_app._get_current_object()
+    # Sub-request paths are relative to where the blueprint is mounted, like the batch
+    prefix = request.path.rsplit('/', 1)[0]
+    try:
+        if atomic:
+            return _run_atomic(app, subrequests, blueprint, prefix, budget)
+
+        responses = []
+        for subrequest in subrequests:
+            if _out_of_time(budget):
+                break
+            responses.append(_dispatch(app, subrequest, blueprint, prefix))
+            # Like separate calls, each sub-request starts with a fresh session
+            db.session.remove()
+        return _not_run(subrequests, responses, 504, _OUT_OF_TIME), True
+    finally:
+        if budget is not None:
+            # Each sub-request's timeout is in the batch's body
+            budget.reported = True
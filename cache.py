@@ -0,0 +1,595 @@
+# Server-side response cache for the read endpoints
+# 1. Keyed by path plus normalized query arguments
+# 2. Bounded LRU with a TTL per entry
+# 3. Entries carry tags (e.g. 'order:5') so writes evict only what they affect
+# 4. Hit/miss/eviction counters are exposed through stats()
+# 5. SQLiteBackend keeps entries in a file shared by all workers on the host
+# 6. Concurrent misses for the same key are coalesced into one view call
+# 7. A render that overlaps an invalidation of its tags is not stored
+
+import base64
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+
+from flask import current_app, g, request, has_app_context
+
+from singleflight import get_singleflight
+
+# Invalidations remembered per backend; a render spanning more of them is not stored
+TRACKED_GENERATIONS = 10000
+
+
+class MemoryBackend:
+    """Thread-safe LRU store with per-entry expiry and tag invalidation"""
+
+    def __init__(self, max_entries=1024, default_ttl=30):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()  # key -> (value, expires_at, tags)
+        self._tags = {}  # tag -> set of keys
+        self._lock = threading.Lock()
+        self._generation = 0  # invalidate() calls so far
+        self._invalidated = OrderedDict()  # tag -> generation of its last invalidation
+        self._floor = 0  # records at or below this generation may be gone
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _remove(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[1] <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def _store(self, key, value, tags, ttl):
+        expires_at = time.monotonic() + (self.default_ttl if ttl is None else ttl)
+        tags = frozenset(tags)
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (value, expires_at, tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def generation(self):
+        """Token for set(): entries rendered after it are dropped if their tags were invalidated since"""
+        with self._lock:
+            return self._generation
+
+    def _fresh(self, tags, generation):
+        return generation >= self._floor and all(self._invalidated.get(tag, 0) <= generation for tag in tags)
+
+    def set(self, key, value, tags=(), ttl=None, generation=None):
+        """Store ``value``; returns False if ``generation`` shows it may predate an invalidation"""
+        with self._lock:
+            if generation is not None and not self._fresh(tags, generation):
+                return False
+            self._store(key, value, tags, ttl)
+            return True
+
+    def add(self, key, value, tags=(), ttl=None):
+        """Set ``key`` only if it holds no live entry; returns whether it was set"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                return False
+            self._store(key, value, tags, ttl)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def invalidate(self, tags):
+        """Drop every entry carrying any of ``tags``; returns how many were dropped"""
+        with self._lock:
+            self._generation += 1
+            keys = set()
+            for tag in tags:
+                keys.update(self._tags.get(tag, ()))
+                self._invalidated[tag] = self._generation
+                self._invalidated.move_to_end(tag)
+            while next(iter(self._invalidated.values()), self._generation) <= self._generation - TRACKED_GENERATIONS:
+                self._floor = self._invalidated.popitem(last=False)[1]
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+
+def _default(value):
+    if isinstance(value, bytes):
+        return {'__bytes__': base64.b64encode(value).decode('ascii')}
+    raise TypeError(f'{type(value).__name__} values are not stored in the shared cache')
+
+
+def _object_hook(obj):
+    if len(obj) == 1 and '__bytes__' in obj:
+        return base64.b64decode(obj['__bytes__'])
+    return obj
+
+
+def _dump_value(value):
+    """Encode an entry for the shared file: JSON, with bytes base64-encoded and tuples as lists"""
+    return json.dumps(value, default=_default, separators=(',', ':'))
+
+
+def _load_value(data):
+    """Decode an entry written by _dump_value(); raises ValueError for anything else"""
+    return json.loads(data, object_hook=_object_hook)
+
+
+class SQLiteBackend:
+    """
+    Store shared by every worker process on one host
+    ---
+    Entries live in a local SQLite file, so the cache is filled once per host
+    instead of once per worker. Eviction is LRU on a last-access time, and
+    named counters (see bump()) let in-process caches notice invalidations
+    made by other workers.
+    Values are stored as JSON rather than pickled, so a process that can
+    write the file can corrupt entries but can't run code in the workers.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY,
+            value BLOB NOT NULL,
+            expires_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS ix_entries_accessed_at ON entries (accessed_at);
+        CREATE TABLE IF NOT EXISTS entry_tags (
+            tag TEXT NOT NULL,
+            key TEXT NOT NULL,
+            PRIMARY KEY (tag, key)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS ix_entry_tags_key ON entry_tags (key);
+        CREATE TABLE IF NOT EXISTS counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS tag_generations (
+            tag TEXT PRIMARY KEY,
+            generation INTEGER NOT NULL
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS ix_tag_generations_generation ON tag_generations (generation);
+    """
+
+    def __init__(self, path, max_entries=1024, default_ttl=30):
+        self.path = path
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.errors = 0
+        connection = self._connect()
+        try:
+            connection.executescript(self.SCHEMA)
+        finally:
+            connection.close()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        connection.execute('PRAGMA journal_mode = WAL')
+        # Losing cache entries on power loss is fine
+        connection.execute('PRAGMA synchronous = OFF')
+        return connection
+
+    @property
+    def _connection(self):
+        # One connection per thread, and never one inherited across a fork
+        if getattr(self._local, 'pid', None) != os.getpid():
+            self._local.connection = self._connect()
+            self._local.pid = os.getpid()
+        return self._local.connection
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def _delete_keys(self, connection, keys):
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            marks = ','.join('?' * len(chunk))
+            connection.execute(f'DELETE FROM entries WHERE key IN ({marks})', chunk)
+            connection.execute(f'DELETE FROM entry_tags WHERE key IN ({marks})', chunk)
+
+    def get(self, key):
+        now = time.time()
+        try:
+            connection = self._connection
+            row = connection.execute(
+                'SELECT value, expires_at, accessed_at FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is None or row[1] <= now:
+                if row is not None:
+                    connection.execute('BEGIN IMMEDIATE')
+                    self._delete_keys(connection, [key])
+                    connection.execute('COMMIT')
+                self._count('misses')
+                return None
+            if row[2] < now - 1:
+                # Recency is tracked to the second to keep hits mostly read-only
+                connection.execute('UPDATE entries SET accessed_at = ? WHERE key = ?', (now, key))
+        except sqlite3.Error:
+            self._reset()
+            self._count('errors')
+            self._count('misses')
+            return None
+        try:
+            value = _load_value(row[0])
+        except ValueError:
+            # Not an entry this code wrote, e.g. one from an older version
+            self._count('errors')
+            self._count('misses')
+            return None
+        self._count('hits')
+        return value
+
+    def _store(self, connection, key, value, tags, ttl, now):
+        expires_at = now + (self.default_ttl if ttl is None else ttl)
+        connection.execute('DELETE FROM entry_tags WHERE key = ?', (key,))
+        connection.execute(
+            'INSERT OR REPLACE INTO entries (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)',
+            (key, _dump_value(value), expires_at, now))
+        connection.executemany('INSERT OR IGNORE INTO entry_tags (tag, key) VALUES (?, ?)',
+                               [(tag, key) for tag in tags])
+        excess = connection.execute('SELECT COUNT(*) FROM entries').fetchone()[0] - self.max_entries
+        if excess > 0:
+            oldest = [row[0] for row in connection.execute(
+                'SELECT key FROM entries ORDER BY accessed_at LIMIT ?', (excess,))]
+            self._delete_keys(connection, oldest)
+            self._count('evictions', len(oldest))
+
+    def generation(self):
+        """Token for set(): entries rendered after it are dropped if their tags were invalidated since"""
+        return self.counter('tag_generation')
+
+    def _fresh(self, connection, tags, generation):
+        if generation < self._read_counter(connection, 'tag_generation_floor'):
+            return False
+        tags = list(tags)
+        for start in range(0, len(tags), 500):
+            chunk = tags[start:start + 500]
+            marks = ','.join('?' * len(chunk))
+            if connection.execute(f'SELECT 1 FROM tag_generations WHERE tag IN ({marks}) AND generation > ? LIMIT 1',
+                                  (*chunk, generation)).fetchone():
+                return False
+        return True
+
+    def set(self, key, value, tags=(), ttl=None, generation=None):
+        """Store ``value``; returns False if ``generation`` shows it may predate an invalidation"""
+        try:
+            connection = self._connection
+            connection.execute('BEGIN IMMEDIATE')
+            if generation is not None and not self._fresh(connection, tags, generation):
+                connection.execute('ROLLBACK')
+                return False
+            self._store(connection, key, value, tags, ttl, time.time())
+            connection.execute('COMMIT')
+            return True
+        except sqlite3.Error:
+            self._reset()
+            self._count('errors')
+            return False
+
+    def add(self, key, value, tags=(), ttl=None):
+        """
+        Set ``key`` only if no worker holds a live entry for it
+        ---
+        Returns whether it was set; True as well if the store can't be used,
+        so callers carry on as they would without it.
+        """
+        now = time.time()
+        try:
+            connection = self._connection
+            connection.execute('BEGIN IMMEDIATE')
+            row = connection.execute('SELECT expires_at FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is not None and row[0] > now:
+                connection.execute('ROLLBACK')
+                return False
+            self._store(connection, key, value, tags, ttl, now)
+            connection.execute('COMMIT')
+        except sqlite3.Error:
+            self._reset()
+            self._count('errors')
+        return True
+
+    def delete(self, key):
+        self.invalidate_keys([key])
+
+    def invalidate_keys(self, keys):
+        try:
+            connection = self._connection
+            connection.execute('BEGIN IMMEDIATE')
+            self._delete_keys(connection, list(keys))
+            connection.execute('COMMIT')
+        except sqlite3.Error:
+            self._reset()
+            self._count('errors')
+
+    def invalidate(self, tags):
+        """Drop every entry carrying any of ``tags`` for all workers"""
+        tags = list(tags)
+        if not tags:
+            return 0
+        try:
+            connection = self._connection
+            connection.execute('BEGIN IMMEDIATE')
+            keys = set()
+            for start in range(0, len(tags), 500):
+                chunk = tags[start:start + 500]
+                marks = ','.join('?' * len(chunk))
+                keys.update(row[0] for row in connection.execute(
+                    f'SELECT key FROM entry_tags WHERE tag IN ({marks})', chunk))
+            keys = list(keys)
+            self._delete_keys(connection, keys)
+            self._bump(connection, 'invalidations', len(keys))
+            self._bump(connection, 'tag_generation')
+            generation = self._read_counter(connection, 'tag_generation')
+            connection.executemany(
+                'INSERT INTO tag_generations (tag, generation) VALUES (?, ?) '
+                'ON CONFLICT (tag) DO UPDATE SET generation = excluded.generation',
+                [(tag, generation) for tag in tags])
+            if generation % 1000 == 0:
+                floor = generation - TRACKED_GENERATIONS
+                connection.execute('DELETE FROM tag_generations WHERE generation <= ?', (floor,))
+                connection.execute(
+                    'INSERT INTO counters (name, value) VALUES (?, ?) '
+                    'ON CONFLICT (name) DO UPDATE SET value = excluded.value', ('tag_generation_floor', floor))
+            connection.execute('COMMIT')
+            return len(keys)
+        except sqlite3.Error:
+            self._reset()
+            self._count('errors')
+            return 0
+
+    def clear(self):
+        self._connection.executescript('DELETE FROM entries; DELETE FROM entry_tags;')
+
+    @staticmethod
+    def _bump(connection, name, amount=1):
+        connection.execute(
+            'INSERT INTO counters (name, value) VALUES (?, ?) '
+            'ON CONFLICT (name) DO UPDATE SET value = value + excluded.value', (name, amount))
+
+    def bump(self, name):
+        """Increment a host-wide counter, e.g. to tell other workers to drop local caches"""
+        try:
+            self._bump(self._connection, name)
+        except sqlite3.Error:
+            self._reset()
+            self._count('errors')
+
+    @staticmethod
+    def _read_counter(connection, name):
+        row = connection.execute('SELECT value FROM counters WHERE name = ?', (name,)).fetchone()
+        return row[0] if row else 0
+
+    def counter(self, name):
+        try:
+            return self._read_counter(self._connection, name)
+        except sqlite3.Error:
+            self._reset()
+            return None
+
+    def _reset(self):
+        # Roll back anything left open and start over with a fresh connection
+        connection = getattr(self._local, 'connection', None)
+        self._local.pid = None
+        if connection is not None:
+            try:
+                connection.close()
+            except sqlite3.Error:
+                pass
+
+    def stats(self):
+        connection = self._connection
+        size = connection.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': 'sqlite',
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'size': size,
+                'max_entries': self.max_entries,
+                'evictions': self.evictions,
+                'errors': self.errors,
+                'invalidations': self.counter('invalidations'),
+            }
+
+
+class _Unshared(Exception):
+    """Carries a response that mustn't be cached or handed to other waiting requests"""
+
+    def __init__(self, response):
+        super().__init__(response.status_code)
+        self.response = response
+
+
+class ResponseCache:
+    """
+    Cache decorator for GET views
+    ---
+    Config:
+        RESPONSE_CACHE_ENABLED: Turn caching on or off (default: True)
+        RESPONSE_CACHE_MAX_ENTRIES: Entries kept per app before LRU eviction (default: 1024)
+        RESPONSE_CACHE_TTL: Seconds an entry stays valid (default: 30)
+        RESPONSE_CACHE_BACKEND: 'memory' (per worker) or 'sqlite' (shared per host)
+        RESPONSE_CACHE_PATH: File for the sqlite backend (default: instance/response_cache.db)
+        SINGLEFLIGHT_ENABLED: Coalesce concurrent misses for the same key (default: True)
+        SINGLEFLIGHT_TIMEOUT: Seconds a request waits for an identical one (default: 5)
+    Each app gets its own store, created on first use, so the blueprint works
+    without any setup in the app.
+    """
+
+    def backend(self, app=None):
+        app = app or current_app
+        backend = app.extensions.get('response_cache')
+        if backend is None:
+            options = {
+                'max_entries': app.config.get('RESPONSE_CACHE_MAX_ENTRIES', 1024),
+                'default_ttl': app.config.get('RESPONSE_CACHE_TTL', 30),
+            }
+            if app.config.get('RESPONSE_CACHE_BACKEND', 'memory') == 'sqlite':
+                path = app.config.get('RESPONSE_CACHE_PATH')
+                if path is None:
+                    os.makedirs(app.instance_path, exist_ok=True)
+                    path = os.path.join(app.instance_path, 'response_cache.db')
+                backend = SQLiteBackend(path, **options)
+            else:
+                backend = MemoryBackend(**options)
+            backend = app.extensions.setdefault('response_cache', backend)
+        return backend
+
+    def shared(self):
+        """The host-wide backend, or None when each worker has its own cache"""
+        backend = self.backend()
+        return backend if isinstance(backend, SQLiteBackend) else None
+
+    @staticmethod
+    def make_key():
+        """Path plus query arguments in a stable order"""
+        args = sorted((key, value) for key, value in request.args.items(multi=True) if value != '')
+        return f'{request.path}?{urlencode(args)}' if args else request.path
+
+    def cached(self, tags=None, ttl=None):
+        """
+        Cache successful responses of a GET view
+        ---
+        Parameters:
+            tags (optional): Callable taking the view arguments and returning the
+                tags for the entry; views can add more with add_cache_tags()
+            ttl (optional): Seconds to keep the entry (default: RESPONSE_CACHE_TTL)
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not current_app.config.get('RESPONSE_CACHE_ENABLED', True) or held_invalidations() is not None:
+                    return view(*args, **kwargs)
+
+                backend = self.backend()
+                key = self.make_key()
+                entry = backend.get(key)
+                if entry is None:
+                    def render():
+                        # A write invalidating the tags while we render leaves our body stale
+                        generation = backend.generation()
+                        g.cache_tags = set(tags(**kwargs)) if tags else set()
+                        response = current_app.make_response(view(*args, **kwargs))
+                        if response.is_streamed or response.status_code != 200:
+                            # Only for the request that made it: waiters render their own
+                            raise _Unshared(response)
+                        entry = (response.get_data(), response.status_code, list(response.headers))
+                        if not backend.set(key, entry, g.cache_tags, ttl, generation):
+                            # Waiters may have arrived after the write, let them render again
+                            raise _Unshared(response)
+                        return entry
+
+                    try:
+                        if current_app.config.get('SINGLEFLIGHT_ENABLED', True):
+                            entry = get_singleflight().do(
+                                key, render, current_app.config.get('SINGLEFLIGHT_TIMEOUT', 5))
+                        else:
+                            entry = render()
+                    except _Unshared as unshared:
+                        return unshared.response
+
+                body, status, headers = entry
+                return current_app.response_class(body, status=status, headers=headers)
+            return wrapper
+        return decorator
+
+    def invalidate(self, *tags):
+        """Evict every cached response tagged with any of ``tags``"""
+        # Always go to the backend: with a shared store other workers may hold entries
+        self.backend().invalidate(tags)
+        held = held_invalidations()
+        if held is not None:
+            held.update(tags)
+
+    def stats(self):
+        return self.backend().stats()
+
+
+def held_invalidations():
+    """
+    Tags invalidated so far inside an uncommitted outer transaction, or None outside one
+    ---
+    An atomic batch sets g.held_invalidations to a set. Its sub-requests' commits
+    only release savepoints, so nothing they read may be cached, and every tag
+    they invalidate is invalidated again once the batch commits.
+    """
+    return g.get('held_invalidations') if has_app_context() else None
+
+
+def add_cache_tags(*tags):
+    """Tag the response being cached with tags only known inside the view"""
+    if 'cache_tags' in g:
+        g.cache_tags.update(tags)
+
+
+def order_tags(orderid):
+    """Tags of an order's header and details pages; both carry the order's version in their ETag"""
+    return [f'order:{orderid}', f'order:{orderid}:details']
+
+
+def order_list_tags(*customer_ids):
+    """Tags of the get_orders pages that a header write for these customers affects"""
+    return ['orders:all'] + [f'orders:customer:{customer_id}' for customer_id in customer_ids]
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,338 @@
+# Flask CLI commands for database setup
+# Schema and seed work runs here instead of at app startup, so starting a worker
+# only costs the import and the engine creation.
+#
+# Usage:
+#   flask --app app init-db
+#   flask --app app create-indexes
+#   flask --app app seed
+#   flask --app app generate-data --orders 1000000
+#   flask --app app prune
+
+import bisect
+import itertools
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+import click
+from sqlalchemy import inspect, select, func, text
+
+from models import db, OrderHeader, OrderDetail
+from intake import prune_history
+
+
+def _add_missing_columns():
+    """Add columns that were added to the models after the tables were created"""
+    inspector = inspect(db.engine)
+    existing = {table.name: {column['name'] for column in inspector.get_columns(table.name)}
+                for table in db.metadata.sorted_tables}
+    added = []
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            for column in table.columns:
+                if column.name in existing[table.name]:
+                    continue
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                default = column.server_default.arg if column.server_default is not None else None
+                if isinstance(default, str):
+                    connection.execute(text(
+                        f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type} "
+                        f"NOT NULL DEFAULT '{default}'"))
+                else:
+                    # SQLite only accepts constant defaults here, so backfill instead
+                    connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                    if default is not None:
+                        connection.execute(table.update().values({column.name: default}))
+                added.append(f'{table.name}.{column.name}')
+    return added
+
+
+def _rebuild_foreign_keys():
+    """Rebuild tables whose foreign keys lack the ON DELETE action the models declare"""
+    inspector = inspect(db.engine)
+    stale = []
+    for table in db.metadata.sorted_tables:
+        wanted = {fk.parent.name: (fk.ondelete or '').upper() for fk in table.foreign_keys}
+        existing = {fk['constrained_columns'][0]: (fk.get('options', {}).get('ondelete') or '').upper()
+                    for fk in inspector.get_foreign_keys(table.name)}
+        if any(existing.get(column) != action for column, action in wanted.items()):
+            columns = [column['name'] for column in inspector.get_columns(table.name)]
+            indexes = [index['name'] for index in inspector.get_indexes(table.name)]
+            stale.append((table, columns, indexes))
+
+    if not stale:
+        return []
+    # SQLite can't alter a constraint: create the table anew and copy the rows over
+    with db.engine.connect() as connection:
+        # Only takes effect outside a transaction
+        connection.exec_driver_sql('PRAGMA foreign_keys = OFF')
+        connection.commit()
+        try:
+            with connection.begin():
+                for table, columns, indexes in stale:
+                    old = f'{table.name}_old'
+                    connection.exec_driver_sql(f'ALTER TABLE {table.name} RENAME TO {old}')
+                    for index in indexes:
+                        connection.exec_driver_sql(f'DROP INDEX {index}')
+                    table.create(connection)
+                    names = ', '.join(column.name for column in table.columns if column.name in columns)
+                    connection.exec_driver_sql(f'INSERT INTO {table.name} ({names}) SELECT {names} FROM {old}')
+                    connection.exec_driver_sql(f'DROP TABLE {old}')
+                if connection.exec_driver_sql('PRAGMA foreign_key_check').first() is not None:
+                    raise click.ClickException('Rows reference missing parents; fix them and run init-db again')
+        finally:
+            connection.exec_driver_sql('PRAGMA foreign_keys = ON')
+            connection.commit()
+    return [table.name for table, _, _ in stale]
+
+
+UNIQUE_LINES = 'ux_order_details_order_item'
+
+
+def _index_names(table):
+    return {index['name'] for index in inspect(db.engine).get_indexes(table)}
+
+
+def _echo_merged(merged):
+    if merged:
+        click.echo(f'Merged {merged} duplicate order line(s)')
+
+
+def _merge_duplicate_lines():
+    """Fold lines for the same item on the same order into the oldest one, before the unique index is built"""
+    keep = 'SELECT min(orderdetailid) FROM order_details GROUP BY orderid, orderitemid'
+    same_item = ('FROM order_details d WHERE d.orderid = order_details.orderid '
+                 'AND d.orderitemid = order_details.orderitemid')
+    with db.engine.begin() as connection:
+        # The kept line carries the summed quantity and total at their average rate
+        connection.exec_driver_sql(
+            f'UPDATE order_details SET quantity = (SELECT sum(d.quantity) {same_item}), '
+            f'rowtotal = (SELECT sum(d.rowtotal) {same_item}), '
+            f'unitrate = (SELECT sum(d.rowtotal) / sum(d.quantity) {same_item}) '
+            f'WHERE orderdetailid IN ({keep} HAVING count(*) > 1)')
+        return connection.exec_driver_sql(
+            f'DELETE FROM order_details WHERE orderdetailid NOT IN ({keep})').rowcount
+
+
+@click.command('init-db')
+def init_db_command():
+    """Create missing tables, indexes and columns."""
+    db.create_all()
+    for column in _add_missing_columns():
+        click.echo(f'Added column {column}')
+    if UNIQUE_LINES not in _index_names('order_details'):
+        _echo_merged(_merge_duplicate_lines())
+    for table in _rebuild_foreign_keys():
+        click.echo(f'Rebuilt {table} with ON DELETE CASCADE')
+    # A rebuilt order_details already has it; otherwise create it now
+    if UNIQUE_LINES not in _index_names('order_details'):
+        next(index for index in OrderDetail.__table__.indexes if index.name == UNIQUE_LINES).create(db.engine)
+        click.echo(f'Created index {UNIQUE_LINES}')
+    click.echo('Database schema created.')
+
+
+@click.command('create-indexes')
+def create_indexes_command():
+    """Create indexes missing from an existing database and refresh statistics."""
+    inspector = inspect(db.engine)
+    created = 0
+    for table in db.metadata.sorted_tables:
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                if index.name == UNIQUE_LINES:
+                    _echo_merged(_merge_duplicate_lines())
+                index.create(db.engine)
+                click.echo(f'Created index {index.name}')
+                created += 1
+
+    # Let the query planner see the new indexes
+    with db.engine.begin() as connection:
+        connection.execute(text('ANALYZE'))
+
+    click.echo(f'{created} index(es) created.')
+
+
+@click.command('seed')
+def seed_command():
+    """Add the sample orders if the database is empty."""
+    if db.session.execute(select(OrderHeader.orderid).limit(1)).first():
+        click.echo('Database already has orders, skipping seed.')
+        return
+
+    # Create sample orders
+    sample_order1 = OrderHeader(ordercustomerid=1001)
+    sample_order2 = OrderHeader(ordercustomerid=1002)
+    db.session.add_all([sample_order1, sample_order2])
+    db.session.flush()
+
+    # Create sample order details
+    db.session.add_all([
+        OrderDetail(orderid=sample_order1.orderid, orderitemid=5001,
+                    quantity=2, unitrate=10.50, rowtotal=21.00),
+        OrderDetail(orderid=sample_order1.orderid, orderitemid=5002,
+                    quantity=3, unitrate=15.75, rowtotal=47.25),
+        OrderDetail(orderid=sample_order2.orderid, orderitemid=5003,
+                    quantity=1, unitrate=25.99, rowtotal=25.99),
+    ])
+    db.session.commit()
+
+    click.echo('Sample data added to the database.')
+
+
+def _zipf_cum_weights(n, exponent):
+    """Cumulative weights for ranks 1..n where rank k is picked ~ 1/k**exponent"""
+    return list(itertools.accumulate(1.0 / k ** exponent for k in range(1, n + 1)))
+
+
+def _generate_chunk(rng, first_orderid, first_detailid, count, options, catalog):
+    """Build header and detail rows for ``count`` orders with explicit ids"""
+    customer_weights, item_weights, prices = catalog
+    span = options['days'] * 86400
+    end = options['end']
+    max_lines = options['max_lines']
+
+    customers = rng.choices(range(options['first_customer'],
+                                  options['first_customer'] + options['customers']),
+                            cum_weights=customer_weights, k=count)
+    headers = []
+    details = []
+    detailid = first_detailid
+    total_weight = item_weights[-1]
+
+    for offset, customer in enumerate(customers):
+        orderid = first_orderid + offset
+        # Recent dates are more common than old ones
+        orderdate = end - timedelta(seconds=int(span * rng.random() ** 1.5))
+        headers.append({'orderid': orderid, 'orderdate': orderdate, 'ordercustomerid': customer})
+
+        # Mostly small orders with a long tail, each item at most once per order
+        lines = min(max_lines, 1 + int(rng.expovariate(1 / options['mean_lines'])))
+        items = set()
+        while len(items) < lines:
+            items.add(bisect.bisect(item_weights, rng.random() * total_weight))
+        for item in items:
+            quantity = float(1 + int(rng.expovariate(0.5)))
+            unitrate = prices[item]
+            details.append({
+                'orderdetailid': detailid,
+                'orderid': orderid,
+                'orderitemid': options['first_item'] + item,
+                'quantity': quantity,
+                'unitrate': unitrate,
+                'rowtotal': quantity * unitrate,
+            })
+            detailid += 1
+
+    return headers, details
+
+
+# Rows per multi-row INSERT, well under SQLite's bound parameter limit
+INSERT_ROWS = 500
+
+
+def _insert_rows(connection, table, rows):
+    """Insert ``rows`` with INSERT ... VALUES statements of INSERT_ROWS rows each"""
+    for start in range(0, len(rows), INSERT_ROWS):
+        connection.execute(table.insert().values(rows[start:start + INSERT_ROWS]))
+
+
+@click.command('generate-data')
+@click.option('--orders', default=100000, show_default=True, help='Number of orders to create.')
+@click.option('--customers', default=10000, show_default=True, help='Number of distinct customers.')
+@click.option('--items', default=5000, show_default=True, help='Number of distinct items in the catalog.')
+@click.option('--mean-lines', default=3.0, show_default=True, help='Average lines per order.')
+@click.option('--max-lines', default=50, show_default=True, help='Most lines on a single order.')
+@click.option('--days', default=730, show_default=True, help='Spread order dates over this many days.')
+@click.option('--skew', default=1.1, show_default=True,
+              help='Zipf exponent for customer and item popularity.')
+@click.option('--chunk-size', default=20000, show_default=True,
+              help='Orders inserted per transaction.')
+@click.option('--seed', 'random_seed', type=int, default=None, help='Random seed for repeatable data.')
+def generate_data_command(orders, customers, items, mean_lines, max_lines, days, skew,
+                          chunk_size, random_seed):
+    """Bulk-generate synthetic orders for benchmark and staging databases."""
+    rng = random.Random(random_seed)
+    options = {
+        'customers': customers,
+        'first_customer': 1001,
+        'first_item': 5001,
+        'mean_lines': max(mean_lines - 1, 0.01),
+        'max_lines': min(max_lines, items),
+        'days': days,
+        'end': datetime.now(timezone.utc).replace(microsecond=0),
+    }
+    catalog = (
+        _zipf_cum_weights(customers, skew),
+        _zipf_cum_weights(items, skew),
+        # Log-normal prices, mostly between $1 and $100
+        [round(rng.lognormvariate(2.5, 1.0), 2) for _ in range(items)],
+    )
+
+    header_table = OrderHeader.__table__
+    detail_table = OrderDetail.__table__
+    started = time.perf_counter()
+    created_details = 0
+
+    with db.engine.connect() as connection:
+        next_orderid = (connection.execute(select(func.max(header_table.c.orderid))).scalar() or 0) + 1
+        next_detailid = (connection.execute(
+            select(func.max(detail_table.c.orderdetailid))).scalar() or 0) + 1
+
+        # Relax durability for the load and put it back afterwards
+        saved = {name: connection.exec_driver_sql(f'PRAGMA {name}').scalar()
+                 for name in ('synchronous', 'journal_mode', 'cache_size', 'temp_store')}
+        connection.exec_driver_sql('PRAGMA synchronous = OFF')
+        if saved['journal_mode'] == 'wal':
+            # Leaving WAL needs exclusive access, keep it
+            del saved['journal_mode']
+        else:
+            connection.exec_driver_sql('PRAGMA journal_mode = MEMORY')
+        connection.exec_driver_sql('PRAGMA cache_size = -200000')
+        connection.exec_driver_sql('PRAGMA temp_store = MEMORY')
+        connection.commit()
+
+        try:
+            for done in range(0, orders, chunk_size):
+                count = min(chunk_size, orders - done)
+                headers, details = _generate_chunk(
+                    rng, next_orderid, next_detailid, count, options, catalog)
+                with connection.begin():
+                    _insert_rows(connection, header_table, headers)
+                    _insert_rows(connection, detail_table, details)
+
+                next_orderid += count
+                next_detailid += len(details)
+                created_details += len(details)
+                elapsed = time.perf_counter() - started
+                click.echo(f'{done + count}/{orders} orders, {created_details} details '
+                           f'({(done + count) / elapsed:,.0f} orders/s)')
+        finally:
+            for name, value in saved.items():
+                connection.exec_driver_sql(f'PRAGMA {name} = {value}')
+            connection.commit()
+
+    click.echo(f'Generated {orders} orders and {created_details} details '
+               f'in {time.perf_counter() - started:.1f}s.')
+
+
+@click.command('prune')
+def prune_command():
+    """Delete change feed events and finished jobs past their retention.
+
+    The API already does this every PRUNE_INTERVAL seconds while it serves
+    requests. Run it from cron when PRUNE_INTERVAL is None, or when the
+    database is written by something other than the API.
+    """
+    events, jobs = prune_history()
+    click.echo(f'Deleted {events} outbox events and {jobs} finished jobs.')
+
+
+def register_commands(app):
+    """Register the database commands on the app's CLI"""
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(create_indexes_command)
+    app.cli.add_command(seed_command)
+    app.cli.add_command(generate_data_command)
+    app.cli.add_command(prune_command)
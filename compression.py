@@ -0,0 +1,187 @@
+# Response compression
+# 1. Negotiates gzip (and brotli when the package is installed) from Accept-Encoding
+# 2. Skips bodies under COMPRESS_MIN_SIZE and non-text mimetypes
+# 3. Compresses streamed responses chunk by chunk
+# 4. Compression.cached() compresses static pages once per encoding
+
+import hashlib
+import zlib
+from functools import wraps
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+DEFAULT_MIMETYPES = [
+    'application/json',
+    'text/html',
+    'text/css',
+    'text/plain',
+    'application/javascript',
+]
+
+
+class _GzipStream:
+    """Incremental gzip compressor with the same interface as _BrotliStream"""
+
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def compress(self, data):
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class _BrotliStream:
+    """Incremental brotli compressor"""
+
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class Compression:
+    """
+    Compress responses for clients that accept it
+    ---
+    Config:
+        COMPRESS_MIN_SIZE: Smallest body (in bytes) worth compressing (default: 500)
+        COMPRESS_LEVEL: gzip level, 1-9 (default: 6)
+        COMPRESS_BR_LEVEL: brotli quality, 0-11 (default: 4)
+        COMPRESS_MIMETYPES: Mimetypes that are compressed
+        COMPRESS_ALGORITHMS: Encodings offered, in order of preference (default: br, gzip)
+    """
+
+    def __init__(self, app=None):
+        self._static_cache = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESS_MIN_SIZE', 500)
+        app.config.setdefault('COMPRESS_LEVEL', 6)
+        app.config.setdefault('COMPRESS_BR_LEVEL', 4)
+        app.config.setdefault('COMPRESS_MIMETYPES', DEFAULT_MIMETYPES)
+        app.config.setdefault('COMPRESS_ALGORITHMS', ['br', 'gzip'])
+        app.extensions['compression'] = self
+        app.after_request(self.after_request)
+
+    # ========================================================================
+    # Negotiation and compressors
+    # ========================================================================
+    def choose_encoding(self):
+        """Return the best encoding the client accepts, or None"""
+        best, best_quality = None, 0
+        for encoding in current_app.config['COMPRESS_ALGORITHMS']:
+            if encoding == 'br' and brotli is None:
+                continue
+            quality = request.accept_encodings[encoding]
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    def _stream(self, encoding):
+        if encoding == 'br':
+            return _BrotliStream(current_app.config['COMPRESS_BR_LEVEL'])
+        return _GzipStream(current_app.config['COMPRESS_LEVEL'])
+
+    def compress(self, data, encoding):
+        """Compress a whole body in one go"""
+        if encoding == 'br':
+            return brotli.compress(data, quality=current_app.config['COMPRESS_BR_LEVEL'])
+        return zlib.compress(data, current_app.config['COMPRESS_LEVEL'], zlib.MAX_WBITS | 16)
+
+    def _compress_chunks(self, chunks, compressor, charset):
+        # Runs after the request context is gone, so the compressor is built up front
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode(charset)
+                data = compressor.compress(chunk)
+                if data:
+                    yield data
+            yield compressor.finish()
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+
+    # ========================================================================
+    # Hooks
+    # ========================================================================
+    def after_request(self, response):
+        if (response.status_code < 200
+                or response.status_code in (204, 304)
+                or response.direct_passthrough
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in current_app.config['COMPRESS_MIMETYPES']):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = self.choose_encoding()
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = self._compress_chunks(
+                response.response, self._stream(encoding), response.charset)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < current_app.config['COMPRESS_MIN_SIZE']:
+                return response
+            response.set_data(self.compress(data, encoding))
+
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag:
+            # Each encoding is a different representation
+            response.set_etag(f'{etag}-{encoding}', weak=weak)
+        return response
+
+    def cached(self, view):
+        """
+        Decorator for pages whose body never changes
+        ---
+        The page is rendered and compressed once per encoding, then served from
+        memory with an ETag so revalidation returns 304.
+        """
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            encoding = self.choose_encoding()
+            key = (request.path, encoding)
+            entry = self._static_cache.get(key)
+
+            if entry is None:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                body = response.get_data()
+                etag = hashlib.sha1(body).hexdigest()[:16]
+                if encoding and len(body) >= current_app.config['COMPRESS_MIN_SIZE']:
+                    body = self.compress(body, encoding)
+                    etag = f'{etag}-{encoding}'
+                else:
+                    encoding = None
+                entry = (body, response.mimetype, encoding, etag)
+                self._static_cache[key] = entry
+
+            body, mimetype, encoding, etag = entry
+            response = current_app.response_class(body, mimetype=mimetype)
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+            response.vary.add('Accept-Encoding')
+            response.set_etag(etag)
+            return response.make_conditional(request)
+
+        return wrapper
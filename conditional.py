@@ -0,0 +1,77 @@
+# Conditional GET for the order read endpoints
+# 1. Responses carry a strong ETag built from the order's version and a Last-Modified
+# 2. If-None-Match / If-Modified-Since are answered with 304 after one indexed
+#    lookup of the version, without loading or serializing the order or its details
+
+from datetime import timezone
+from functools import wraps
+
+from flask import current_app, request
+from sqlalchemy import select
+
+from models import db, OrderHeader
+
+# Compression appends the encoding to the ETag of compressed bodies
+_ENCODING_SUFFIXES = ('-gzip', '-br')
+
+
+def order_etag(orderid, version, representation):
+    return f'order-{orderid}-{representation}-v{version}'
+
+
+def set_order_validators(response, order, representation):
+    """Add ETag and Last-Modified for an order to a 200 response"""
+    if response.status_code == 200:
+        response.set_etag(order_etag(order.orderid, order.version, representation))
+        response.last_modified = order.updated_at.replace(tzinfo=timezone.utc)
+    return response
+
+
+def _strip_encoding(tag):
+    for suffix in _ENCODING_SUFFIXES:
+        if tag.endswith(suffix):
+            return tag[:-len(suffix)]
+    return tag
+
+
+def _not_modified(etag, updated_at):
+    if request.if_none_match:
+        if request.if_none_match.star_tag:
+            return True
+        tags = request.if_none_match.as_set(include_weak=True)
+        return etag in {_strip_encoding(tag) for tag in tags}
+
+    if request.if_modified_since:
+        last_modified = updated_at.replace(tzinfo=timezone.utc, microsecond=0)
+        return last_modified <= request.if_modified_since
+
+    return False
+
+
+def conditional_order(representation):
+    """
+    Decorator answering conditional GETs for an order before running the view
+    ---
+    Parameters:
+        representation: Name of the view's representation of the order (e.g. 'header')
+    Notes:
+        Unconditional requests go straight to the view, which sets the validators
+        itself with set_order_validators() so they are cached with the body.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(orderid, **kwargs):
+            if request.if_none_match or request.if_modified_since:
+                row = db.session.execute(
+                    select(OrderHeader.version, OrderHeader.updated_at)
+                    .where(OrderHeader.orderid == orderid)).first()
+                if row is not None:
+                    etag = order_etag(orderid, row.version, representation)
+                    if _not_modified(etag, row.updated_at):
+                        response = current_app.response_class(status=304)
+                        response.set_etag(etag)
+                        response.last_modified = row.updated_at.replace(tzinfo=timezone.utc)
+                        return response
+            return view(orderid=orderid, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,103 @@
+# Per-request deadlines enforced inside SQLite
+# Every request gets a time budget (per endpoint, overridable with a header).
+# SQLite calls a progress handler every few thousand VM steps; once the budget
+# is spent the handler aborts the running query, so a runaway query stops
+# holding the worker and the client gets a clean 504 instead of waiting.
+
+import sqlite3
+import threading
+import time
+from contextvars import ContextVar
+
+from flask import current_app, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from batch import is_subrequest
+
+HEADER = 'X-Request-Timeout'
+
+# SQLite VM instructions between deadline checks
+PROGRESS_STEPS = 1000
+
+
+class Budget:
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.deadline = time.monotonic() + seconds
+        self.expired = False
+        # Set by views that report the timeout in their own response (batches)
+        self.reported = False
+
+    def remaining(self):
+        return self.deadline - time.monotonic()
+
+
+_budget = ContextVar('request_budget', default=None)
+_lock = threading.Lock()
+
+
+def _check_deadline():
+    # Returning non-zero makes SQLite abort the statement with "interrupted"
+    budget = _budget.get()
+    if budget is not None and time.monotonic() >= budget.deadline:
+        budget.expired = True
+        return 1
+    return 0
+
+
+@event.listens_for(Engine, 'connect')
+def install_progress_handler(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.set_progress_handler(_check_deadline, PROGRESS_STEPS)
+
+
+def current_budget():
+    """The running request's budget, or None outside a request"""
+    return _budget.get()
+
+
+def start_deadline():
+    """
+    Before-request hook: start the request's time budget
+    ---
+    Config:
+        REQUEST_DEADLINES_ENABLED: Enforce request deadlines (default: True)
+        REQUEST_DEADLINE: Seconds a request may take (default: 10)
+        REQUEST_DEADLINES: Per-endpoint budgets, e.g. {'api.get_orders': 2.0}
+        REQUEST_DEADLINE_MAX: Most seconds a client may ask for with X-Request-Timeout (default: 30)
+    """
+    config = current_app.config
+    if not config.get('REQUEST_DEADLINES_ENABLED', True) or is_subrequest():
+        return  # a batch's sub-requests share its budget
+    seconds = config.get('REQUEST_DEADLINES', {}).get(request.endpoint, config.get('REQUEST_DEADLINE', 10))
+    requested = request.headers.get(HEADER, type=float)
+    if requested is not None and requested > 0:
+        seconds = min(requested, config.get('REQUEST_DEADLINE_MAX', 30))
+    _budget.set(Budget(seconds))
+
+
+def deadline_response(response):
+    """After-request hook: replace the response of a request whose queries were cut off with 504"""
+    budget = _budget.get()
+    if budget is None or not budget.expired or budget.reported:
+        return response
+    with _lock:
+        counts = current_app.extensions.setdefault('deadlines', {'interrupted': 0})
+        counts['interrupted'] += 1
+    timeout = jsonify({
+        'status': 'error',
+        'message': f'Request exceeded its {budget.seconds:g}s time budget'
+    })
+    timeout.status_code = 504
+    return timeout
+
+
+def clear_deadline(exc=None):
+    """Teardown hook: no budget outside the request"""
+    if not is_subrequest():
+        _budget.set(None)
+
+
+def deadline_stats():
+    return dict(current_app.extensions.get('deadlines', {'interrupted': 0}))
@@ -0,0 +1,237 @@
+# Second-level cache for primary-key lookups of OrderHeader and OrderDetail
+# 1. Column values are kept across requests in a bounded, thread-safe LRU with a TTL
+# 2. Hits are attached to the session with merge(load=False), so no SELECT is issued
+# 3. Updated and deleted rows are evicted on flush and again on commit
+# 4. A generation counter stops a slow reader from re-caching a row a writer just evicted
+# 5. With the shared response cache backend, evictions are announced to the other
+#    workers on the host through a counter, and sync_entity_cache() drops stale rows
+
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from models import db, OrderHeader, OrderDetail, OUTER_TRANSACTION
+from cache import response_cache, held_invalidations
+
+CACHED_MODELS = (OrderHeader, OrderDetail)
+
+
+class EntityCache:
+    """Column values of ORM rows keyed by (model name, primary key)"""
+
+    def __init__(self, max_entries=10000, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.generation = 0
+        self.shared_counter = None
+        self._entries = OrderedDict()  # key -> (values, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, values, generation):
+        """Store values read while the cache was at ``generation``"""
+        with self._lock:
+            if generation != self.generation:
+                return  # something was evicted since the read started, it may be stale
+            self._entries[key] = (values, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def evict(self, keys):
+        with self._lock:
+            self.generation += 1
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def evict_where(self, model, **criteria):
+        """Evict cached rows of ``model`` whose values match all of ``criteria`` (a set matches any of its values)"""
+        criteria = {k: v if isinstance(v, (set, frozenset)) else {v} for k, v in criteria.items()}
+        with self._lock:
+            self.generation += 1
+            for key, (values, _) in list(self._entries.items()):
+                if key[0] == model.__name__ and all(values.get(k) in v for k, v in criteria.items()):
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'evictions': self.evictions,
+            }
+
+
+def get_entity_cache(app=None):
+    """The app's entity cache, created on first use"""
+    app = app or current_app
+    cache = app.extensions.get('entity_cache')
+    if cache is None:
+        cache = app.extensions.setdefault('entity_cache', EntityCache(
+            max_entries=app.config.get('ENTITY_CACHE_MAX_ENTRIES', 10000),
+            ttl=app.config.get('ENTITY_CACHE_TTL', 300)))
+    return cache
+
+
+def _cache_key(model, pk):
+    return (model.__name__, pk)
+
+
+def cached_get(model, pk):
+    """
+    Drop-in replacement for db.session.get() on cached models
+    ---
+    Parameters:
+        model: OrderHeader or OrderDetail
+        pk: Primary key value
+    Returns:
+        A persistent instance attached to db.session, or None if there's no such row
+    Config:
+        ENTITY_CACHE_ENABLED: Turn the cache on or off (default: True)
+        ENTITY_CACHE_MAX_ENTRIES: Rows kept per app (default: 10000)
+        ENTITY_CACHE_TTL: Seconds a row stays cached (default: 300)
+    """
+    if not current_app.config.get('ENTITY_CACHE_ENABLED', True) or held_invalidations() is not None:
+        return db.session.get(model, pk)
+
+    session = db.session()
+    obj = session.identity_map.get(session.identity_key(model, pk))
+    if obj is not None:
+        return obj
+
+    cache = get_entity_cache()
+    key = _cache_key(model, pk)
+    values = cache.get(key)
+    if values is not None:
+        obj = model(**values)
+        make_transient_to_detached(obj)
+        return session.merge(obj, load=False)
+
+    generation = cache.generation
+    obj = session.get(model, pk)
+    if obj is not None:
+        mapper = inspect(model)
+        cache.set(key, {attr.key: getattr(obj, attr.key) for attr in mapper.column_attrs}, generation)
+    return obj
+
+
+def _changed_keys(session):
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, CACHED_MODELS):
+            identity = inspect(obj).identity
+            if identity is not None:
+                yield _cache_key(type(obj), identity[0])
+
+
+def sync_entity_cache():
+    """Clear this worker's cache if another worker on the host has evicted rows"""
+    shared = response_cache.shared()
+    if shared is None:
+        return
+    cache = get_entity_cache()
+    counter = shared.counter('entity_cache')
+    if counter is not None and counter != cache.shared_counter:
+        if cache.shared_counter is not None:
+            cache.clear()
+        cache.shared_counter = counter
+
+
+def _evict_orders(cache, orderids):
+    cache.evict([_cache_key(OrderHeader, orderid) for orderid in orderids])
+    cache.evict_where(OrderDetail, orderid=orderids)
+
+
+def evict_deleted_orders(session, orderids):
+    """
+    Evict deleted orders and every detail the database cascaded away with them
+    ---
+    Called for bulk deletes that bypass the ORM; eviction is repeated on commit
+    like it is for ORM writes.
+    """
+    orderids = set(orderids)
+    cache = current_app.extensions.get('entity_cache')
+    if cache is not None and orderids:
+        _evict_orders(cache, orderids)
+        session.info.setdefault('entity_cache_evicted_orders', set()).update(orderids)
+
+
+def evict_rows(session, model, pks):
+    """
+    Evict rows changed with SQL statements that bypass the ORM
+    ---
+    Eviction is repeated on commit like it is for ORM writes.
+    """
+    cache = current_app.extensions.get('entity_cache')
+    keys = {_cache_key(model, pk) for pk in pks}
+    if cache is not None and keys:
+        cache.evict(keys)
+        session.info.setdefault('entity_cache_evicted', set()).update(keys)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _evict_on_flush(session, flush_context):
+    cache = current_app.extensions.get('entity_cache')
+    if cache is None:
+        return
+    keys = set(_changed_keys(session))
+    if keys:
+        cache.evict(keys)
+        session.info.setdefault('entity_cache_evicted', set()).update(keys)
+    # Their details are deleted by ON DELETE CASCADE without being loaded
+    evict_deleted_orders(session, [obj.orderid for obj in session.deleted if isinstance(obj, OrderHeader)])
+
+
+@event.listens_for(db.session, 'after_commit')
+def _evict_on_commit(session):
+    if not session.info.get(OUTER_TRANSACTION):
+        evict_committed(session)
+
+
+def evict_committed(session):
+    """Repeat the evictions of a session's writes once they are committed"""
+    # Readers may have re-cached the old row between the flush and the commit
+    keys = session.info.pop('entity_cache_evicted', None)
+    orderids = session.info.pop('entity_cache_evicted_orders', None)
+    cache = current_app.extensions.get('entity_cache')
+    if (keys or orderids) and cache is not None:
+        if keys:
+            cache.evict(keys)
+        if orderids:
+            _evict_orders(cache, orderids)
+        shared = response_cache.shared()
+        if shared is not None:
+            shared.bump('entity_cache')
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _forget_on_rollback(session, previous_transaction):
+    session.info.pop('entity_cache_evicted', None)
+    session.info.pop('entity_cache_evicted_orders', None)
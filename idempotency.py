@@ -0,0 +1,139 @@
+# Idempotency-Key support for the create endpoints
+# A client that retries a POST with the same Idempotency-Key gets the response
+# of the first attempt back instead of creating a second order or line.
+# 1. Keys are reserved atomically in a bounded TTL store before the view runs
+# 2. Concurrent duplicates wait for the first request, then replay its response
+# 3. Reusing a key for a different request body is rejected with 422
+# 4. With RESPONSE_CACHE_BACKEND = 'sqlite' the store is shared by all workers
+
+import hashlib
+import os
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, request, jsonify
+
+from cache import MemoryBackend, SQLiteBackend
+
+HEADER = 'Idempotency-Key'
+PENDING = 'pending'
+
+
+class Idempotency:
+    """
+    Decorator replaying stored responses for repeated Idempotency-Key requests
+    ---
+    Config:
+        IDEMPOTENCY_ENABLED: Honour the Idempotency-Key header (default: True)
+        IDEMPOTENCY_TTL: Seconds a response is kept for replay (default: 86400)
+        IDEMPOTENCY_MAX_ENTRIES: Keys kept per store before LRU eviction (default: 10000)
+        IDEMPOTENCY_LOCK_TIMEOUT: Seconds a key stays reserved if its request never finishes (default: 30)
+        IDEMPOTENCY_WAIT_TIMEOUT: Seconds a duplicate waits for the first request (default: 10)
+        IDEMPOTENCY_PATH: File for the shared store (default: instance/idempotency.db)
+    """
+
+    COUNTERS = ('stored', 'replayed', 'waited', 'conflicts', 'mismatches')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def store(self, app=None):
+        app = app or current_app
+        store = app.extensions.get('idempotency')
+        if store is None:
+            options = {
+                'max_entries': app.config.get('IDEMPOTENCY_MAX_ENTRIES', 10000),
+                'default_ttl': app.config.get('IDEMPOTENCY_TTL', 86400),
+            }
+            if app.config.get('RESPONSE_CACHE_BACKEND', 'memory') == 'sqlite':
+                path = app.config.get('IDEMPOTENCY_PATH')
+                if path is None:
+                    os.makedirs(app.instance_path, exist_ok=True)
+                    path = os.path.join(app.instance_path, 'idempotency.db')
+                store = SQLiteBackend(path, **options)
+            else:
+                store = MemoryBackend(**options)
+            store = app.extensions.setdefault('idempotency', store)
+        return store
+
+    def _counts(self):
+        return current_app.extensions.setdefault('idempotency_counts', dict.fromkeys(self.COUNTERS, 0))
+
+    def _count(self, name):
+        with self._lock:
+            self._counts()[name] += 1
+
+    @staticmethod
+    def _error(message, status):
+        response = jsonify({'status': 'error', 'message': message})
+        response.status_code = status
+        return response
+
+    def _replay(self, entry, fingerprint):
+        _, stored_fingerprint, body, status, headers = entry
+        if stored_fingerprint != fingerprint:
+            self._count('mismatches')
+            return self._error(f'{HEADER} was already used for a different request', 422)
+        self._count('replayed')
+        response = current_app.response_class(body, status=status, headers=headers)
+        response.headers['Idempotent-Replayed'] = 'true'
+        return response
+
+    def idempotent(self, view):
+        """Make a POST view safe to retry with an Idempotency-Key header"""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get(HEADER)
+            if not key or not current_app.config.get('IDEMPOTENCY_ENABLED', True):
+                return view(*args, **kwargs)
+            if len(key) > 255:
+                return self._error(f'{HEADER} must be at most 255 characters', 400)
+
+            store = self.store()
+            store_key = f'{request.method} {request.path} {key}'
+            fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+            lock_timeout = current_app.config.get('IDEMPOTENCY_LOCK_TIMEOUT', 30)
+            deadline = time.monotonic() + current_app.config.get('IDEMPOTENCY_WAIT_TIMEOUT', 10)
+
+            waited = False
+            while not store.add(store_key, (PENDING, fingerprint), ttl=lock_timeout):
+                entry = store.get(store_key)
+                if entry is not None and entry[0] != PENDING:
+                    return self._replay(entry, fingerprint)
+                if entry is not None and entry[1] != fingerprint:
+                    self._count('mismatches')
+                    return self._error(f'{HEADER} was already used for a different request', 422)
+                if time.monotonic() >= deadline:
+                    self._count('conflicts')
+                    response = self._error(f'A request with this {HEADER} is still in progress', 409)
+                    response.headers['Retry-After'] = '1'
+                    return response
+                if not waited:
+                    waited = True
+                    self._count('waited')
+                time.sleep(0.02)
+
+            try:
+                response = current_app.make_response(view(*args, **kwargs))
+            except BaseException:
+                store.delete(store_key)
+                raise
+            if response.status_code >= 500 or response.is_streamed:
+                # Let the client retry a failure for real
+                store.delete(store_key)
+                return response
+            store.set(store_key, ('done', fingerprint, response.get_data(),
+                                  response.status_code, list(response.headers)))
+            self._count('stored')
+            return response
+        return wrapper
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counts())
+        stats['size'] = self.store().stats()['size']
+        return stats
+
+
+idempotency = Idempotency()
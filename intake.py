@@ -0,0 +1,273 @@
+# Asynchronous order intake
+# With "Prefer: respond-async", create requests are validated, stored as an
+# IntakeJob row and answered with 202 straight away. A background worker drains
+# queued jobs in batches, applying each one and recording its outcome, which
+# clients poll at GET /api/jobs/<jobid>.
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import select, update, delete, func
+
+from models import db, OrderHeader, OrderDetail, IntakeJob, utcnow
+from cache import response_cache, order_tags, order_list_tags
+from outbox import prune_events
+from write_batcher import run_write
+
+
+def insert_order(customer_id, orderdate):
+    """Write operation adding an order; returns a callable for its dict once flushed"""
+    def operation(session):
+        new_order = OrderHeader(
+            ordercustomerid=customer_id,
+            orderdate=orderdate
+        )
+        session.add(new_order)
+        return new_order.to_dict
+    return operation
+
+
+def insert_detail(orderid, item_id, quantity, unitrate):
+    """Write operation adding an order detail, with rowtotal calculated as quantity * unitrate"""
+    def operation(session):
+        new_detail = OrderDetail(
+            orderid=orderid,
+            orderitemid=item_id,
+            quantity=quantity,
+            unitrate=unitrate,
+            rowtotal=quantity * unitrate
+        )
+        session.add(new_detail)
+        return new_detail.to_dict
+    return operation
+
+
+def _apply_order(session, payload):
+    operation = insert_order(payload['ordercustomerid'], datetime.fromisoformat(payload['orderdate']))
+    return operation(session), order_list_tags(payload['ordercustomerid'])
+
+
+def _apply_detail(session, payload):
+    # The order may have been deleted while the job was queued
+    if session.get(OrderHeader, payload['orderid']) is None:
+        raise LookupError('Order not found')
+    operation = insert_detail(payload['orderid'], payload['orderitemid'],
+                              payload['quantity'], payload['unitrate'])
+    return operation(session), order_tags(payload['orderid'])
+
+
+JOB_KINDS = {
+    'order': _apply_order,
+    'detail': _apply_detail,
+}
+
+
+class IntakeWorker:
+    """
+    Background thread applying queued intake jobs in batches
+    ---
+    Jobs are claimed with a single UPDATE ... RETURNING and applied in the same
+    transaction that records their outcome, so a job is applied exactly once even
+    with several worker processes, and a crash leaves it queued for the next run.
+    Each job runs in its own savepoint so one failure doesn't fail the batch.
+    Between batches it prunes old jobs and outbox events every ``prune_interval``
+    seconds; None leaves that to the prune CLI command. API requests start the
+    worker once a prune is due, so processes that never queue a job prune too.
+    """
+
+    def __init__(self, app, batch_size=100, poll_interval=1.0, prune_interval=3600):
+        self.app = app
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.prune_interval = prune_interval
+        self._next_prune = time.monotonic() + (prune_interval or 0)
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.batches = 0
+        self.applied = 0
+        self.failed = 0
+        self.errors = 0
+
+    def wake(self):
+        """Start the worker if needed and have it look for queued jobs now"""
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='intake-worker', daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            while self.drain() == self.batch_size:
+                pass
+            if self.prune_interval is not None and time.monotonic() >= self._next_prune:
+                self._next_prune = time.monotonic() + self.prune_interval
+                self.prune()
+
+    def prune_due(self):
+        """Start the worker if a prune is due"""
+        if self.prune_interval is not None and time.monotonic() >= self._next_prune:
+            self.wake()
+
+    def prune(self):
+        """Delete finished jobs and outbox events past their retention"""
+        with self.app.app_context():
+            try:
+                prune_history(self.app)
+            except Exception:
+                db.session.rollback()
+                self.errors += 1
+            finally:
+                db.session.remove()
+
+    def drain(self):
+        """Apply one batch of queued jobs and return how many were claimed"""
+        with self.app.app_context():
+            try:
+                return self._drain()
+            except Exception:
+                db.session.rollback()
+                self.errors += 1
+                return 0
+            finally:
+                db.session.remove()
+
+    def _drain(self):
+        session = db.session
+        oldest = (select(IntakeJob.jobid)
+                  .where(IntakeJob.status == 'queued', IntakeJob.kind.in_(JOB_KINDS))
+                  .order_by(IntakeJob.jobid)
+                  .limit(self.batch_size))
+        # 'running' is only ever seen inside this transaction; the jobs are
+        # back to 'queued' if it rolls back
+        jobs = session.scalars(
+            update(IntakeJob)
+            .where(IntakeJob.jobid.in_(oldest))
+            .values(status='running')
+            .returning(IntakeJob)
+            .execution_options(synchronize_session=False)
+        ).all()
+        if not jobs:
+            session.rollback()
+            return 0
+
+        tags = set()
+        for job in sorted(jobs, key=lambda job: job.jobid):
+            try:
+                with session.begin_nested():
+                    finish, job_tags = JOB_KINDS[job.kind](session, job.payload)
+                job.result = finish()
+                job.status = 'done'
+                tags.update(job_tags)
+            except Exception as e:
+                job.status = 'failed'
+                job.error = str(e)
+            job.completed_at = utcnow()
+        session.commit()
+
+        self.batches += 1
+        self.applied += sum(job.status == 'done' for job in jobs)
+        self.failed += sum(job.status == 'failed' for job in jobs)
+        if tags:
+            response_cache.invalidate(*tags)
+        return len(jobs)
+
+    def stats(self):
+        queued = db.session.scalar(
+            select(func.count()).select_from(IntakeJob)
+            .where(IntakeJob.status == 'queued', IntakeJob.kind.in_(JOB_KINDS)))
+        return {
+            'queued': queued,
+            'batches': self.batches,
+            'applied': self.applied,
+            'failed': self.failed,
+            'errors': self.errors,
+        }
+
+
+def get_intake_worker(app=None):
+    """The app's intake worker, created on first use"""
+    app = app or current_app._get_current_object()
+    worker = app.extensions.get('intake_worker')
+    if worker is None:
+        worker = app.extensions.setdefault('intake_worker', IntakeWorker(
+            app,
+            batch_size=app.config.get('INTAKE_BATCH_SIZE', 100),
+            poll_interval=app.config.get('INTAKE_POLL_INTERVAL', 1.0),
+            prune_interval=app.config.get('PRUNE_INTERVAL', 3600)))
+    return worker
+
+
+def prune_when_due(response):
+    """after_request hook having the intake worker prune every PRUNE_INTERVAL seconds"""
+    get_intake_worker().prune_due()
+    return response
+
+
+def prune_jobs(before, chunk_size=5000):
+    """Delete done and failed jobs completed before ``before``, in chunks; returns how many"""
+    deleted = 0
+    while True:
+        oldest = (select(IntakeJob.jobid)
+                  .where(IntakeJob.status.in_(('done', 'failed')), IntakeJob.completed_at < before)
+                  .order_by(IntakeJob.jobid)
+                  .limit(chunk_size))
+        count = db.session.execute(delete(IntakeJob).where(IntakeJob.jobid.in_(oldest))).rowcount
+        db.session.commit()
+        deleted += count
+        if count < chunk_size:
+            return deleted
+
+
+def prune_history(app=None):
+    """
+    Delete outbox events and finished jobs older than their retention
+    ---
+    Returns:
+        (events deleted, jobs deleted)
+    Config:
+        OUTBOX_RETENTION_DAYS: Days change feed events are kept; None keeps them all (default: 7)
+        JOB_RETENTION_DAYS: Days done and failed jobs stay readable at /api/jobs (default: 7)
+        PRUNE_INTERVAL: Seconds between prunes by the intake worker; None disables them (default: 3600)
+    """
+    app = app or current_app
+    events = jobs = 0
+    now = utcnow()
+    outbox_days = app.config.get('OUTBOX_RETENTION_DAYS', 7)
+    if outbox_days is not None:
+        events = prune_events(now - timedelta(days=outbox_days))
+    job_days = app.config.get('JOB_RETENTION_DAYS', 7)
+    if job_days is not None:
+        jobs = prune_jobs(now - timedelta(days=job_days))
+    return events, jobs
+
+
+def enqueue(kind, payload):
+    """
+    Store a validated create request as a queued job and wake the worker
+    ---
+    Parameters:
+        kind: 'order' or 'detail'
+        payload: JSON-serializable values the job is applied with
+    Returns:
+        The job as a dict
+    Config:
+        INTAKE_BATCH_SIZE: Most jobs applied per transaction (default: 100)
+        INTAKE_POLL_INTERVAL: Seconds between checks for jobs left by other processes (default: 1.0)
+    """
+    def insert_job(session):
+        job = IntakeJob(kind=kind, payload=payload)
+        session.add(job)
+        return job.to_dict
+
+    job = run_write(insert_job)
+    get_intake_worker().wake()
+    return job
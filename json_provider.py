@@ -0,0 +1,152 @@
+# JSON encoding for API responses
+# 1. OrderJSONProvider uses orjson when it is installed and falls back to the stdlib
+# 2. rows_response() encodes result rows straight to bytes, skipping to_dict()
+
+import math
+from datetime import date, datetime
+
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson is an optional speedup
+    orjson = None
+
+# Place this string in an envelope passed to rows_response() to mark where the
+# encoded rows should go
+ROWS = '__rows__'
+
+
+class OrderJSONProvider(DefaultJSONProvider):
+    """JSON provider that uses orjson when available.
+
+    Dates are still rendered by ``default`` and keys are sorted when
+    ``sort_keys`` is set, but orjson writes non-ASCII text as UTF-8 instead of
+    applying ``ensure_ascii``, and non-finite floats as null. Anything orjson
+    can't handle (odd keyword arguments, huge ints, non-string keys) goes
+    through the stdlib encoder.
+    """
+
+    def _orjson_option(self, kwargs):
+        if orjson is None:
+            return None
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_SUBCLASS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        for key, value in kwargs.items():
+            if key == 'indent' and value == 2:
+                option |= orjson.OPT_INDENT_2
+            elif key == 'separators' and tuple(value) == (',', ':'):
+                continue
+            else:
+                return None
+        return option
+
+    def _dumps_bytes(self, obj, **kwargs):
+        option = self._orjson_option(kwargs)
+        if option is not None:
+            try:
+                return orjson.dumps(obj, default=self.default, option=option)
+            except (orjson.JSONEncodeError, TypeError):
+                pass
+        return super().dumps(obj, **kwargs).encode('utf-8')
+
+    def dumps(self, obj, **kwargs):
+        return self._dumps_bytes(obj, **kwargs).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            try:
+                return orjson.loads(s)
+            except orjson.JSONDecodeError:
+                pass  # let the stdlib raise its usual error
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            body = self._dumps_bytes(obj, indent=2)
+        else:
+            body = self._dumps_bytes(obj, separators=(',', ':'))
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
+
+
+# ============================================================================
+# Row fast path
+# ============================================================================
+def _encode_number(value):
+    # inf and nan have no JSON form; write null like orjson does
+    if value is None or (isinstance(value, float) and not math.isfinite(value)):
+        return 'null'
+    return repr(value)
+
+
+def _encode_datetime(value):
+    return 'null' if value is None else '"' + value.isoformat() + '"'
+
+
+def _encode_other(value):
+    if isinstance(value, (date, datetime)):
+        return _encode_datetime(value)
+    return current_app.json.dumps(value)
+
+
+def _encoder_for(column):
+    try:
+        python_type = column.type.python_type
+    except (AttributeError, NotImplementedError):
+        return _encode_other
+    if python_type in (int, float):
+        return _encode_number
+    if python_type in (date, datetime):
+        return _encode_datetime
+    return _encode_other
+
+
+def encode_rows(columns, rows):
+    """
+    Encode result rows as a JSON array of objects
+    ---
+    Parameters:
+        columns: SQLAlchemy columns, in the same order as the values in each row
+        rows: Iterable of tuples (e.g. the result of db.session.execute(select(...)))
+    Returns:
+        The encoded array as bytes, with keys named after the columns
+    """
+    if current_app.json.sort_keys:
+        order = sorted(range(len(columns)), key=lambda i: columns[i].key)
+    else:
+        order = list(range(len(columns)))
+
+    template = '{' + ','.join(
+        '"%s":%%s' % columns[i].key for i in order) + '}'
+    encoders = [(i, _encoder_for(columns[i])) for i in order]
+
+    return ('[' + ','.join(
+        template % tuple(encode(row[i]) for i, encode in encoders)
+        for row in rows
+    ) + ']').encode('utf-8')
+
+
+def rows_response(columns, rows, envelope=ROWS, status=200):
+    """
+    Build a JSON response from result rows without creating a dict per row
+    ---
+    Parameters:
+        columns: SQLAlchemy columns selected, in row order
+        rows: Iterable of result rows
+        envelope (optional): Object wrapping the rows, with ROWS where the array goes
+        status (optional): HTTP status code (default: 200)
+    Returns:
+        A Response with the same body jsonify() would produce (in compact form)
+    """
+    body = encode_rows(columns, rows)
+    if envelope is not ROWS:
+        marker = current_app.json.dumps(ROWS).encode('utf-8')
+        wrapper = current_app.json.dumps(envelope, separators=(',', ':')).encode('utf-8')
+        head, _, tail = wrapper.partition(marker)
+        body = head + body + tail
+
+    return current_app.response_class(
+        body + b'\n', status=status, mimetype=current_app.json.mimetype)
@@ -1,72 +1,195 @@
-from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime, timezone
-
-db = SQLAlchemy()
-
-class OrderHeader(db.Model):
-    __tablename__ = 'order_headers'
-    
-    orderid = db.Column(db.Integer, primary_key=True)
-    orderdate = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
-    ordercustomerid = db.Column(db.Integer, nullable=False)
-    details = db.relationship('OrderDetail', backref='header', lazy=True, cascade="all, delete-orphan")
-
-    def to_dict(self):
-        return {
-            'orderid': self.orderid,
-            'orderdate': self.orderdate.isoformat(),
-            'ordercustomerid': self.ordercustomerid
-        }
-    
-    @classmethod
-    def from_dict(cls, data):
-        """Create an OrderHeader from a dictionary"""
-        if 'orderdate' in data and isinstance(data['orderdate'], str):
-            try:
-                orderdate = datetime.fromisoformat(data['orderdate'])
-            except ValueError:
-                orderdate = datetime.now(timezone.utc)
-        else:
-            orderdate = datetime.now(timezone.utc)
-            
-        return cls(
-            orderid=data.get('orderid'),
-            ordercustomerid=data.get('ordercustomerid'),
-            orderdate=orderdate
-        )
-
-class OrderDetail(db.Model):
-    __tablename__ = 'order_details'
-    
-    orderdetailid = db.Column(db.Integer, primary_key=True)
-    orderid = db.Column(db.Integer, db.ForeignKey('order_headers.orderid'), nullable=False)
-    orderitemid = db.Column(db.Integer, nullable=False)
-    quantity = db.Column(db.Float, nullable=False)
-    unitrate = db.Column(db.Float, nullable=False)
-    rowtotal = db.Column(db.Float, nullable=False)
-
-    def to_dict(self):
-        return {
-            'orderdetailid': self.orderdetailid,
-            'orderid': self.orderid,
-            'orderitemid': self.orderitemid,
-            'quantity': self.quantity,
-            'unitrate': self.unitrate,
-            'rowtotal': self.rowtotal
-        }
-        
-    @classmethod
-    def from_dict(cls, data):
-        """Create an OrderDetail from a dictionary"""
-        quantity = float(data.get('quantity', 0))
-        unitrate = float(data.get('unitrate', 0))
-        rowtotal = quantity * unitrate
-        
-        return cls(
-            orderdetailid=data.get('orderdetailid'),
-            orderid=data.get('orderid'),
-            orderitemid=data.get('orderitemid'),
-            quantity=quantity,
-            unitrate=unitrate,
-            rowtotal=rowtotal
-        )
+from flask_sqlalchemy import SQLAlchemy
+import sqlite3
+from datetime import datetime, timezone
+from itertools import chain
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+db = SQLAlchemy()
+
+# session.info flag of a session whose commits only release savepoints of an
+# enclosing transaction (atomic API batches); commit hooks wait for the real commit
+OUTER_TRANSACTION = 'outer_transaction'
+
+@event.listens_for(Engine, 'connect')
+def enable_foreign_keys(dbapi_connection, connection_record):
+    """SQLite leaves foreign keys (and so ON DELETE CASCADE) off unless asked per connection"""
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA foreign_keys = ON')
+        cursor.close()
+
+def utcnow():
+    return datetime.now(timezone.utc)
+
+class OrderHeader(db.Model):
+    __tablename__ = 'order_headers'
+    
+    orderid = db.Column(db.Integer, primary_key=True)
+    orderdate = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    ordercustomerid = db.Column(db.Integer, nullable=False)
+    # Bumped on every change to the order or its details, used for ETag / Last-Modified
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    updated_at = db.Column(db.DateTime, nullable=False, default=utcnow, server_default=db.func.current_timestamp())
+    # Details are deleted by the database (ON DELETE CASCADE), not loaded and deleted one by one
+    details = db.relationship('OrderDetail', backref='header', lazy=True, cascade="all, delete-orphan",
+                              passive_deletes=True)
+
+    __table_args__ = (
+        # Covers the customer_id filter and the orderdate sort in get_orders
+        db.Index('ix_order_headers_customer_date', 'ordercustomerid', 'orderdate'),
+        db.Index('ix_order_headers_orderdate', 'orderdate'),
+    )
+
+    def to_dict(self):
+        return {
+            'orderid': self.orderid,
+            'orderdate': self.orderdate.isoformat(),
+            'ordercustomerid': self.ordercustomerid
+        }
+    
+    @classmethod
+    def from_dict(cls, data):
+        """Create an OrderHeader from a dictionary"""
+        if 'orderdate' in data and isinstance(data['orderdate'], str):
+            try:
+                orderdate = datetime.fromisoformat(data['orderdate'])
+            except ValueError:
+                orderdate = datetime.now(timezone.utc)
+        else:
+            orderdate = datetime.now(timezone.utc)
+            
+        return cls(
+            orderid=data.get('orderid'),
+            ordercustomerid=data.get('ordercustomerid'),
+            orderdate=orderdate
+        )
+
+class OrderDetail(db.Model):
+    __tablename__ = 'order_details'
+    
+    orderdetailid = db.Column(db.Integer, primary_key=True)
+    orderid = db.Column(db.Integer, db.ForeignKey('order_headers.orderid', ondelete='CASCADE'), nullable=False)
+    orderitemid = db.Column(db.Integer, nullable=False)
+    quantity = db.Column(db.Float, nullable=False)
+    unitrate = db.Column(db.Float, nullable=False)
+    rowtotal = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_order_details_orderid', 'orderid'),
+        # Repricing walks an item's lines in id order, chunk by chunk
+        db.Index('ix_order_details_item', 'orderitemid', 'orderdetailid'),
+        # One line per item on an order; repeat adds go through the upsert endpoint
+        db.Index('ux_order_details_order_item', 'orderid', 'orderitemid', unique=True),
+    )
+
+    def to_dict(self):
+        return {
+            'orderdetailid': self.orderdetailid,
+            'orderid': self.orderid,
+            'orderitemid': self.orderitemid,
+            'quantity': self.quantity,
+            'unitrate': self.unitrate,
+            'rowtotal': self.rowtotal
+        }
+        
+    @classmethod
+    def from_dict(cls, data):
+        """Create an OrderDetail from a dictionary"""
+        quantity = float(data.get('quantity', 0))
+        unitrate = float(data.get('unitrate', 0))
+        rowtotal = quantity * unitrate
+        
+        return cls(
+            orderdetailid=data.get('orderdetailid'),
+            orderid=data.get('orderid'),
+            orderitemid=data.get('orderitemid'),
+            quantity=quantity,
+            unitrate=unitrate,
+            rowtotal=rowtotal
+        )
+
+def is_duplicate_line(error):
+    """Whether an IntegrityError is ux_order_details_order_item refusing a second line for an item"""
+    # SQLite reports a unique index by its columns, not its name
+    return 'UNIQUE constraint failed: order_details.orderid, order_details.orderitemid' in str(error.orig)
+
+class IntakeJob(db.Model):
+    """An order or detail create accepted with 202 and applied by the intake worker, or a repricing run"""
+    __tablename__ = 'intake_jobs'
+
+    jobid = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(16), nullable=False)  # 'order', 'detail' or 'reprice'
+    payload = db.Column(db.JSON, nullable=False)
+    status = db.Column(db.String(16), nullable=False, default='queued')  # queued, running, done, failed
+    result = db.Column(db.JSON)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+    # A running repricing touches it with every chunk, so a stalled one can be reclaimed
+    updated_at = db.Column(db.DateTime, default=utcnow, onupdate=utcnow)
+    completed_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        # The worker claims the oldest queued jobs
+        db.Index('ix_intake_jobs_status', 'status', 'jobid'),
+    )
+
+    def to_dict(self):
+        return {
+            'jobid': self.jobid,
+            'kind': self.kind,
+            'status': self.status,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None
+        }
+
+class OutboxEvent(db.Model):
+    """A change to an order or detail, written in the same transaction as the change itself"""
+    __tablename__ = 'outbox_events'
+
+    # The change feed cursor; AUTOINCREMENT so a deleted tail is never handed out again
+    seq = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(16), nullable=False)  # 'order' or 'detail'
+    entityid = db.Column(db.Integer, nullable=False)
+    orderid = db.Column(db.Integer, nullable=False)
+    customerid = db.Column(db.Integer)  # lets subscribers filter detail events by customer
+    op = db.Column(db.String(16), nullable=False)  # created, updated or deleted
+    data = db.Column(db.JSON)  # the row after the change; None when deleted
+    created_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    def to_dict(self):
+        return {
+            'seq': self.seq,
+            'entity': self.entity,
+            'entityid': self.entityid,
+            'orderid': self.orderid,
+            'customerid': self.customerid,
+            'op': self.op,
+            'data': self.data,
+            'created_at': self.created_at.isoformat()
+        }
+
+def touch_order(order):
+    """Mark an order as changed; the increment runs in SQL so concurrent writers can't lose one"""
+    order.version = OrderHeader.version + 1
+    order.updated_at = utcnow()
+
+@event.listens_for(db.session, 'before_flush')
+def bump_order_versions(session, flush_context, instances):
+    """Bump the version of every order whose header or details are being changed"""
+    orderids = set()
+    for obj in chain(session.dirty, session.new, session.deleted):
+        if isinstance(obj, OrderDetail) and obj.orderid is not None:
+            orderids.add(obj.orderid)
+        elif (isinstance(obj, OrderHeader) and obj in session.dirty
+                and session.is_modified(obj, include_collections=False)):
+            orderids.add(obj.orderid)
+
+    for orderid in orderids:
+        order = session.get(OrderHeader, orderid)
+        if order is not None and order not in session.deleted:
+            touch_order(order)
@@ -0,0 +1,196 @@
+# Transactional outbox and change feed
+# Every flush that creates, updates or deletes an order or detail appends an
+# OutboxEvent in the same transaction, so an event exists if and only if the
+# change committed. Consumers read GET /api/changes?since=<seq> instead of
+# re-listing and diffing orders; waiting readers are woken when events commit.
+
+import threading
+
+from flask import current_app
+from sqlalchemy import event, insert, delete, inspect, select, literal, null
+
+from models import db, OrderHeader, OrderDetail, OutboxEvent, utcnow, OUTER_TRANSACTION
+
+# Header columns a client can change; version and updated_at move with every detail write
+HEADER_FIELDS = ('orderdate', 'ordercustomerid')
+
+
+class ChangeFeed:
+    """
+    Wakes long-polling readers of this process when events are committed
+    ---
+    A waiting reader holds a server thread, so at most ``max_waiters`` may
+    wait at once; the rest are told to come back later.
+    """
+
+    def __init__(self, max_waiters=100):
+        self._condition = threading.Condition()
+        self.version = 0
+        self.max_waiters = max_waiters
+        self.waiters = 0
+        self.turned_away = 0
+
+    def join(self):
+        """Count in a reader about to wait; False if ``max_waiters`` already are"""
+        with self._condition:
+            if self.waiters >= self.max_waiters:
+                self.turned_away += 1
+                return False
+            self.waiters += 1
+            return True
+
+    def leave(self):
+        with self._condition:
+            self.waiters -= 1
+
+    def stats(self):
+        return {'waiting': self.waiters, 'turned_away': self.turned_away}
+
+    def notify(self):
+        with self._condition:
+            self.version += 1
+            self._condition.notify_all()
+
+    def wait(self, version, timeout):
+        """Wait until events commit after ``version`` was read, or ``timeout`` passes"""
+        with self._condition:
+            return self._condition.wait_for(lambda: self.version != version, timeout)
+
+
+def get_change_feed(app=None):
+    """The app's change feed, created on first use"""
+    app = app or current_app
+    feed = app.extensions.get('change_feed')
+    if feed is None:
+        feed = app.extensions.setdefault('change_feed', ChangeFeed(
+            max_waiters=app.config.get('CHANGES_MAX_WAITERS', 100)))
+    return feed
+
+
+def change_event(session, obj, op):
+    """Outbox row values for an order or detail that was created, updated or deleted"""
+    if isinstance(obj, OrderHeader):
+        entity, entityid, header = 'order', obj.orderid, obj
+    else:
+        # A header deleted in the same flush is only reachable through the loaded relationship
+        entity, entityid = 'detail', obj.orderdetailid
+        header = inspect(obj).dict.get('header') or session.get(OrderHeader, obj.orderid)
+    return {
+        'entity': entity,
+        'entityid': entityid,
+        'orderid': obj.orderid,
+        'customerid': header.ordercustomerid if header is not None else None,
+        'op': op,
+        'data': None if op == 'deleted' else obj.to_dict(),
+        'created_at': utcnow(),
+    }
+
+
+def record_changes(session, events):
+    """
+    Append change events in the session's current transaction
+    ---
+    The flush listener covers ORM writes; bulk SQL writes that bypass the ORM
+    call this with their own events.
+    """
+    if events:
+        session.connection().execute(insert(OutboxEvent), events)
+        session.info['outbox_written'] = True
+
+
+def record_order_deletes(session, where, include_orders=True):
+    """
+    Append 'deleted' events for the orders matching ``where`` and all their details
+    ---
+    Must run before the orders are deleted; with ON DELETE CASCADE the details are
+    never loaded, so their events are copied over with INSERT ... SELECT instead.
+    Parameters:
+        where: Condition on OrderHeader selecting the orders being deleted
+        include_orders: Also record the orders (bulk deletes); ORM deletes record them on flush
+    """
+    columns = ['entity', 'entityid', 'orderid', 'customerid', 'op', 'data', 'created_at']
+    now = literal(utcnow(), OutboxEvent.created_at.type)
+    details = (select(literal('detail'), OrderDetail.orderdetailid, OrderDetail.orderid,
+                      OrderHeader.ordercustomerid, literal('deleted'), null(), now)
+               .join_from(OrderDetail, OrderHeader)
+               .where(where)
+               .order_by(OrderDetail.orderdetailid))
+    connection = session.connection()
+    connection.execute(insert(OutboxEvent).from_select(columns, details))
+    if include_orders:
+        orders = (select(literal('order'), OrderHeader.orderid, OrderHeader.orderid,
+                         OrderHeader.ordercustomerid, literal('deleted'), null(), now)
+                  .where(where)
+                  .order_by(OrderHeader.orderid))
+        connection.execute(insert(OutboxEvent).from_select(columns, orders))
+    session.info['outbox_written'] = True
+
+
+def _changed(session, obj):
+    if isinstance(obj, OrderHeader):
+        state = inspect(obj)
+        return any(state.attrs[field].history.has_changes() for field in HEADER_FIELDS)
+    return session.is_modified(obj, include_collections=False)
+
+
+@event.listens_for(db.session, 'before_flush')
+def _record_cascaded_deletes(session, flush_context, instances):
+    orderids = [obj.orderid for obj in session.deleted if isinstance(obj, OrderHeader)]
+    if orderids:
+        # Details in a loaded collection are deleted by the ORM and recorded on flush
+        deleted = [obj.orderdetailid for obj in session.deleted if isinstance(obj, OrderDetail)]
+        record_order_deletes(session, OrderHeader.orderid.in_(orderids)
+                             & OrderDetail.orderdetailid.notin_(deleted), include_orders=False)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _record_on_flush(session, flush_context):
+    events = []
+    for op, objects in (('created', session.new), ('updated', session.dirty), ('deleted', session.deleted)):
+        changed = [change_event(session, obj, op) for obj in objects
+                   if isinstance(obj, (OrderHeader, OrderDetail)) and (op != 'updated' or _changed(session, obj))]
+        # Orders before their details, except that details go before the order they were deleted with
+        changed.sort(key=lambda e: ((e['entity'] == 'order') == (op == 'deleted'), e['entityid']))
+        events.extend(changed)
+    record_changes(session, events)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _notify_on_commit(session):
+    if session.info.get(OUTER_TRANSACTION):
+        return  # the events aren't visible yet
+    if session.info.pop('outbox_written', False):
+        get_change_feed().notify()
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _forget_on_rollback(session, previous_transaction):
+    if not session.in_transaction():
+        session.info.pop('outbox_written', None)
+
+
+def read_changes(since, limit):
+    """Events after cursor ``since`` in commit order, read as a primary key range scan"""
+    return db.session.scalars(
+        select(OutboxEvent).where(OutboxEvent.seq > since).order_by(OutboxEvent.seq).limit(limit)).all()
+
+
+def prune_events(before, chunk_size=5000):
+    """
+    Delete events created before ``before`` and return how many were deleted
+    ---
+    Deletes run oldest first in chunks of ``chunk_size``, each in its own short
+    transaction, so writers aren't held off the database while a backlog goes.
+    A reader whose cursor is older than what is left skips the pruned events.
+    """
+    deleted = 0
+    while True:
+        oldest = (select(OutboxEvent.seq)
+                  .where(OutboxEvent.created_at < before)
+                  .order_by(OutboxEvent.seq)
+                  .limit(chunk_size))
+        count = db.session.execute(delete(OutboxEvent).where(OutboxEvent.seq.in_(oldest))).rowcount
+        db.session.commit()
+        deleted += count
+        if count < chunk_size:
+            return deleted
@@ -0,0 +1,226 @@
+# Mass repricing of an item across orders
+# A price change for one item can touch a large share of order_details. Doing it
+# in one UPDATE would hold the SQLite write lock until every row is rewritten, so
+# a background worker applies it in chunks instead: each chunk is one set-based
+# UPDATE ... RETURNING over the next range of detail ids for the item (walked
+# with the (orderitemid, orderdetailid) index) and commits on its own, with a
+# short pause between chunks to let other writers in. Progress is stored on the
+# job row, which clients poll at GET /api/jobs/<jobid>. A job whose worker died
+# stops making progress; once its lease runs out any worker resumes it from the
+# stored cursor.
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import select, update, func, literal, or_, and_
+
+from models import db, OrderHeader, OrderDetail, IntakeJob, utcnow
+from cache import response_cache, order_tags
+from entity_cache import evict_rows
+from outbox import record_changes
+from updates import DETAIL_RETURNING, detail_row, row_event, bump_versions
+from write_batcher import run_write
+
+JOB_KIND = 'reprice'
+
+
+def _conditions(payload):
+    """Conditions on OrderDetail (and OrderHeader if filtered) selecting the lines to reprice"""
+    conditions = [OrderDetail.orderitemid == payload['orderitemid'],
+                  OrderDetail.unitrate != payload['unitrate']]
+    if payload.get('customer_id'):
+        conditions.append(OrderHeader.ordercustomerid == payload['customer_id'])
+    if payload.get('since'):
+        conditions.append(OrderHeader.orderdate >= datetime.fromisoformat(payload['since']))
+    if payload.get('before'):
+        conditions.append(OrderHeader.orderdate < datetime.fromisoformat(payload['before']))
+    return conditions
+
+
+def _lines(payload):
+    # Never correlated to the UPDATE's own order_details
+    query = select(OrderDetail.orderdetailid).where(*_conditions(payload)).correlate(None)
+    if any(payload.get(key) for key in ('customer_id', 'since', 'before')):
+        query = query.join_from(OrderDetail, OrderHeader)
+    return query
+
+
+class Repricer:
+    """
+    Background thread applying queued repricing jobs chunk by chunk
+    ---
+    Each chunk's UPDATE, version bumps, outbox events and progress commit
+    together, so a job's progress always matches the rows already repriced.
+    """
+
+    def __init__(self, app, chunk_size=500, pause=0.05, poll_interval=1.0, lease=60.0):
+        self.app = app
+        self.chunk_size = chunk_size
+        self.pause = pause
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.jobs = 0
+        self.resumed = 0
+        self.chunks = 0
+        self.updated = 0
+        self.errors = 0
+
+    def wake(self):
+        """Start the worker if needed and have it look for queued jobs now"""
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='repricer', daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            while self.drain():
+                pass
+
+    def drain(self):
+        """Run the oldest queued or stalled repricing job to completion; returns whether there was one"""
+        with self.app.app_context():
+            try:
+                jobid = self._claim()
+                if jobid is None:
+                    return False
+                self._reprice(jobid)
+                return True
+            except Exception:
+                db.session.rollback()
+                self.errors += 1
+                return False
+            finally:
+                db.session.remove()
+
+    def _claim(self):
+        session = db.session
+        stalled = and_(IntakeJob.status == 'running',
+                       or_(IntakeJob.updated_at.is_(None),
+                           IntakeJob.updated_at < utcnow() - timedelta(seconds=self.lease)))
+        oldest = (select(IntakeJob.jobid)
+                  .where(or_(IntakeJob.status == 'queued', stalled), IntakeJob.kind == JOB_KIND)
+                  .order_by(IntakeJob.jobid)
+                  .limit(1))
+        jobid = session.scalar(
+            update(IntakeJob)
+            .where(IntakeJob.jobid.in_(oldest))
+            .values(status='running')
+            .returning(IntakeJob.jobid)
+            .execution_options(synchronize_session=False))
+        session.commit()
+        return jobid
+
+    def _reprice(self, jobid):
+        session = db.session
+        job = session.get(IntakeJob, jobid)
+        payload = job.payload
+        try:
+            progress = job.result
+            if progress:
+                # Left running by a worker that died; lines up to the cursor are done
+                self.resumed += 1
+            else:
+                matched = session.scalar(select(func.count()).select_from(_lines(payload).subquery()))
+                progress = {'matched': matched, 'updated': 0, 'chunks': 0, 'cursor': 0}
+                job.result = progress
+                session.commit()
+            unitrate = literal(payload['unitrate'], OrderDetail.unitrate.type)
+            while True:
+                chunk = (_lines(payload)
+                         .where(OrderDetail.orderdetailid > progress['cursor'])
+                         .order_by(OrderDetail.orderdetailid)
+                         .limit(self.chunk_size))
+                rows = session.execute(
+                    update(OrderDetail)
+                    .where(OrderDetail.orderdetailid.in_(chunk))
+                    .values(unitrate=unitrate, rowtotal=OrderDetail.quantity * unitrate)
+                    .returning(*DETAIL_RETURNING)
+                    .execution_options(synchronize_session=False)).all()
+                if not rows:
+                    break
+                details = [detail_row(row) for row in rows]
+                orderids = {detail['orderid'] for detail in details}
+                customers = bump_versions(session, orderids)
+                evict_rows(session, OrderDetail, [detail['orderdetailid'] for detail in details])
+                record_changes(session, [row_event('detail', detail, customers.get(detail['orderid']))
+                                         for detail in details])
+                progress = dict(progress, updated=progress['updated'] + len(details),
+                                chunks=progress['chunks'] + 1,
+                                cursor=max(detail['orderdetailid'] for detail in details))
+                job.result = progress
+                session.commit()
+
+                self.chunks += 1
+                self.updated += len(details)
+                response_cache.invalidate(*(f"detail:{detail['orderdetailid']}" for detail in details),
+                                          *(tag for orderid in orderids for tag in order_tags(orderid)))
+                # Let queued writers take the lock between chunks
+                time.sleep(self.pause)
+            job.status = 'done'
+        except Exception as e:
+            session.rollback()
+            job = session.get(IntakeJob, jobid)
+            job.status = 'failed'
+            job.error = str(e)
+        job.completed_at = utcnow()
+        session.commit()
+        self.jobs += 1
+
+    def stats(self):
+        return {
+            'jobs': self.jobs,
+            'resumed': self.resumed,
+            'chunks': self.chunks,
+            'updated': self.updated,
+            'errors': self.errors,
+        }
+
+
+def get_repricer(app=None):
+    """The app's repricing worker, created on first use"""
+    app = app or current_app._get_current_object()
+    repricer = app.extensions.get('repricer')
+    if repricer is None:
+        repricer = app.extensions.setdefault('repricer', Repricer(
+            app,
+            chunk_size=app.config.get('REPRICE_CHUNK_SIZE', 500),
+            pause=app.config.get('REPRICE_PAUSE', 0.05),
+            poll_interval=app.config.get('REPRICE_POLL_INTERVAL', 1.0),
+            lease=app.config.get('REPRICE_LEASE', 60.0)))
+    return repricer
+
+
+def enqueue_reprice(payload):
+    """
+    Store a repricing request as a queued job and wake the worker
+    ---
+    Parameters:
+        payload: orderitemid, unitrate and optional customer_id, since and before (ISO dates)
+    Returns:
+        The job as a dict; its result holds the progress once it starts
+    Config:
+        REPRICE_CHUNK_SIZE: Lines repriced per transaction (default: 500)
+        REPRICE_PAUSE: Seconds to pause between chunks (default: 0.05)
+        REPRICE_POLL_INTERVAL: Seconds between checks for jobs left by other processes (default: 1.0)
+        REPRICE_LEASE: Seconds without progress after which a running job is taken over (default: 60)
+    """
+    def insert_job(session):
+        job = IntakeJob(kind=JOB_KIND, payload=payload)
+        session.add(job)
+        return job.to_dict
+
+    job = run_write(insert_job)
+    get_repricer().wake()
+    return job
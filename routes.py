@@ -1,442 +1,1350 @@
-# Recommendations from: https://www.perplexity.ai/search/can-you-look-at-this-code-and-ZmYi20OySGmGULYqjVFTyA
-# Improvements implemented:
-# 1. Better error handling with try/except blocks
-# 2. Input validation for all endpoints
-# 3. Consistent response format
-# 4. Proper HTTP status codes
-# 5. Transaction management
-
-from flask import Blueprint, request, jsonify
-from models import db, OrderHeader, OrderDetail
-from datetime import datetime, timezone
-from sqlalchemy import select
-
-api_bp = Blueprint('api', __name__)
-
-# ============================================================================
-# Order Header Routes
-# ============================================================================
-@api_bp.route('/orders', methods=['GET'])
-def get_orders():
-    """
-    Get all orders with optional filtering and pagination
-    ---
-    Parameters:
-        customer_id (optional): Filter by customer ID
-        start_date (optional): Filter by orders on or after this date (ISO format)
-        end_date (optional): Filter by orders on or before this date (ISO format)
-        page (optional): Page number for pagination (default: 1)
-        per_page (optional): Items per page (default: 20, max: 100)
-    Returns:
-        A JSON object containing:
-        - items: Array of order headers
-        - total: Total number of matching orders
-        - page: Current page number
-        - pages: Total number of pages
-        - per_page: Items per page
-    """
-    try:
-        # Get query parameters
-        customer_id = request.args.get('customer_id', type=int)
-        start_date_str = request.args.get('start_date')
-        end_date_str = request.args.get('end_date')
-        page = request.args.get('page', 1, type=int)
-        per_page = min(request.args.get('per_page', 20, type=int), 100)  # Limit max per_page to 100
-        
-        # Start with base query
-        query = OrderHeader.query
-        
-        # Apply filters if provided
-        if customer_id:
-            query = query.filter(OrderHeader.ordercustomerid == customer_id)
-            
-        if start_date_str:
-            try:
-                start_date = datetime.fromisoformat(start_date_str)
-                query = query.filter(OrderHeader.orderdate >= start_date)
-            except ValueError:
-                return jsonify({
-                    'status': 'error',
-                    'message': 'Invalid start_date format. Use ISO format (YYYY-MM-DDTHH:MM:SS)'
-                }), 400
-                
-        if end_date_str:
-            try:
-                end_date = datetime.fromisoformat(end_date_str)
-                query = query.filter(OrderHeader.orderdate <= end_date)
-            except ValueError:
-                return jsonify({
-                    'status': 'error',
-                    'message': 'Invalid end_date format. Use ISO format (YYYY-MM-DDTHH:MM:SS)'
-                }), 400
-        
-        # Execute query with pagination
-        paginated_orders = query.order_by(OrderHeader.orderdate.desc()).paginate(
-            page=page, per_page=per_page, error_out=False)
-        
-        # Prepare response
-        return jsonify({
-            'status': 'success',
-            'data': {
-                'items': [order.to_dict() for order in paginated_orders.items],
-                'total': paginated_orders.total,
-                'page': paginated_orders.page,
-                'pages': paginated_orders.pages,
-                'per_page': paginated_orders.per_page
-            }
-        })
-        
-    except Exception as e:
-        return jsonify({'status': 'error', 'message': f'Server error: {str(e)}'}), 500
-
-@api_bp.route('/orders/<int:orderid>', methods=['GET'])
-def get_order(orderid):
-    """
-    Get a specific order by ID
-    ---
-    Parameters:
-        orderid (int): The ID of the order to retrieve
-    Returns:
-        A JSON object containing the order details
-    Responses:
-        404: Order not found
-    """
-    order = db.session.get(OrderHeader, orderid)
-    if not order:
-        return jsonify({'error': 'Order not found'}), 404
-    return jsonify(order.to_dict())
-
-@api_bp.route('/orders', methods=['POST'])
-def create_order():
-    """
-    Create a new order
-    ---
-    Parameters:
-        JSON body with:
-        - ordercustomerid (required): The customer ID for the order
-        - orderdate (optional): ISO format date (YYYY-MM-DDTHH:MM:SS)
-    Returns:
-        A JSON object containing the created order with 201 status code
-    Responses:
-        400: Missing required fields or invalid date format
-        500: Server error
-    """
-    try:
-        data = request.get_json()
-        
-        if not data:
-            return jsonify({'status': 'error', 'message': 'No data provided'}), 400
-            
-        if 'ordercustomerid' not in data:
-            return jsonify({'status': 'error', 'message': 'Customer ID is required'}), 400
-        
-        # Validate customer ID is a positive integer
-        try:
-            customer_id = int(data['ordercustomerid'])
-            if customer_id <= 0:
-                return jsonify({'status': 'error', 'message': 'Customer ID must be a positive integer'}), 400
-        except (ValueError, TypeError):
-            return jsonify({'status': 'error', 'message': 'Customer ID must be a valid integer'}), 400
-        
-        # Parse date if provided, otherwise use current date
-        orderdate = datetime.now(timezone.utc)
-        if 'orderdate' in data:
-            try:
-                orderdate = datetime.fromisoformat(data['orderdate'])
-            except ValueError:
-                return jsonify({'status': 'error', 'message': 'Invalid date format. Use ISO format (YYYY-MM-DDTHH:MM:SS)'}), 400
-        
-        # Use transaction to ensure data consistency
-        try:
-            new_order = OrderHeader(
-                ordercustomerid=customer_id,
-                orderdate=orderdate
-            )
-            
-            db.session.add(new_order)
-            db.session.commit()
-            
-            return jsonify({
-                'status': 'success',
-                'message': 'Order created successfully',
-                'data': new_order.to_dict()
-            }), 201
-            
-        except Exception as e:
-            db.session.rollback()
-            return jsonify({'status': 'error', 'message': f'Database error: {str(e)}'}), 500
-            
-    except Exception as e:
-        return jsonify({'status': 'error', 'message': f'Server error: {str(e)}'}), 500
-
-@api_bp.route('/orders/<int:orderid>', methods=['PUT'])
-def update_order(orderid):
-    """
-    Update an existing order
-    ---
-    Parameters:
-        orderid (int): The ID of the order to update
-        JSON body with:
-        - ordercustomerid (optional): The customer ID for the order
-        - orderdate (optional): ISO format date (YYYY-MM-DDTHH:MM:SS)
-    Returns:
-        A JSON object containing the updated order
-    Responses:
-        404: Order not found
-        400: Invalid input data
-        500: Server error
-    """
-    try:
-        order = db.session.get(OrderHeader, orderid)
-        if not order:
-            return jsonify({'status': 'error', 'message': 'Order not found'}), 404
-            
-        data = request.get_json()
-        if not data:
-            return jsonify({'status': 'error', 'message': 'No data provided'}), 400
-            
-        # Track if any changes were made
-        changes_made = False
-        
-        if 'ordercustomerid' in data:
-            try:
-                customer_id = int(data['ordercustomerid'])
-                if customer_id <= 0:
-                    return jsonify({'status': 'error', 'message': 'Customer ID must be a positive integer'}), 400
-                order.ordercustomerid = customer_id
-                changes_made = True
-            except (ValueError, TypeError):
-                return jsonify({'status': 'error', 'message': 'Customer ID must be a valid integer'}), 400
-        
-        if 'orderdate' in data:
-            try:
-                order.orderdate = datetime.fromisoformat(data['orderdate'])
-                changes_made = True
-            except ValueError:
-                return jsonify({'status': 'error', 'message': 'Invalid date format. Use ISO format (YYYY-MM-DDTHH:MM:SS)'}), 400
-        
-        if not changes_made:
-            return jsonify({'status': 'warning', 'message': 'No changes made to the order'}), 200
-            
-        try:
-            db.session.commit()
-            return jsonify({
-                'status': 'success',
-                'message': 'Order updated successfully',
-                'data': order.to_dict()
-            })
-        except Exception as e:
-            db.session.rollback()
-            return jsonify({'status': 'error', 'message': f'Database error: {str(e)}'}), 500
-            
-    except Exception as e:
-        return jsonify({'status': 'error', 'message': f'Server error: {str(e)}'}), 500
-
-@api_bp.route('/orders/<int:orderid>', methods=['DELETE'])
-def delete_order(orderid):
-    """
-    Delete an order
-    ---
-    Parameters:
-        orderid (int): The ID of the order to delete
-    Returns:
-        A JSON message confirming deletion
-    Responses:
-        404: Order not found
-    """
-    order = db.session.get(OrderHeader, orderid)
-    if not order:
-        return jsonify({'error': 'Order not found'}), 404
-    db.session.delete(order)
-    db.session.commit()
-    return jsonify({'message': 'Order deleted successfully'})
-
-# ============================================================================
-# Order Detail Routes
-# ============================================================================
-@api_bp.route('/orders/<int:orderid>/details', methods=['GET'])
-def get_order_details(orderid):
-    """
-    Get all details for a specific order
-    ---
-    Parameters:
-        orderid (int): The ID of the order to retrieve details for
-    Returns:
-        A JSON array containing all details for the specified order
-    Responses:
-        404: Order not found
-    """
-    order = db.session.get(OrderHeader, orderid)
-    if not order:
-        return jsonify({'error': 'Order not found'}), 404
-    details = db.session.execute(select(OrderDetail).filter_by(orderid=orderid)).scalars().all()
-    return jsonify([detail.to_dict() for detail in details])
-
-@api_bp.route('/orderdetails/<int:orderdetailid>', methods=['GET'])
-def get_order_detail(orderdetailid):
-    """
-    Get a specific order detail by ID
-    ---
-    Parameters:
-        orderdetailid (int): The ID of the order detail to retrieve
-    Returns:
-        A JSON object containing the order detail
-    Responses:
-        404: Order detail not found
-    """
-    detail = db.session.get(OrderDetail, orderdetailid)
-    if not detail:
-        return jsonify({'error': 'Order detail not found'}), 404
-    return jsonify(detail.to_dict())
-
-@api_bp.route('/orders/<int:orderid>/details', methods=['POST'])
-def create_order_detail(orderid):
-    """
-    Create a new order detail for a specific order
-    ---
-    Parameters:
-        orderid (int): The ID of the order to add a detail to
-        JSON body with:
-        - orderitemid (required): The item ID
-        - quantity (required): The quantity ordered
-        - unitrate (required): The unit price
-    Returns:
-        A JSON object containing the created order detail with 201 status code
-    Responses:
-        404: Order not found
-        400: Missing or invalid required fields
-        500: Server error
-    Notes:
-        The rowtotal is automatically calculated as quantity * unitrate
-    """
-    try:
-        order = db.session.get(OrderHeader, orderid)
-        if not order:
-            return jsonify({'status': 'error', 'message': 'Order not found'}), 404
-            
-        data = request.get_json()
-        if not data:
-            return jsonify({'status': 'error', 'message': 'No data provided'}), 400
-        
-        # Validate required fields
-        required_fields = ['orderitemid', 'quantity', 'unitrate']
-        missing_fields = [field for field in required_fields if field not in data]
-        if missing_fields:
-            return jsonify({
-                'status': 'error', 
-                'message': f'Missing required fields: {", ".join(missing_fields)}'
-            }), 400
-        
-        # Validate orderitemid
-        try:
-            item_id = int(data['orderitemid'])
-            if item_id <= 0:
-                return jsonify({'status': 'error', 'message': 'Item ID must be a positive integer'}), 400
-        except (ValueError, TypeError):
-            return jsonify({'status': 'error', 'message': 'Item ID must be a valid integer'}), 400
-        
-        # Validate quantity
-        try:
-            quantity = float(data['quantity'])
-            if quantity <= 0:
-                return jsonify({'status': 'error', 'message': 'Quantity must be positive'}), 400
-        except (ValueError, TypeError):
-            return jsonify({'status': 'error', 'message': 'Quantity must be a valid number'}), 400
-        
-        # Validate unitrate
-        try:
-            unitrate = float(data['unitrate'])
-            if unitrate < 0:
-                return jsonify({'status': 'error', 'message': 'Unit rate cannot be negative'}), 400
-        except (ValueError, TypeError):
-            return jsonify({'status': 'error', 'message': 'Unit rate must be a valid number'}), 400
-        
-        # Calculate row total
-        rowtotal = quantity * unitrate
-        
-        try:
-            new_detail = OrderDetail(
-                orderid=orderid,
-                orderitemid=item_id,
-                quantity=quantity,
-                unitrate=unitrate,
-                rowtotal=rowtotal
-            )
-            
-            db.session.add(new_detail)
-            db.session.commit()
-            
-            return jsonify({
-                'status': 'success',
-                'message': 'Order detail created successfully',
-                'data': new_detail.to_dict()
-            }), 201
-            
-        except Exception as e:
-            db.session.rollback()
-            return jsonify({'status': 'error', 'message': f'Database error: {str(e)}'}), 500
-            
-    except Exception as e:
-        return jsonify({'status': 'error', 'message': f'Server error: {str(e)}'}), 500
-
-@api_bp.route('/orderdetails/<int:orderdetailid>', methods=['PUT'])
-def update_order_detail(orderdetailid):
-    """
-    Update an existing order detail
-    ---
-    Parameters:
-        orderdetailid (int): The ID of the order detail to update
-        JSON body with:
-        - orderitemid (optional): The item ID
-        - quantity (optional): The quantity ordered
-        - unitrate (optional): The unit price
-    Returns:
-        A JSON object containing the updated order detail
-    Responses:
-        404: Order detail not found
-    Notes:
-        The rowtotal is automatically recalculated if quantity or unitrate changes
-    """
-    detail = db.session.get(OrderDetail, orderdetailid)
-    if not detail:
-        return jsonify({'error': 'Order detail not found'}), 404
-    data = request.get_json()
-    
-    if 'orderitemid' in data:
-        detail.orderitemid = data['orderitemid']
-    
-    # Update quantity and/or unit rate and recalculate row total if needed
-    recalculate = False
-    
-    if 'quantity' in data:
-        detail.quantity = data['quantity']
-        recalculate = True
-    
-    if 'unitrate' in data:
-        detail.unitrate = data['unitrate']
-        recalculate = True
-    
-    if recalculate:
-        detail.rowtotal = detail.quantity * detail.unitrate
-    
-    db.session.commit()
-    return jsonify(detail.to_dict())
-
-@api_bp.route('/orderdetails/<int:orderdetailid>', methods=['DELETE'])
-def delete_order_detail(orderdetailid):
-    """
-    Delete an order detail
-    ---
-    Parameters:
-        orderdetailid (int): The ID of the order detail to delete
-    Returns:
-        A JSON message confirming deletion
-    Responses:
-        404: Order detail not found
-    """
-    detail = db.session.get(OrderDetail, orderdetailid)
-    if not detail:
-        return jsonify({'error': 'Order detail not found'}), 404
-    db.session.delete(detail)
-    db.session.commit()
-    return jsonify({'message': 'Order detail deleted successfully'})
+# Recommendations from: https://www.perplexity.ai/search/can-you-look-at-this-code-and-ZmYi20OySGmGULYqjVFTyA
+# Improvements implemented:
+# 1. Better error handling with try/except blocks
+# 2. Input validation for all endpoints
+# 3. Consistent response format
+# 4. Proper HTTP status codes
+# 5. Transaction management
+
+from flask import Blueprint, request, jsonify, url_for, current_app
+from models import db, OrderHeader, OrderDetail, IntakeJob, is_duplicate_line
+import time
+from datetime import datetime, timezone
+from math import ceil, isfinite
+from itertools import chain
+from sqlalchemy import select, func, delete, and_
+from sqlalchemy.exc import IntegrityError
+from json_provider import rows_response, ROWS
+from cache import response_cache, add_cache_tags, order_tags, order_list_tags
+from conditional import conditional_order, set_order_validators
+from entity_cache import cached_get, get_entity_cache, sync_entity_cache, evict_deleted_orders
+from singleflight import get_singleflight
+from write_batcher import run_write, get_write_batcher
+from intake import insert_order, insert_detail, enqueue, get_intake_worker, prune_when_due
+from idempotency import idempotency
+from admission import admit, release, get_admission
+from deadlines import start_deadline, deadline_response, clear_deadline, deadline_stats, current_budget
+from outbox import get_change_feed, read_changes, record_order_deletes
+from sse import get_broadcaster, stream
+from batch import parse_batch, run_batch
+from repricing import enqueue_reprice, get_repricer, JOB_KIND as REPRICE_JOB
+from updates import (order_changes, detail_changes, patch_order, patch_detail, parse_bulk_items,
+                     bulk_patch_orders, bulk_patch_details, upsert_detail, clone_order, BULK_LIMIT)
+
+api_bp = Blueprint('api', __name__)
+
+# Time budget for every request in the app (API and HTML views), enforced in SQLite
+api_bp.before_app_request(start_deadline)
+api_bp.after_app_request(deadline_response)
+api_bp.teardown_app_request(clear_deadline)
+
+# Turn away excess load before doing any work for it
+api_bp.before_request(admit)
+api_bp.teardown_request(release)
+
+# Drop entity cache rows that other workers have changed
+api_bp.before_request(sync_entity_cache)
+
+# Keep pruning old outbox events and jobs going without async intake or cron
+api_bp.after_request(prune_when_due)
+
+# Ids per IN (...) query of a multi-get, well under SQLite's bound parameter limit
+IN_CHUNK_SIZE = 500
+# Ids accepted in a multi-get query string; the POST lookups take more
+MULTI_GET_LIMIT = 1000
+LOOKUP_LIMIT = 10000
+
+# Columns serialized by the list endpoints, matching OrderHeader/OrderDetail.to_dict()
+ORDER_COLUMNS = (OrderHeader.orderid, OrderHeader.orderdate, OrderHeader.ordercustomerid)
+DETAIL_COLUMNS = (OrderDetail.orderdetailid, OrderDetail.orderid, OrderDetail.orderitemid,
+                  OrderDetail.quantity, OrderDetail.unitrate, OrderDetail.rowtotal)
+
+def _wants_async():
+    """Whether the client asked for async intake with a "Prefer: respond-async" header"""
+    return (current_app.config.get('ASYNC_INTAKE_ENABLED', True)
+            and 'respond-async' in request.headers.get('Prefer', ''))
+
+def _accepted(job, message):
+    """202 response pointing the client at the job's status"""
+    response = jsonify({'status': 'accepted', 'message': message, 'data': job})
+    response.status_code = 202
+    response.headers['Location'] = url_for('api.get_job', jobid=job['jobid'])
+    if 'respond-async' in request.headers.get('Prefer', ''):
+        response.headers['Preference-Applied'] = 'respond-async'
+    return response
+
+def _bulk_items():
+    """The validated items of a bulk PATCH body, or an error response"""
+    items = request.get_json(silent=True)
+    if isinstance(items, dict):
+        items = items.get('items')
+    if not isinstance(items, list) or not items:
+        return None, (jsonify({'status': 'error', 'message': 'Provide a list of {id, changes} items'}), 400)
+    if len(items) > BULK_LIMIT:
+        return None, (jsonify({'status': 'error', 'message': f'At most {BULK_LIMIT} items can be updated at once'}), 400)
+    return items, None
+
+def _bulk_results(parsed, updated):
+    """Per-item results of a bulk PATCH in request order"""
+    results = []
+    for rowid, changes, error in parsed:
+        if error:
+            results.append({'id': rowid, 'status': 'invalid', 'error': error})
+        elif rowid in updated:
+            results.append({'id': rowid, 'status': 'updated', 'data': updated[rowid]})
+        else:
+            results.append({'id': rowid, 'status': 'not_found'})
+    return results
+
+def _parse_ids(value):
+    """Ids from a comma-separated string or a JSON list, without repeats, in request order; raises ValueError"""
+    if isinstance(value, str):
+        value = [part for part in value.split(',') if part.strip()]
+    if not isinstance(value, list) or any(isinstance(part, (bool, float)) for part in value):
+        raise ValueError
+    return list(dict.fromkeys(int(part) for part in value))
+
+def _rows_in(query, column, ids):
+    """Rows of ``query`` with ``column`` in ``ids``, fetched with one IN query per chunk of ids"""
+    rows = []
+    for start in range(0, len(ids), IN_CHUNK_SIZE):
+        rows.extend(db.session.execute(query.where(column.in_(ids[start:start + IN_CHUNK_SIZE]))))
+    return rows
+
+def _id_list_error(name, limit):
+    return jsonify({'status': 'error', 'message': f'{name} must be a list of at most {limit} integer ids'}), 400
+
+def _orders_by_ids(ids):
+    """Orders in the requested order, with the ids that don't exist listed under 'missing'"""
+    found = {row.orderid: row for row in _rows_in(select(*ORDER_COLUMNS), OrderHeader.orderid, ids)}
+    return rows_response(ORDER_COLUMNS, [found[orderid] for orderid in ids if orderid in found], {
+        'status': 'success',
+        'data': {'items': ROWS, 'missing': [orderid for orderid in ids if orderid not in found]}
+    })
+
+def _details_by_order_ids(orderids):
+    """Lines of the orders in the requested order, with the order ids that don't exist under 'missing'"""
+    # Left join from the headers so an order without lines isn't reported missing
+    query = (select(*DETAIL_COLUMNS, OrderHeader.orderid.label('found'))
+             .outerjoin_from(OrderHeader, OrderDetail)
+             .order_by(OrderDetail.orderdetailid))
+    lines = {}
+    for row in _rows_in(query, OrderHeader.orderid, orderids):
+        order_lines = lines.setdefault(row.found, [])
+        if row.orderdetailid is not None:
+            order_lines.append(row)
+    add_cache_tags(*(f'order:{orderid}:details' for orderid in orderids))
+    return rows_response(DETAIL_COLUMNS, chain.from_iterable(lines.get(orderid, ()) for orderid in orderids), {
+        'status': 'success',
+        'data': {'items': ROWS, 'missing': [orderid for orderid in orderids if orderid not in lines]}
+    })
+
+# Carried by every customer-filtered page, for writes that can't tell which customer an order had before
+CUSTOMER_LISTS_TAG = 'orders:customers'
+
+def _order_list_cache_tags():
+    """Customer-filtered pages are only evicted by writes for that customer"""
+    customer_id = request.args.get('customer_id', type=int)
+    if customer_id and 'ids' not in request.args:
+        return [f'orders:customer:{customer_id}', CUSTOMER_LISTS_TAG]
+    return ['orders:all']
+
+# ============================================================================
+# Order Header Routes
+# ============================================================================
+@api_bp.route('/orders', methods=['GET'])
+@response_cache.cached(tags=_order_list_cache_tags)
+def get_orders():
+    """
+    Get all orders with optional filtering and pagination
+    ---
+    Parameters:
+        customer_id (optional): Filter by customer ID
+        start_date (optional): Filter by orders on or after this date (ISO format)
+        end_date (optional): Filter by orders on or before this date (ISO format)
+        page (optional): Page number for pagination (default: 1)
+        per_page (optional): Items per page (default: 20, max: 100)
+        ids (optional): Comma-separated order IDs (at most 1000) to fetch instead
+            of a page; the other parameters are ignored
+    Returns:
+        A JSON object containing:
+        - items: Array of order headers
+        - total: Total number of matching orders
+        - page: Current page number
+        - pages: Total number of pages
+        - per_page: Items per page
+        With ids, the object contains only items (in the order requested) and
+        missing (the requested ids that don't exist)
+    """
+    try:
+        if 'ids' in request.args:
+            try:
+                ids = _parse_ids(request.args['ids'])
+            except ValueError:
+                return _id_list_error('ids', MULTI_GET_LIMIT)
+            if len(ids) > MULTI_GET_LIMIT:
+                return _id_list_error('ids', MULTI_GET_LIMIT)
+            return _orders_by_ids(ids)
+
+        # Get query parameters
+        customer_id = request.args.get('customer_id', type=int)
+        start_date_str = request.args.get('start_date')
+        end_date_str = request.args.get('end_date')
+        page = request.args.get('page', 1, type=int)
+        per_page = min(request.args.get('per_page', 20, type=int), 100)  # Limit max per_page to 100
+        
+        # Start with base query
+        query = select(*ORDER_COLUMNS)
+        
+        # Apply filters if provided
+        if customer_id:
+            query = query.where(OrderHeader.ordercustomerid == customer_id)
+            
+        if start_date_str:
+            try:
+                start_date = datetime.fromisoformat(start_date_str)
+                query = query.where(OrderHeader.orderdate >= start_date)
+            except ValueError:
+                return jsonify({
+                    'status': 'error',
+                    'message': 'Invalid start_date format. Use ISO format (YYYY-MM-DDTHH:MM:SS)'
+                }), 400
+                
+        if end_date_str:
+            try:
+                end_date = datetime.fromisoformat(end_date_str)
+                query = query.where(OrderHeader.orderdate <= end_date)
+            except ValueError:
+                return jsonify({
+                    'status': 'error',
+                    'message': 'Invalid end_date format. Use ISO format (YYYY-MM-DDTHH:MM:SS)'
+                }), 400
+        
+        # Same page/per_page handling as Flask-SQLAlchemy's paginate(error_out=False)
+        page = page if page and page > 0 else 1
+        per_page = per_page if per_page and per_page > 0 else 20
+        
+        # Execute query with pagination, fetching plain rows instead of ORM objects
+        total = db.session.execute(
+            select(func.count()).select_from(query.subquery())).scalar()
+        rows = db.session.execute(
+            query.order_by(OrderHeader.orderdate.desc())
+            .limit(per_page).offset((page - 1) * per_page))
+        
+        # Prepare response
+        return rows_response(ORDER_COLUMNS, rows, {
+            'status': 'success',
+            'data': {
+                'items': ROWS,
+                'total': total,
+                'page': page,
+                'pages': ceil(total / per_page) if total else 0,
+                'per_page': per_page
+            }
+        })
+        
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': f'Server error: {str(e)}'}), 500
+
+@api_bp.route('/orders/lookup', methods=['POST'])
+def lookup_orders():
+    """
+    Get many orders by id, for id lists too long for a query string
+    ---
+    Parameters:
+        JSON body with:
+        - ids: List of at most 10000 order IDs
+    Returns:
+        A JSON object containing items (the orders, in the order requested) and
+        missing (the requested ids that don't exist)
+    Responses:
+        400: ids missing, not integers, or too many
+    """
+    data = request.get_json(silent=True)
+    try:
+        ids = _parse_ids(data.get('ids') if isinstance(data, dict) else None)
+    except (ValueError, TypeError):
+        return _id_list_error('ids', LOOKUP_LIMIT)
+    if len(ids) > LOOKUP_LIMIT:
+        return _id_list_error('ids', LOOKUP_LIMIT)
+    return _orders_by_ids(ids)
+
+@api_bp.route('/orders/<int:orderid>', methods=['GET'])
+@conditional_order('header')
+@response_cache.cached(tags=lambda orderid: [f'order:{orderid}'])
+def get_order(orderid):
+    """
+    Get a specific order by ID
+    ---
+    Parameters:
+        orderid (int): The ID of the order to retrieve
+    Returns:
+        A JSON object containing the order details
+    Responses:
+        304: Order unchanged since the ETag / date the client sent
+        404: Order not found
+    """
+    order = cached_get(OrderHeader, orderid)
+    if not order:
+        return jsonify({'error': 'Order not found'}), 404
+    return set_order_validators(jsonify(order.to_dict()), order, 'header')
+
+@api_bp.route('/orders', methods=['POST'])
+@idempotency.idempotent
+def create_order():
+    """
+    Create a new order
+    ---
+    Parameters:
+        JSON body with:
+        - ordercustomerid (required): The customer ID for the order
+        - orderdate (optional): ISO format date (YYYY-MM-DDTHH:MM:SS)
+        Prefer header (optional): "respond-async" to queue the order instead of writing it now
+        Idempotency-Key header (optional): Retries with the same key get the first response back
+    Returns:
+        A JSON object containing the created order with 201 status code
+    Responses:
+        202: Order queued; Location points at the job to poll
+        400: Missing required fields or invalid date format
+        409: A request with the same Idempotency-Key is still in progress
+        422: Idempotency-Key reused with a different body
+        500: Server error
+    """
+    try:
+        data = request.get_json()
+        
+        if not data:
+            return jsonify({'status': 'error', 'message': 'No data provided'}), 400
+            
+        if 'ordercustomerid' not in data:
+            return jsonify({'status': 'error', 'message': 'Customer ID is required'}), 400
+        
+        # Validate customer ID is a positive integer
+        try:
+            customer_id = int(data['ordercustomerid'])
+            if customer_id <= 0:
+                return jsonify({'status': 'error', 'message': 'Customer ID must be a positive integer'}), 400
+        except (ValueError, TypeError):
+            return jsonify({'status': 'error', 'message': 'Customer ID must be a valid integer'}), 400
+        
+        # Parse date if provided, otherwise use current date
+        orderdate = datetime.now(timezone.utc)
+        if 'orderdate' in data:
+            try:
+                orderdate = datetime.fromisoformat(data['orderdate'])
+            except ValueError:
+                return jsonify({'status': 'error', 'message': 'Invalid date format. Use ISO format (YYYY-MM-DDTHH:MM:SS)'}), 400
+        
+        # Use transaction to ensure data consistency (batched with other inserts if enabled)
+        try:
+            if _wants_async():
+                job = enqueue('order', {'ordercustomerid': customer_id, 'orderdate': orderdate.isoformat()})
+                return _accepted(job, 'Order accepted for processing')
+            
+            order_data = run_write(insert_order(customer_id, orderdate))
+            response_cache.invalidate(*order_list_tags(customer_id))
+            
+            return jsonify({
+                'status': 'success',
+                'message': 'Order created successfully',
+                'data': order_data
+            }), 201
+            
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'status': 'error', 'message': f'Database error: {str(e)}'}), 500
+            
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': f'Server error: {str(e)}'}), 500
+
+@api_bp.route('/orders/<int:orderid>/clone', methods=['POST'])
+@idempotency.idempotent
+def clone_order_route(orderid):
+    """
+    Create a new order with the same lines as an existing one ("reorder")
+    ---
+    Parameters:
+        orderid (int): The ID of the order to copy
+        JSON body (optional) with:
+        - ordercustomerid (optional): Customer of the new order (default: the original's)
+        - orderdate (optional): ISO format date of the new order (default: now)
+        Idempotency-Key header (optional): Retries with the same key get the first response back
+    Returns:
+        A JSON object containing the new order, with its lines under 'details', with 201 status code
+    Responses:
+        404: Order not found
+        400: Invalid input data
+        409: A request with the same Idempotency-Key is still in progress
+        422: Idempotency-Key reused with a different body
+    Notes:
+        The header and all lines are copied with INSERT ... SELECT in one
+        transaction; the lines keep the original quantities and unit rates.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        changes = order_changes(data)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    order = clone_order(db.session, orderid, changes.get('ordercustomerid'), changes.get('orderdate'))
+    if order is None:
+        db.session.rollback()
+        return jsonify({'status': 'error', 'message': 'Order not found'}), 404
+    db.session.commit()
+    response_cache.invalidate(*order_list_tags(order['ordercustomerid']))
+    return jsonify({
+        'status': 'success',
+        'message': 'Order cloned successfully',
+        'data': order
+    }), 201
+
+@api_bp.route('/orders/<int:orderid>', methods=['PUT'])
+def update_order(orderid):
+    """
+    Update an existing order
+    ---
+    Parameters:
+        orderid (int): The ID of the order to update
+        JSON body with:
+        - ordercustomerid (optional): The customer ID for the order
+        - orderdate (optional): ISO format date (YYYY-MM-DDTHH:MM:SS)
+    Returns:
+        A JSON object containing the updated order
+    Responses:
+        404: Order not found
+        400: Invalid input data
+        500: Server error
+    """
+    try:
+        order = db.session.get(OrderHeader, orderid)
+        if not order:
+            return jsonify({'status': 'error', 'message': 'Order not found'}), 404
+            
+        data = request.get_json()
+        if not data:
+            return jsonify({'status': 'error', 'message': 'No data provided'}), 400
+            
+        # Track if any changes were made
+        changes_made = False
+        old_customer_id = order.ordercustomerid
+        
+        if 'ordercustomerid' in data:
+            try:
+                customer_id = int(data['ordercustomerid'])
+                if customer_id <= 0:
+                    return jsonify({'status': 'error', 'message': 'Customer ID must be a positive integer'}), 400
+                order.ordercustomerid = customer_id
+                changes_made = True
+            except (ValueError, TypeError):
+                return jsonify({'status': 'error', 'message': 'Customer ID must be a valid integer'}), 400
+        
+        if 'orderdate' in data:
+            try:
+                order.orderdate = datetime.fromisoformat(data['orderdate'])
+                changes_made = True
+            except ValueError:
+                return jsonify({'status': 'error', 'message': 'Invalid date format. Use ISO format (YYYY-MM-DDTHH:MM:SS)'}), 400
+        
+        if not changes_made:
+            return jsonify({'status': 'warning', 'message': 'No changes made to the order'}), 200
+            
+        try:
+            db.session.commit()
+            response_cache.invalidate(
+                *order_tags(orderid), *order_list_tags(old_customer_id, order.ordercustomerid))
+            return jsonify({
+                'status': 'success',
+                'message': 'Order updated successfully',
+                'data': order.to_dict()
+            })
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'status': 'error', 'message': f'Database error: {str(e)}'}), 500
+            
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': f'Server error: {str(e)}'}), 500
+
+@api_bp.route('/orders/bulk', methods=['PATCH'])
+def bulk_update_orders():
+    """
+    Partially update many orders in one transaction
+    ---
+    Parameters:
+        JSON body: a list (or {"items": [...]}) of at most 1000 items, each with:
+        - id: The ID of the order to update
+        - changes: Object with ordercustomerid and/or orderdate, as for PATCH /orders/<id>
+    Returns:
+        A JSON object containing the number of orders updated and a result per item
+        (status updated, not_found or invalid)
+    Responses:
+        400: Not a list of items, or too many
+        500: Server error
+    Notes:
+        Valid items are applied with one executemany UPDATE; invalid items are
+        reported and skipped.
+    """
+    items, error = _bulk_items()
+    if error:
+        return error
+    parsed = parse_bulk_items(items, order_changes)
+    valid = [(orderid, changes) for orderid, changes, error in parsed if not error]
+    orders, previous = {}, {}
+    if valid:
+        try:
+            orders, previous = bulk_patch_orders(db.session, valid)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'status': 'error', 'message': f'Database error: {str(e)}'}), 500
+    if orders:
+        customer_ids = set(previous[orderid] for orderid in orders)
+        customer_ids.update(order['ordercustomerid'] for order in orders.values())
+        response_cache.invalidate(
+            *chain.from_iterable(order_tags(orderid) for orderid in orders),
+            *order_list_tags(*customer_ids))
+    return jsonify({
+        'status': 'success',
+        'message': f'{len(orders)} orders updated',
+        'data': {'updated': len(orders), 'results': _bulk_results(parsed, orders)}
+    })
+
+@api_bp.route('/orders/<int:orderid>', methods=['PATCH'])
+def patch_order_header(orderid):
+    """
+    Partially update an order without loading it
+    ---
+    Parameters:
+        orderid (int): The ID of the order to update
+        JSON body with:
+        - ordercustomerid (optional): The customer ID for the order
+        - orderdate (optional): ISO format date (YYYY-MM-DDTHH:MM:SS)
+    Returns:
+        A JSON object containing the updated order
+    Responses:
+        404: Order not found
+        400: Invalid input data
+    Notes:
+        Issues a single UPDATE ... RETURNING. The previous customer isn't read,
+        so moving an order to another customer evicts every customer-filtered page.
+    """
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'status': 'error', 'message': 'No data provided'}), 400
+    try:
+        changes = order_changes(data)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    if not changes:
+        if cached_get(OrderHeader, orderid) is None:
+            return jsonify({'status': 'error', 'message': 'Order not found'}), 404
+        return jsonify({'status': 'warning', 'message': 'No changes made to the order'}), 200
+
+    order = patch_order(db.session, orderid, changes)
+    if order is None:
+        db.session.rollback()
+        return jsonify({'status': 'error', 'message': 'Order not found'}), 404
+    db.session.commit()
+    tags = [*order_tags(orderid), *order_list_tags(order['ordercustomerid'])]
+    if 'ordercustomerid' in changes:
+        tags.append(CUSTOMER_LISTS_TAG)
+    response_cache.invalidate(*tags)
+    return jsonify({
+        'status': 'success',
+        'message': 'Order updated successfully',
+        'data': order
+    })
+
+@api_bp.route('/orders/<int:orderid>', methods=['DELETE'])
+def delete_order(orderid):
+    """
+    Delete an order
+    ---
+    Parameters:
+        orderid (int): The ID of the order to delete
+    Returns:
+        A JSON message confirming deletion
+    Responses:
+        404: Order not found
+    """
+    order = db.session.get(OrderHeader, orderid)
+    if not order:
+        return jsonify({'error': 'Order not found'}), 404
+    customer_id = order.ordercustomerid
+    # The details go with it through ON DELETE CASCADE, without being loaded
+    db.session.delete(order)
+    db.session.commit()
+    response_cache.invalidate(*order_tags(orderid), *order_list_tags(customer_id))
+    return jsonify({'message': 'Order deleted successfully'})
+
+@api_bp.route('/orders', methods=['DELETE'])
+def delete_orders():
+    """
+    Delete many orders and their details at once
+    ---
+    Parameters:
+        ids (optional): Comma-separated order IDs (at most 1000)
+        customer_id (optional): Only orders of this customer
+        before (optional): Only orders dated before this date (ISO format)
+    Returns:
+        A JSON object containing the number of orders deleted
+    Responses:
+        400: No filter given, or an invalid one
+        500: Server error
+    Notes:
+        Filters are combined with AND; at least one is required. The orders are
+        removed with one DELETE and their details by ON DELETE CASCADE.
+    """
+    conditions = []
+    ids = request.args.get('ids')
+    if ids:
+        try:
+            ids = {int(orderid) for orderid in ids.split(',') if orderid.strip()}
+        except ValueError:
+            return jsonify({'status': 'error', 'message': 'ids must be comma-separated integers'}), 400
+        if len(ids) > 1000:
+            return jsonify({'status': 'error', 'message': 'At most 1000 ids can be deleted at once'}), 400
+        conditions.append(OrderHeader.orderid.in_(ids))
+    
+    customer_id = request.args.get('customer_id', type=int)
+    if customer_id:
+        conditions.append(OrderHeader.ordercustomerid == customer_id)
+    
+    before = request.args.get('before')
+    if before:
+        try:
+            conditions.append(OrderHeader.orderdate < datetime.fromisoformat(before))
+        except ValueError:
+            return jsonify({'status': 'error', 'message': 'Invalid before date format. Use ISO format (YYYY-MM-DD)'}), 400
+    
+    if not conditions:
+        return jsonify({'status': 'error', 'message': 'Provide ids, customer_id or before'}), 400
+    
+    where = and_(*conditions)
+    try:
+        # Change events first, while the details still exist
+        record_order_deletes(db.session, where)
+        deleted = db.session.execute(
+            delete(OrderHeader).where(where)
+            .returning(OrderHeader.orderid, OrderHeader.ordercustomerid)
+            .execution_options(synchronize_session=False)
+        ).all()
+        evict_deleted_orders(db.session, [row.orderid for row in deleted])
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'status': 'error', 'message': f'Database error: {str(e)}'}), 500
+    
+    if deleted:
+        response_cache.invalidate(
+            *chain.from_iterable(order_tags(row.orderid) for row in deleted),
+            *order_list_tags(*{row.ordercustomerid for row in deleted}))
+    return jsonify({
+        'status': 'success',
+        'message': f'{len(deleted)} orders deleted',
+        'data': {'deleted': len(deleted)}
+    })
+
+# ============================================================================
+# Order Detail Routes
+# ============================================================================
+@api_bp.route('/orders/<int:orderid>/details', methods=['GET'])
+@conditional_order('details')
+@response_cache.cached(tags=lambda orderid: [f'order:{orderid}:details'])
+def get_order_details(orderid):
+    """
+    Get all details for a specific order
+    ---
+    Parameters:
+        orderid (int): The ID of the order to retrieve details for
+    Returns:
+        A JSON array containing all details for the specified order
+    Responses:
+        304: Order unchanged since the ETag / date the client sent
+        404: Order not found
+    """
+    order = cached_get(OrderHeader, orderid)
+    if not order:
+        return jsonify({'error': 'Order not found'}), 404
+    rows = db.session.execute(select(*DETAIL_COLUMNS).filter_by(orderid=orderid))
+    return set_order_validators(rows_response(DETAIL_COLUMNS, rows), order, 'details')
+
+@api_bp.route('/orderdetails', methods=['GET'])
+@response_cache.cached(tags=lambda: ['orders:all'])
+def get_details_for_orders():
+    """
+    Get the details of many orders at once
+    ---
+    Parameters:
+        orderids (required): Comma-separated order IDs (at most 1000)
+    Returns:
+        A JSON object containing items (the details, grouped by order in the
+        order requested) and missing (the requested order ids that don't exist)
+    Responses:
+        400: orderids missing, not integers, or too many
+    """
+    try:
+        orderids = _parse_ids(request.args.get('orderids'))
+    except (ValueError, TypeError):
+        return _id_list_error('orderids', MULTI_GET_LIMIT)
+    if not orderids or len(orderids) > MULTI_GET_LIMIT:
+        return _id_list_error('orderids', MULTI_GET_LIMIT)
+    return _details_by_order_ids(orderids)
+
+@api_bp.route('/orderdetails/lookup', methods=['POST'])
+def lookup_details_for_orders():
+    """
+    Get the details of many orders, for id lists too long for a query string
+    ---
+    Parameters:
+        JSON body with:
+        - orderids: List of at most 10000 order IDs
+    Returns:
+        A JSON object containing items (the details, grouped by order in the
+        order requested) and missing (the requested order ids that don't exist)
+    Responses:
+        400: orderids missing, not integers, or too many
+    """
+    data = request.get_json(silent=True)
+    try:
+        orderids = _parse_ids(data.get('orderids') if isinstance(data, dict) else None)
+    except (ValueError, TypeError):
+        return _id_list_error('orderids', LOOKUP_LIMIT)
+    if len(orderids) > LOOKUP_LIMIT:
+        return _id_list_error('orderids', LOOKUP_LIMIT)
+    return _details_by_order_ids(orderids)
+
+@api_bp.route('/orderdetails/<int:orderdetailid>', methods=['GET'])
+@response_cache.cached(tags=lambda orderdetailid: [f'detail:{orderdetailid}'])
+def get_order_detail(orderdetailid):
+    """
+    Get a specific order detail by ID
+    ---
+    Parameters:
+        orderdetailid (int): The ID of the order detail to retrieve
+    Returns:
+        A JSON object containing the order detail
+    Responses:
+        404: Order detail not found
+    """
+    detail = cached_get(OrderDetail, orderdetailid)
+    if not detail:
+        return jsonify({'error': 'Order detail not found'}), 404
+    add_cache_tags(f'order:{detail.orderid}:details')
+    return jsonify(detail.to_dict())
+
+@api_bp.route('/orders/<int:orderid>/details', methods=['POST'])
+@idempotency.idempotent
+def create_order_detail(orderid):
+    """
+    Create a new order detail for a specific order
+    ---
+    Parameters:
+        orderid (int): The ID of the order to add a detail to
+        JSON body with:
+        - orderitemid (required): The item ID
+        - quantity (required): The quantity ordered
+        - unitrate (required): The unit price
+        Prefer header (optional): "respond-async" to queue the detail instead of writing it now
+        Idempotency-Key header (optional): Retries with the same key get the first response back
+    Returns:
+        A JSON object containing the created order detail with 201 status code
+    Responses:
+        202: Detail queued; Location points at the job to poll
+        404: Order not found
+        400: Missing or invalid required fields
+        409: The item is already on the order, or a request with the same
+             Idempotency-Key is still in progress
+        422: Idempotency-Key reused with a different body
+        500: Server error
+    Notes:
+        The rowtotal is automatically calculated as quantity * unitrate
+    """
+    try:
+        order = cached_get(OrderHeader, orderid)
+        if not order:
+            return jsonify({'status': 'error', 'message': 'Order not found'}), 404
+            
+        data = request.get_json()
+        if not data:
+            return jsonify({'status': 'error', 'message': 'No data provided'}), 400
+        
+        # Validate required fields
+        required_fields = ['orderitemid', 'quantity', 'unitrate']
+        missing_fields = [field for field in required_fields if field not in data]
+        if missing_fields:
+            return jsonify({
+                'status': 'error', 
+                'message': f'Missing required fields: {", ".join(missing_fields)}'
+            }), 400
+        
+        # Validate orderitemid
+        try:
+            item_id = int(data['orderitemid'])
+            if item_id <= 0:
+                return jsonify({'status': 'error', 'message': 'Item ID must be a positive integer'}), 400
+        except (ValueError, TypeError):
+            return jsonify({'status': 'error', 'message': 'Item ID must be a valid integer'}), 400
+        
+        # Validate quantity
+        try:
+            quantity = float(data['quantity'])
+            if not isfinite(quantity):
+                return jsonify({'status': 'error', 'message': 'Quantity must be a finite number'}), 400
+            if quantity <= 0:
+                return jsonify({'status': 'error', 'message': 'Quantity must be positive'}), 400
+        except (ValueError, TypeError):
+            return jsonify({'status': 'error', 'message': 'Quantity must be a valid number'}), 400
+        
+        # Validate unitrate
+        try:
+            unitrate = float(data['unitrate'])
+            if not isfinite(unitrate):
+                return jsonify({'status': 'error', 'message': 'Unit rate must be a finite number'}), 400
+            if unitrate < 0:
+                return jsonify({'status': 'error', 'message': 'Unit rate cannot be negative'}), 400
+        except (ValueError, TypeError):
+            return jsonify({'status': 'error', 'message': 'Unit rate must be a valid number'}), 400
+        
+        try:
+            if _wants_async():
+                job = enqueue('detail', {'orderid': orderid, 'orderitemid': item_id,
+                                         'quantity': quantity, 'unitrate': unitrate})
+                return _accepted(job, 'Order detail accepted for processing')
+            
+            # rowtotal is calculated as quantity * unitrate
+            detail_data = run_write(insert_detail(orderid, item_id, quantity, unitrate))
+            response_cache.invalidate(*order_tags(orderid))
+            
+            return jsonify({
+                'status': 'success',
+                'message': 'Order detail created successfully',
+                'data': detail_data
+            }), 201
+            
+        except IntegrityError as e:
+            db.session.rollback()
+            if is_duplicate_line(e):
+                return jsonify({
+                    'status': 'error',
+                    'message': 'The item is already on this order; use POST /api/orders/<orderid>/items to add to it'
+                }), 409
+            raise
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'status': 'error', 'message': f'Database error: {str(e)}'}), 500
+            
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': f'Server error: {str(e)}'}), 500
+
+@api_bp.route('/orders/<int:orderid>/items', methods=['POST'])
+@idempotency.idempotent
+def upsert_order_item(orderid):
+    """
+    Add an item to an order, adding to its line if the item is already there
+    ---
+    Parameters:
+        orderid (int): The ID of the order
+        JSON body with:
+        - orderitemid (required): The item ID
+        - quantity (required): The quantity to add (or to set, with mode "replace")
+        - unitrate (required): The unit price, applied to the whole line
+        - mode (optional): "add" (default) or "replace"
+        Idempotency-Key header (optional): Retries with the same key get the first response back
+    Returns:
+        A JSON object containing the order line, 201 if it was created and 200 if it was updated
+    Responses:
+        404: Order not found
+        400: Missing or invalid required fields
+        409: A request with the same Idempotency-Key is still in progress
+        422: Idempotency-Key reused with a different body
+    Notes:
+        The line is written with INSERT ... ON CONFLICT on (orderid, orderitemid)
+        and the quantity and rowtotal are computed in SQL, so concurrent adds of
+        the same item never produce a second line or lose an update.
+    """
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'status': 'error', 'message': 'No data provided'}), 400
+    missing_fields = [field for field in ('orderitemid', 'quantity', 'unitrate') if field not in data]
+    if missing_fields:
+        return jsonify({
+            'status': 'error',
+            'message': f'Missing required fields: {", ".join(missing_fields)}'
+        }), 400
+    mode = data.get('mode', 'add')
+    if mode not in ('add', 'replace'):
+        return jsonify({'status': 'error', 'message': 'mode must be "add" or "replace"'}), 400
+    try:
+        changes = detail_changes(data)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    if cached_get(OrderHeader, orderid) is None:
+        return jsonify({'status': 'error', 'message': 'Order not found'}), 404
+
+    try:
+        detail, created = upsert_detail(db.session, orderid, changes['orderitemid'], changes['quantity'],
+                                        changes['unitrate'], replace=mode == 'replace')
+        db.session.commit()
+    except IntegrityError:
+        # The order was deleted after the check above
+        db.session.rollback()
+        return jsonify({'status': 'error', 'message': 'Order not found'}), 404
+    response_cache.invalidate(f"detail:{detail['orderdetailid']}", *order_tags(orderid))
+    return jsonify({
+        'status': 'success',
+        'message': 'Order line created' if created else 'Order line updated',
+        'data': detail
+    }), 201 if created else 200
+
+@api_bp.route('/orderdetails/<int:orderdetailid>', methods=['PUT'])
+def update_order_detail(orderdetailid):
+    """
+    Update an existing order detail
+    ---
+    Parameters:
+        orderdetailid (int): The ID of the order detail to update
+        JSON body with:
+        - orderitemid (optional): The item ID
+        - quantity (optional): The quantity ordered
+        - unitrate (optional): The unit price
+    Returns:
+        A JSON object containing the updated order detail
+    Responses:
+        404: Order detail not found
+        409: The new orderitemid is already on the order
+    Notes:
+        The rowtotal is automatically recalculated if quantity or unitrate changes
+    """
+    detail = db.session.get(OrderDetail, orderdetailid)
+    if not detail:
+        return jsonify({'error': 'Order detail not found'}), 404
+    data = request.get_json()
+    
+    if 'orderitemid' in data:
+        detail.orderitemid = data['orderitemid']
+    
+    # Update quantity and/or unit rate and recalculate row total if needed
+    recalculate = False
+    
+    if 'quantity' in data:
+        detail.quantity = data['quantity']
+        recalculate = True
+    
+    if 'unitrate' in data:
+        detail.unitrate = data['unitrate']
+        recalculate = True
+    
+    if recalculate:
+        detail.rowtotal = detail.quantity * detail.unitrate
+    
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': 'The item is already on this order'}), 409
+    response_cache.invalidate(f'detail:{orderdetailid}', *order_tags(detail.orderid))
+    return jsonify(detail.to_dict())
+
+@api_bp.route('/orderdetails/bulk', methods=['PATCH'])
+def bulk_update_order_details():
+    """
+    Partially update many order details in one transaction
+    ---
+    Parameters:
+        JSON body: a list (or {"items": [...]}) of at most 1000 items, each with:
+        - id: The ID of the order detail to update
+        - changes: Object with orderitemid, quantity and/or unitrate, as for PATCH /orderdetails/<id>
+    Returns:
+        A JSON object containing the number of details updated and a result per item
+        (status updated, not_found or invalid)
+    Responses:
+        400: Not a list of items, or too many
+        409: An orderitemid change would duplicate a line; nothing is applied
+        500: Server error
+    Notes:
+        Valid items are applied with one executemany UPDATE that recomputes
+        rowtotal in SQL; invalid items are reported and skipped.
+    """
+    items, error = _bulk_items()
+    if error:
+        return error
+    parsed = parse_bulk_items(items, detail_changes)
+    valid = [(detailid, changes) for detailid, changes, error in parsed if not error]
+    details = {}
+    if valid:
+        try:
+            details = bulk_patch_details(db.session, valid)
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({'status': 'error', 'message': 'An orderitemid change would put an item on an order twice'}), 409
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'status': 'error', 'message': f'Database error: {str(e)}'}), 500
+    if details:
+        response_cache.invalidate(
+            *(f'detail:{detailid}' for detailid in details),
+            *chain.from_iterable(order_tags(orderid) for orderid in {d['orderid'] for d in details.values()}))
+    return jsonify({
+        'status': 'success',
+        'message': f'{len(details)} order details updated',
+        'data': {'updated': len(details), 'results': _bulk_results(parsed, details)}
+    })
+
+@api_bp.route('/orderdetails/<int:orderdetailid>', methods=['PATCH'])
+def patch_order_detail(orderdetailid):
+    """
+    Partially update an order detail without loading it
+    ---
+    Parameters:
+        orderdetailid (int): The ID of the order detail to update
+        JSON body with:
+        - orderitemid (optional): The item ID
+        - quantity (optional): The quantity ordered
+        - unitrate (optional): The unit price
+    Returns:
+        A JSON object containing the updated order detail
+    Responses:
+        404: Order detail not found
+        400: Invalid input data
+        409: The new orderitemid is already on the order
+    Notes:
+        Issues a single UPDATE ... RETURNING; rowtotal is recomputed in SQL
+        when quantity or unitrate changes.
+    """
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+    try:
+        changes = detail_changes(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not changes:
+        detail = cached_get(OrderDetail, orderdetailid)
+        if detail is None:
+            return jsonify({'error': 'Order detail not found'}), 404
+        return jsonify(detail.to_dict())
+
+    try:
+        detail = patch_detail(db.session, orderdetailid, changes)
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': 'The item is already on this order'}), 409
+    if detail is None:
+        db.session.rollback()
+        return jsonify({'error': 'Order detail not found'}), 404
+    db.session.commit()
+    response_cache.invalidate(f'detail:{orderdetailid}', *order_tags(detail['orderid']))
+    return jsonify(detail)
+
+@api_bp.route('/orderdetails/<int:orderdetailid>', methods=['DELETE'])
+def delete_order_detail(orderdetailid):
+    """
+    Delete an order detail
+    ---
+    Parameters:
+        orderdetailid (int): The ID of the order detail to delete
+    Returns:
+        A JSON message confirming deletion
+    Responses:
+        404: Order detail not found
+    """
+    detail = db.session.get(OrderDetail, orderdetailid)
+    if not detail:
+        return jsonify({'error': 'Order detail not found'}), 404
+    db.session.delete(detail)
+    db.session.commit()
+    response_cache.invalidate(f'detail:{orderdetailid}', *order_tags(detail.orderid))
+    return jsonify({'message': 'Order detail deleted successfully'})
+
+# ============================================================================
+# Intake Job Routes
+# ============================================================================
+@api_bp.route('/jobs/<int:jobid>', methods=['GET'])
+def get_job(jobid):
+    """
+    Get the status of an order or detail create, or of a repricing, accepted with 202
+    ---
+    Parameters:
+        jobid (int): The job ID from the 202 response
+    Returns:
+        A JSON object containing the job: kind, status (queued, running, done or failed),
+        result (the created order or detail once done, or a repricing's progress)
+        and error (once failed)
+    Responses:
+        404: Job not found
+    """
+    job = db.session.get(IntakeJob, jobid)
+    if not job:
+        return jsonify({'status': 'error', 'message': 'Job not found'}), 404
+    
+    response = jsonify({'status': 'success', 'data': job.to_dict()})
+    if job.status == 'queued':
+        # Pick up jobs left queued by a restarted worker
+        (get_repricer() if job.kind == REPRICE_JOB else get_intake_worker()).wake()
+    elif job.status == 'running' and job.kind == REPRICE_JOB:
+        # Take it over if its worker died
+        get_repricer().wake()
+    if job.status in ('queued', 'running'):
+        response.headers['Retry-After'] = '1'
+    return response
+
+@api_bp.route('/items/<int:orderitemid>/reprice', methods=['POST'])
+def reprice_item(orderitemid):
+    """
+    Change an item's unit rate on every order line that has it
+    ---
+    Parameters:
+        orderitemid (int): The item to reprice
+        JSON body with:
+        - unitrate: The new unit price
+        - customer_id (optional): Only lines of this customer's orders
+        - since (optional): Only orders dated on or after this date (ISO format)
+        - before (optional): Only orders dated before this date (ISO format)
+    Returns:
+        202 with the job; poll GET /api/jobs/<jobid> for progress (matched,
+        updated, chunks) until its status is done or failed
+    Responses:
+        400: Invalid input data
+    Notes:
+        Lines are repriced in chunks that each commit on their own, so the
+        write lock is never held for the whole run. rowtotal is recomputed in SQL.
+    """
+    data = request.get_json(silent=True)
+    if not data or 'unitrate' not in data:
+        return jsonify({'status': 'error', 'message': 'unitrate is required'}), 400
+    try:
+        unitrate = float(data['unitrate'])
+    except (ValueError, TypeError):
+        return jsonify({'status': 'error', 'message': 'Unit rate must be a valid number'}), 400
+    if unitrate < 0:
+        return jsonify({'status': 'error', 'message': 'Unit rate cannot be negative'}), 400
+    payload = {'orderitemid': orderitemid, 'unitrate': unitrate}
+
+    if data.get('customer_id') is not None:
+        try:
+            payload['customer_id'] = int(data['customer_id'])
+        except (ValueError, TypeError):
+            return jsonify({'status': 'error', 'message': 'Customer ID must be a valid integer'}), 400
+    for key in ('since', 'before'):
+        if data.get(key):
+            try:
+                payload[key] = datetime.fromisoformat(data[key]).isoformat()
+            except (ValueError, TypeError):
+                return jsonify({'status': 'error', 'message': f'Invalid {key} date format. Use ISO format (YYYY-MM-DD)'}), 400
+
+    return _accepted(enqueue_reprice(payload), 'Repricing accepted')
+
+# ============================================================================
+# Change Feed Routes
+# ============================================================================
+@api_bp.route('/changes', methods=['GET'])
+def get_changes():
+    """
+    Get order and detail changes after a cursor, waiting for new ones if asked
+    ---
+    Parameters:
+        since (optional): Cursor from the previous call's "next" (default: 0, the beginning)
+        limit (optional): Most events to return (default: 100, max: 1000)
+        wait (optional): Seconds to wait for changes when there are none yet (default: 0, max: 30)
+    Returns:
+        A JSON object containing:
+        - events: Array of changes in commit order (seq, entity, entityid, orderid, op, data, created_at)
+        - next: Cursor to pass as "since" for the following call
+        - has_more: Whether more events are already waiting
+    Responses:
+        400: Invalid since, limit or wait
+        429: No events yet and this worker already has CHANGES_MAX_WAITERS readers waiting
+    Config:
+        CHANGES_MAX_WAITERS: Readers waiting at once per process (default: 100; serve.py
+            caps it at --threads - 1)
+    Notes:
+        Events are kept for OUTBOX_RETENTION_DAYS (see intake.prune_history); a
+        reader further behind than that should re-list orders before resuming.
+    """
+    since = request.args.get('since', 0, type=int)
+    limit = request.args.get('limit', 100, type=int)
+    wait = request.args.get('wait', 0, type=float)
+    if since < 0 or limit < 1 or wait < 0:
+        return jsonify({'status': 'error', 'message': 'since and wait must be non-negative and limit positive'}), 400
+    limit = min(limit, 1000)
+    wait = min(wait, current_app.config.get('CHANGES_MAX_WAIT', 30))
+    budget = current_budget()
+    if budget is not None:
+        # Answer (empty) before the request deadline cuts the next query off
+        wait = max(0, min(wait, budget.remaining() - 0.5))
+    
+    feed = get_change_feed()
+    wait_until = time.monotonic() + wait
+    waiting = False
+    try:
+        while True:
+            version = feed.version
+            events = read_changes(since, limit + 1)
+            remaining = wait_until - time.monotonic()
+            if events or remaining <= 0:
+                break
+            if not waiting:
+                if not feed.join():
+                    response = jsonify({'status': 'error', 'message': 'Too many waiting readers, poll again later'})
+                    response.status_code = 429
+                    response.headers['Retry-After'] = '1'
+                    return response
+                waiting = True
+            # Don't hold a connection while waiting; other workers' commits are seen on the next poll
+            db.session.rollback()
+            feed.wait(version, min(remaining, current_app.config.get('CHANGES_POLL_INTERVAL', 1.0)))
+    finally:
+        if waiting:
+            feed.leave()
+    
+    has_more = len(events) > limit
+    events = events[:limit]
+    return jsonify({
+        'status': 'success',
+        'data': {
+            'events': [e.to_dict() for e in events],
+            'next': events[-1].seq if events else since,
+            'has_more': has_more
+        }
+    })
+
+@api_bp.route('/events', methods=['GET'])
+def stream_events():
+    """
+    Stream order and detail changes as Server-Sent Events
+    ---
+    Parameters:
+        customer_id (optional): Only changes to this customer's orders
+        order_id (optional): Only changes to this order and its details
+        Last-Event-ID header (optional): Resume after this event (also accepted as ?since=)
+    Returns:
+        A text/event-stream of "<entity>.<op>" events (e.g. detail.updated) whose data
+        is the change as returned by /changes and whose id is its cursor. A "reset"
+        event asks the client to reconnect with Last-Event-ID.
+    Responses:
+        503: Too many open streams in this worker
+    Config:
+        SSE_BACKLOG_LIMIT: Most missed events replayed per connection (default: 1000)
+    """
+    customer_id = request.args.get('customer_id', type=int)
+    order_id = request.args.get('order_id', type=int)
+    since = request.headers.get('Last-Event-ID', type=int)
+    if since is None:
+        since = request.args.get('since', type=int)
+    
+    broadcaster = get_broadcaster()
+    subscription = broadcaster.subscribe(customer_id, order_id)
+    if subscription is None:
+        response = jsonify({'status': 'error', 'message': 'Too many open event streams'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '5'
+        return response
+    
+    # Subscribed first, so nothing committed while the backlog is read is missed
+    backlog, resume_after = [], None
+    if since is not None:
+        limit = current_app.config.get('SSE_BACKLOG_LIMIT', 1000)
+        events = [e.to_dict() for e in read_changes(since, limit + 1)]
+        if len(events) > limit:
+            resume_after = events[limit - 1]['seq']
+        backlog = [e for e in events[:limit] if subscription.wants(e)]
+    
+    response = current_app.response_class(
+        stream(broadcaster, subscription, backlog, current_app.json.dumps,
+               current_app.config.get('SSE_HEARTBEAT', 15), resume_after),
+        mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# ============================================================================
+# Batch
+# ============================================================================
+@api_bp.route('/batch', methods=['POST'])
+@idempotency.idempotent
+def batch_requests():
+    """
+    Run several API calls in one request
+    ---
+    Parameters:
+        JSON body, either a list of requests or an object with:
+        - requests: List of {method, path, body (optional), headers (optional)};
+          paths are relative to the API, e.g. "/orders/5"
+        - atomic (optional): true to commit the requests' writes together or not at all
+        Idempotency-Key header (optional): Retries with the same key get the first response back
+    Returns:
+        A JSON object with 'responses', one {status, headers, body} per request in
+        order, and 'committed', whether the writes were kept
+    Responses:
+        400: Invalid batch, or a request with an Idempotency-Key in an atomic batch
+        409: A request with the same Idempotency-Key is still in progress
+        422: Idempotency-Key reused with a different body
+    Config:
+        BATCH_MAX_REQUESTS: Most requests per batch (default: 100)
+    Notes:
+        Requests run in order through the same views as over HTTP, sharing the
+        batch's admission slot and time budget; each one takes its own
+        rate-limit token and is answered 429 once the client runs out. Without atomic each one commits
+        on its own and failures don't stop the rest. With atomic the first
+        response with status 400 or above rolls back every write of the batch,
+        and the requests after it are reported with status 424; reads inside an
+        atomic batch see its earlier writes and bypass the caches. Requests not
+        started before the batch's time budget ran out are reported with status
+        504, without failing the batch itself.
+        /batch, /events and /changes can't be called from a batch.
+    """
+    try:
+        subrequests, atomic = parse_batch(request.get_json(silent=True),
+                                          current_app.config.get('BATCH_MAX_REQUESTS', 100))
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    responses, committed = run_batch(subrequests, atomic, api_bp.name, current_budget())
+    return jsonify({
+        'status': 'success',
+        'data': {
+            'atomic': atomic,
+            'committed': committed,
+            'responses': responses
+        }
+    })
+
+# ============================================================================
+# Metrics
+# ============================================================================
+@api_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Get cache statistics for this worker
+    ---
+    Returns:
+        A JSON object containing:
+        - response_cache: hits, misses, hit_rate, size, evictions, expirations, invalidations
+        - entity_cache: hits, misses, hit_rate, size, evictions
+        - singleflight: leaders, coalesced (requests that shared a leader's result), timeouts
+        - write_batcher: batches, writes, avg_batch, largest_batch, retried_batches, queued
+        - intake: queued jobs, batches, applied, failed, errors
+        - repricing: jobs run, jobs resumed after their worker died, chunks committed, lines updated, errors
+        - idempotency: stored, replayed, waited, conflicts, mismatches, size
+        - admission: admitted, queued, rate_limited, rejected, timed_out, waiting, in-flight reads and writes
+        - deadlines: requests whose queries were interrupted by their time budget
+        - events: open SSE subscribers, events published, subscribers dropped for falling behind
+        - changes: long-polls of /changes waiting, long-polls turned away with 429
+    """
+    return jsonify({
+        'status': 'success',
+        'data': {
+            'response_cache': response_cache.stats(),
+            'entity_cache': get_entity_cache().stats(),
+            'singleflight': get_singleflight().stats(),
+            'write_batcher': get_write_batcher().stats(),
+            'intake': get_intake_worker().stats(),
+            'repricing': get_repricer().stats(),
+            'idempotency': idempotency.stats(),
+            'admission': get_admission().stats(),
+            'deadlines': deadline_stats(),
+            'events': get_broadcaster().stats(),
+            'changes': get_change_feed().stats()
+        }
+    })
@@ -0,0 +1,113 @@
+# Production server entry point
+# Runs the app under gunicorn with preforked worker processes and a thread pool
+# per worker. app.run(debug=True) in app.py stays the development server.
+#
+# Usage:
+#   python serve.py --bind 0.0.0.0:8000 --workers 9 --threads 4
+#
+# Graceful reload:
+#   kill -HUP <master pid>    restart workers, finishing in-flight requests first
+#   kill -USR2 <master pid>   re-exec the master to pick up new code (with --preload)
+
+import argparse
+import multiprocessing
+import os
+
+
+def default_workers():
+    """Gunicorn's recommended (2 x cores) + 1"""
+    return multiprocessing.cpu_count() * 2 + 1
+
+
+def post_fork(server, worker):
+    """Give each worker its own connection pool instead of the master's"""
+    from app import app
+    from models import db
+
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+def build_options(args):
+    """Translate command line arguments into gunicorn settings"""
+    return {
+        'bind': args.bind,
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread',
+        'keepalive': args.keepalive,
+        'backlog': args.backlog,
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'max_requests': args.max_requests,
+        'max_requests_jitter': args.max_requests_jitter,
+        'preload_app': args.preload,
+        'post_fork': post_fork,
+        'accesslog': args.access_log,
+    }
+
+
+def parse_args(argv=None):
+    env = os.environ.get
+    parser = argparse.ArgumentParser(description='Run the Order System API in production')
+    parser.add_argument('--bind', default=env('ORDER_BIND', '0.0.0.0:8000'),
+                        help='Address to listen on (default: 0.0.0.0:8000)')
+    parser.add_argument('--workers', type=int, default=int(env('ORDER_WORKERS', default_workers())),
+                        help='Worker processes (default: 2 x cores + 1)')
+    parser.add_argument('--threads', type=int, default=int(env('ORDER_THREADS', 4)),
+                        help='Threads per worker (default: 4)')
+    parser.add_argument('--keepalive', type=int, default=int(env('ORDER_KEEPALIVE', 5)),
+                        help='Seconds to hold idle keep-alive connections (default: 5)')
+    parser.add_argument('--backlog', type=int, default=int(env('ORDER_BACKLOG', 2048)),
+                        help='Pending connections the socket queues (default: 2048)')
+    parser.add_argument('--timeout', type=int, default=int(env('ORDER_TIMEOUT', 30)),
+                        help='Seconds before a silent worker is restarted (default: 30)')
+    parser.add_argument('--graceful-timeout', type=int, default=int(env('ORDER_GRACEFUL_TIMEOUT', 30)),
+                        help='Seconds workers get to finish requests on reload (default: 30)')
+    parser.add_argument('--max-requests', type=int, default=int(env('ORDER_MAX_REQUESTS', 0)),
+                        help='Recycle a worker after this many requests (default: 0, never)')
+    parser.add_argument('--max-requests-jitter', type=int, default=int(env('ORDER_MAX_REQUESTS_JITTER', 0)),
+                        help='Random spread added to --max-requests (default: 0)')
+    parser.add_argument('--no-preload', dest='preload', action='store_false',
+                        help='Import the app in each worker instead of once in the master')
+    parser.add_argument('--access-log', default=env('ORDER_ACCESS_LOG'),
+                        help="Access log file, or '-' for stdout (default: off)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.workers > 1:
+        # Share the response cache between workers instead of filling it once per process
+        os.environ.setdefault('RESPONSE_CACHE_BACKEND', 'sqlite')
+    # An open event stream or a waiting /changes long-poll holds one of the
+    # worker's threads; keep one free for everything else. Heavy streaming
+    # needs an async worker.
+    stream_threads = max(args.threads - 1, 0)
+    for name in ('SSE_MAX_SUBSCRIBERS', 'CHANGES_MAX_WAITERS'):
+        os.environ[name] = str(min(int(os.environ.get(name, stream_threads)), stream_threads))
+
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        raise SystemExit('gunicorn is required to run the production server: pip install gunicorn')
+
+    class OrderSystemServer(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                if value is not None:
+                    self.cfg.set(key, value)
+
+        def load(self):
+            from app import app
+            return app
+
+    OrderSystemServer(build_options(args)).run()
+
+
+if __name__ == '__main__':
+    main()
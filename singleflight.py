@@ -0,0 +1,88 @@
+# Single-flight request coalescing
+# When many identical requests arrive together, one of them (the leader) runs the
+# computation and the others wait for it and share its result.
+
+import threading
+
+from flask import current_app
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.failed = False
+
+
+class SingleFlight:
+    """Run at most one computation per key at a time and share the result"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+        self.timeouts = 0
+        self.failures = 0
+
+    def do(self, key, fn, timeout=None):
+        """
+        Return fn(), sharing one call between concurrent callers with the same key
+        ---
+        Parameters:
+            key: Identifies identical work (e.g. a cache key)
+            fn: Computation to run when no identical call is in flight
+            timeout (optional): Seconds to wait for the leader before running fn() anyway
+        Notes:
+            Waiters run fn() themselves if the leader raises or doesn't finish in time,
+            so an error or a slow request is never handed to everyone else.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+
+        if leader:
+            try:
+                call.result = fn()
+                return call.result
+            except BaseException:
+                call.failed = True
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+
+        if not call.done.wait(timeout):
+            with self._lock:
+                self.timeouts += 1
+            return fn()
+        if call.failed:
+            with self._lock:
+                self.failures += 1
+            return fn()
+        with self._lock:
+            self.coalesced += 1
+        return call.result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'leaders': self.leaders,
+                'coalesced': self.coalesced,
+                'timeouts': self.timeouts,
+                'failures': self.failures,
+                'in_flight': len(self._calls),
+            }
+
+
+def get_singleflight(app=None):
+    """The app's SingleFlight group, created on first use"""
+    app = app or current_app
+    group = app.extensions.get('singleflight')
+    if group is None:
+        group = app.extensions.setdefault('singleflight', SingleFlight())
+    return group
@@ -0,0 +1,167 @@
+# Server-Sent Events stream of order changes
+# One broadcaster thread per process tails the outbox (see outbox.py) and fans
+# each committed change out to the subscribed streams. Local commits wake it at
+# once; other workers' commits are picked up on the next poll. The SSE id is the
+# outbox cursor, so a reconnecting client resumes with Last-Event-ID.
+# 1. Each subscriber has a bounded buffer; the broadcaster never blocks on one
+# 2. A subscriber that falls behind is dropped and told to reconnect, and
+#    catches up from the outbox instead of holding memory here
+# 3. Subscribers can filter by customer or order id
+
+import queue
+import threading
+
+from flask import current_app
+from sqlalchemy import select, func
+
+from models import db, OutboxEvent
+from outbox import get_change_feed, read_changes
+
+class Subscription:
+    def __init__(self, buffer_size, customer_id=None, order_id=None):
+        self.queue = queue.Queue(maxsize=buffer_size)
+        self.customer_id = customer_id
+        self.order_id = order_id
+        self.overflowed = False
+
+    def wants(self, event):
+        return ((self.customer_id is None or event['customerid'] == self.customer_id)
+                and (self.order_id is None or event['orderid'] == self.order_id))
+
+
+class Broadcaster:
+    """
+    Fans outbox events out to SSE subscribers of one process
+    ---
+    Config:
+        SSE_BUFFER_SIZE: Events buffered per subscriber before it is dropped (default: 256)
+        SSE_MAX_SUBSCRIBERS: Open streams per process (default: 100; serve.py caps it at
+            --threads - 1, since under gthread each stream holds a thread for its
+            whole life; heavy streaming needs an async worker class instead)
+        SSE_POLL_INTERVAL: Seconds between outbox checks for other workers' changes (default: 1.0)
+        SSE_HEARTBEAT: Seconds between keep-alive comments on an idle stream (default: 15)
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.buffer_size = app.config.get('SSE_BUFFER_SIZE', 256)
+        self.max_subscribers = app.config.get('SSE_MAX_SUBSCRIBERS', 100)
+        self.poll_interval = app.config.get('SSE_POLL_INTERVAL', 1.0)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.last_seq = None
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, customer_id=None, order_id=None):
+        """Register a subscriber, or return None when the process has too many"""
+        subscription = Subscription(self.buffer_size, customer_id, order_id)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            self._subscribers.add(subscription)
+            if self._thread is None or not self._thread.is_alive():
+                # Live events start from now; earlier ones are the backlog's job
+                self.last_seq = db.session.scalar(select(func.coalesce(func.max(OutboxEvent.seq), 0)))
+                self._thread = threading.Thread(target=self._run, name='sse-broadcaster', daemon=True)
+                self._thread.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, events):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for event in events:
+            for subscription in subscribers:
+                if subscription.overflowed or not subscription.wants(event):
+                    continue
+                try:
+                    subscription.queue.put_nowait(event)
+                except queue.Full:
+                    subscription.overflowed = True
+                    self.unsubscribe(subscription)
+                    self.dropped += 1
+            self.published += 1
+
+    def _run(self):
+        feed = get_change_feed(self.app)
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    # Stop tailing until someone subscribes again
+                    self._thread = None
+                    return
+            version = feed.version
+            with self.app.app_context():
+                try:
+                    events = [event.to_dict() for event in read_changes(self.last_seq, 500)]
+                except Exception:
+                    events = []
+                finally:
+                    db.session.remove()
+            if events:
+                self.publish(events)
+                self.last_seq = events[-1]['seq']
+            else:
+                feed.wait(version, self.poll_interval)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'subscribers': len(self._subscribers),
+                'published': self.published,
+                'dropped': self.dropped,
+            }
+
+
+def get_broadcaster(app=None):
+    """The app's broadcaster, created on first use"""
+    app = app or current_app._get_current_object()
+    broadcaster = app.extensions.get('broadcaster')
+    if broadcaster is None:
+        broadcaster = app.extensions.setdefault('broadcaster', Broadcaster(app))
+    return broadcaster
+
+
+def format_event(event, dumps):
+    """One SSE message; the id is the outbox cursor"""
+    return f"id: {event['seq']}\nevent: {event['entity']}.{event['op']}\ndata: {dumps(event)}\n\n"
+
+
+def stream(broadcaster, subscription, backlog, dumps, heartbeat, resume_after=None):
+    """
+    Yield SSE messages: the backlog first, then live events until the client goes away
+    ---
+    Live events already sent as part of the backlog are skipped. A subscriber
+    dropped for falling behind, or whose backlog didn't fit in one response,
+    gets a 'reset' event and the stream ends; the client reconnects with
+    Last-Event-ID and catches up from the outbox. For a cut-off backlog the
+    reset carries the cursor to resume after (``resume_after``), so events
+    filtered out of the backlog aren't read again.
+    """
+    try:
+        last_seq = 0
+        for event in backlog:
+            last_seq = event['seq']
+            yield format_event(event, dumps)
+        if resume_after is not None:
+            yield f'id: {resume_after}\nevent: reset\ndata: {{}}\n\n'
+            return
+        while True:
+            if subscription.overflowed and subscription.queue.empty():
+                yield 'event: reset\ndata: {}\n\n'
+                return
+            try:
+                event = subscription.queue.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ': keep-alive\n\n'
+                continue
+            if event['seq'] > last_seq:
+                last_seq = event['seq']
+                yield format_event(event, dumps)
+    finally:
+        broadcaster.unsubscribe(subscription)
@@ -0,0 +1,108 @@
+import unittest
+import json
+import threading
+from flask import request
+from models import db, OrderHeader
+from testing import make_test_app, close_test_app
+from admission import get_admission
+
+class AdmissionTestCase(unittest.TestCase):
+    """Test case for admission control and load shedding"""
+
+    def setUp(self):
+        """Set up a test app with tight admission limits"""
+        test_app = make_test_app(ADMISSION_MAX_WRITES=1, ADMISSION_QUEUE_SIZE=1, ADMISSION_QUEUE_TIMEOUT=0.05)
+        self.test_app = test_app
+
+        self.app = test_app.test_client()
+        self.app_context = test_app.app_context()
+        self.app_context.push()
+        order = OrderHeader(ordercustomerid=1001)
+        db.session.add(order)
+        db.session.commit()
+        self.order_id = order.orderid
+
+    def tearDown(self):
+        """Clean up after each test"""
+        self.app_context.pop()
+        close_test_app(self.test_app)
+
+    def hold_writes(self):
+        """Keep the next PUT request in its slot until the returned event is set"""
+        entered = threading.Event()
+        release = threading.Event()
+
+        @self.test_app.after_request
+        def block(response):
+            if request.method == 'PUT' and not entered.is_set():
+                entered.set()
+                release.wait(5)
+            return response
+
+        thread = threading.Thread(target=lambda: self.test_app.test_client().put(
+            f'/orders/{self.order_id}', data=json.dumps({'ordercustomerid': 2002}),
+            content_type='application/json'))
+        thread.start()
+        entered.wait(5)
+        return thread, release
+
+    def test_rate_limit_returns_429(self):
+        """Test that a client over its token bucket gets 429 with Retry-After"""
+        self.test_app.config['ADMISSION_RATE'] = 0.5
+        self.test_app.config['ADMISSION_BURST'] = 2
+        statuses = [self.app.get(f'/orders/{self.order_id}').status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+
+        response = self.app.get(f'/orders/{self.order_id}')
+        self.assertEqual(response.headers['Retry-After'], '2')
+        other = self.test_app.test_client().get(f'/orders/{self.order_id}',
+                                                environ_base={'REMOTE_ADDR': '10.0.0.2'})
+        self.assertEqual(other.status_code, 200)
+
+    def test_low_rate_allows_one_request(self):
+        """Test that a rate below one request per two seconds still lets a request through"""
+        self.test_app.config['ADMISSION_RATE'] = 0.1
+        statuses = [self.app.get(f'/orders/{self.order_id}').status_code for _ in range(2)]
+        self.assertEqual(statuses, [200, 429])
+        self.assertEqual(self.app.get(f'/orders/{self.order_id}').headers['Retry-After'], '10')
+
+        self.test_app.extensions.pop('admission')
+        self.test_app.config['ADMISSION_BURST'] = 0.5
+        with self.assertRaises(ValueError):
+            get_admission(self.test_app)
+
+    def test_busy_writes_shed_and_reads_unaffected(self):
+        """Test that writes over the limit get 503 after the queue deadline while reads still pass"""
+        thread, release = self.hold_writes()
+        try:
+            response = self.test_app.test_client().put(
+                f'/orders/{self.order_id}', data=json.dumps({'ordercustomerid': 3003}),
+                content_type='application/json')
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response.headers['Retry-After'], '1')
+            self.assertEqual(self.app.get(f'/orders/{self.order_id}').status_code, 200)
+            # Lookups are POSTs but only read
+            self.assertEqual(self.app.post('/orders/lookup', json={'ids': [self.order_id]}).status_code, 200)
+
+            stats = json.loads(self.app.get('/metrics').data)['data']['admission']
+            self.assertEqual(stats['timed_out'], 1)
+            self.assertEqual(stats['in_flight_writes'], 1)
+        finally:
+            release.set()
+            thread.join(5)
+        self.assertEqual(get_admission().stats()['in_flight_writes'], 0)
+
+    def test_full_queue_rejects_immediately(self):
+        """Test that requests beyond the wait queue are rejected without waiting"""
+        self.test_app.config['ADMISSION_QUEUE_SIZE'] = 0
+        thread, release = self.hold_writes()
+        try:
+            response = self.test_app.test_client().delete(f'/orders/{self.order_id}')
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(get_admission().stats()['rejected'], 1)
+        finally:
+            release.set()
+            thread.join(5)
+
+if __name__ == '__main__':
+    unittest.main()
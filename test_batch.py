@@ -0,0 +1,152 @@
+import unittest
+import json
+import tempfile
+import time
+from flask import request
+from sqlalchemy import select, func
+from models import db, OrderHeader, OrderDetail, OutboxEvent
+from testing import make_test_app, close_test_app
+
+class BatchTestCase(unittest.TestCase):
+    """Test case for POST /batch"""
+
+    def setUp(self):
+        """Set up a test app on a file database with one order and one detail"""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        test_app = make_test_app(f'sqlite:///{self.tmpdir.name}/orders.db', prefix='/api')
+        self.test_app = test_app
+        self.app = test_app.test_client()
+
+        with test_app.app_context():
+            order = OrderHeader(ordercustomerid=1001)
+            db.session.add(order)
+            db.session.flush()
+            detail = OrderDetail(orderid=order.orderid, orderitemid=101, quantity=2, unitrate=5.0, rowtotal=10.0)
+            db.session.add(detail)
+            db.session.commit()
+            self.order_id = order.orderid
+            self.detail_id = detail.orderdetailid
+
+    def tearDown(self):
+        """Clean up after each test"""
+        close_test_app(self.test_app)
+        self.tmpdir.cleanup()
+
+    def batch(self, payload, **kwargs):
+        return self.app.post('/api/batch', data=json.dumps(payload), content_type='application/json', **kwargs)
+
+    def count(self, model, *where):
+        with self.test_app.app_context():
+            return db.session.execute(select(func.count()).select_from(model).where(*where)).scalar()
+
+    def test_runs_requests_in_order(self):
+        """Test that each request gets its own response and failures don't stop the rest"""
+        response = self.batch([
+            {'method': 'POST', 'path': '/orders', 'body': {'ordercustomerid': 2002}},
+            {'method': 'GET', 'path': '/orders/999'},
+            {'path': f'/orders/{self.order_id}'},
+            {'method': 'PATCH', 'path': f'/orderdetails/{self.detail_id}', 'body': {'quantity': 3}},
+        ])
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)['data']
+        self.assertTrue(data['committed'])
+        self.assertEqual([r['status'] for r in data['responses']], [201, 404, 200, 200])
+        self.assertEqual(data['responses'][0]['body']['data']['ordercustomerid'], 2002)
+        self.assertEqual(data['responses'][2]['body']['orderid'], self.order_id)
+        self.assertIn('ETag', data['responses'][2]['headers'])
+        self.assertEqual(data['responses'][3]['body']['rowtotal'], 15.0)
+        self.assertEqual(self.count(OrderHeader), 2)
+
+    def test_atomic_batch_commits_together(self):
+        """Test that an atomic batch sees its own writes and publishes them once committed"""
+        cached = json.loads(self.app.get('/api/orders?customer_id=3003').data)['data']['total']
+        self.assertEqual(cached, 0)
+        self.app.get(f'/api/orderdetails/{self.detail_id}')
+
+        response = self.batch({'atomic': True, 'requests': [
+            {'method': 'POST', 'path': '/orders', 'body': {'ordercustomerid': 3003}},
+            {'path': '/orders?customer_id=3003'},
+            {'method': 'PUT', 'path': f'/orderdetails/{self.detail_id}', 'body': {'quantity': 4}},
+        ]})
+        data = json.loads(response.data)['data']
+        self.assertTrue(data['committed'])
+        self.assertEqual([r['status'] for r in data['responses']], [201, 200, 200])
+        self.assertEqual(data['responses'][1]['body']['data']['total'], 1)
+
+        # Caches filled before the batch don't serve the old values
+        self.assertEqual(json.loads(self.app.get('/api/orders?customer_id=3003').data)['data']['total'], 1)
+        detail = json.loads(self.app.get(f'/api/orderdetails/{self.detail_id}').data)
+        self.assertEqual(detail['quantity'], 4.0)
+        self.assertEqual(self.count(OutboxEvent, OutboxEvent.customerid == 3003), 1)
+
+    def test_atomic_batch_rolls_back_on_failure(self):
+        """Test that the first failing request undoes the batch's writes and skips the rest"""
+        events = self.count(OutboxEvent)
+        response = self.batch({'atomic': True, 'requests': [
+            {'method': 'POST', 'path': '/orders', 'body': {'ordercustomerid': 4004}},
+            {'method': 'PATCH', 'path': f'/orderdetails/{self.detail_id}', 'body': {'quantity': 9}},
+            {'method': 'POST', 'path': f'/orders/{self.order_id}/details',
+             'body': {'orderitemid': 102, 'quantity': -1, 'unitrate': 1.0}},
+            {'method': 'DELETE', 'path': f'/orders/{self.order_id}'},
+        ]})
+        data = json.loads(response.data)['data']
+        self.assertFalse(data['committed'])
+        self.assertEqual([r['status'] for r in data['responses']], [201, 200, 400, 424])
+
+        self.assertEqual(self.count(OrderHeader), 1)
+        self.assertEqual(self.count(OutboxEvent), events)
+        detail = json.loads(self.app.get(f'/api/orderdetails/{self.detail_id}').data)
+        self.assertEqual(detail['quantity'], 2.0)
+
+    def test_budget_runs_out_mid_batch(self):
+        """Test that requests after the budget ran out are reported as 504 and earlier results are kept"""
+        self.test_app.config['REQUEST_DEADLINE'] = 0.3
+
+        @self.test_app.before_request
+        def slow_down():
+            if request.method == 'GET':
+                time.sleep(0.4)
+
+        response = self.batch([
+            {'method': 'POST', 'path': '/orders', 'body': {'ordercustomerid': 6006}},
+            {'path': f'/orders/{self.order_id}'},
+            {'method': 'POST', 'path': '/orders', 'body': {'ordercustomerid': 6006}},
+        ])
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)['data']
+        self.assertEqual([r['status'] for r in data['responses']][::2], [201, 504])
+        self.assertEqual(self.count(OrderHeader, OrderHeader.ordercustomerid == 6006), 1)
+
+    def test_subrequests_share_the_batch_slot(self):
+        """Test that sub-requests don't wait for admission slots held by their own batch"""
+        self.test_app.config['ADMISSION_MAX_WRITES'] = 1
+        self.test_app.config['ADMISSION_QUEUE_TIMEOUT'] = 0.1
+        response = self.batch([{'method': 'POST', 'path': '/orders', 'body': {'ordercustomerid': 5005}}] * 3)
+        self.assertEqual([r['status'] for r in json.loads(response.data)['data']['responses']], [201] * 3)
+
+    def test_subrequests_take_rate_limit_tokens(self):
+        """Test that every request of a batch counts against the client's rate limit"""
+        self.test_app.config['ADMISSION_RATE'] = 0.1
+        self.test_app.config['ADMISSION_BURST'] = 3
+        response = self.batch([{'path': f'/orders/{self.order_id}'}] * 3)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['status'] for r in json.loads(response.data)['data']['responses']], [200, 200, 429])
+        self.assertEqual(self.batch([{'path': f'/orders/{self.order_id}'}]).status_code, 429)
+
+    def test_invalid_batches(self):
+        """Test that malformed batches and unavailable paths are rejected"""
+        self.test_app.config['BATCH_MAX_REQUESTS'] = 2
+        self.assertEqual(self.batch([]).status_code, 400)
+        self.assertEqual(self.batch({'requests': [{'path': '/orders'}] * 3}).status_code, 400)
+        self.assertEqual(self.batch([{'method': 'TRACE', 'path': '/orders'}]).status_code, 400)
+        self.assertEqual(self.batch([{'path': 'orders'}]).status_code, 400)
+        self.assertEqual(self.batch({'atomic': True, 'requests': [
+            {'method': 'POST', 'path': '/orders', 'headers': {'Idempotency-Key': 'k'}}]}).status_code, 400)
+
+        response = self.batch([{'method': 'POST', 'path': '/batch', 'body': []}, {'path': '/events'}])
+        self.assertEqual([r['status'] for r in json.loads(response.data)['data']['responses']], [400, 400])
+        response = self.batch([{'path': '/nowhere'}])
+        self.assertEqual(json.loads(response.data)['data']['responses'][0]['status'], 404)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+import json
+from sqlalchemy import event, select, func, insert, text
+from models import db, OrderHeader, OrderDetail, OutboxEvent
+from testing import make_test_app, close_test_app
+from entity_cache import cached_get
+
+class BulkDeleteTestCase(unittest.TestCase):
+    """Test case for database-level cascading deletes and DELETE /orders"""
+
+    def setUp(self):
+        """Set up a test app with three orders, the first with many details"""
+        test_app = make_test_app()
+        self.test_app = test_app
+
+        self.app = test_app.test_client()
+        self.app_context = test_app.app_context()
+        self.app_context.push()
+
+        orders = [OrderHeader(ordercustomerid=customer_id) for customer_id in (1001, 1001, 2002)]
+        db.session.add_all(orders)
+        db.session.commit()
+        self.order_ids = [order.orderid for order in orders]
+        db.session.execute(insert(OrderDetail), [
+            {'orderid': orderid, 'orderitemid': item, 'quantity': 1, 'unitrate': 1.0, 'rowtotal': 1.0}
+            for orderid, count in zip(self.order_ids, (2000, 2, 2)) for item in range(count)])
+        db.session.commit()
+        db.session.remove()
+
+        self.statements = []
+        event.listen(db.engine, 'before_cursor_execute', self._record)
+
+    def tearDown(self):
+        """Clean up after each test"""
+        event.remove(db.engine, 'before_cursor_execute', self._record)
+        self.app_context.pop()
+        close_test_app(self.test_app)
+
+    def _record(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def count(self, model, *where):
+        return db.session.execute(select(func.count()).select_from(model).where(*where)).scalar()
+
+    def test_delete_order_cascades_in_database(self):
+        """Test that deleting an order removes its details without a statement per line"""
+        detail_id = db.session.execute(select(OrderDetail.orderdetailid).where(
+            OrderDetail.orderid == self.order_ids[0]).limit(1)).scalar()
+        cached_get(OrderDetail, detail_id)
+        db.session.remove()
+        self.statements.clear()
+
+        response = self.app.delete(f'/orders/{self.order_ids[0]}')
+        self.assertEqual(response.status_code, 200)
+        deletes = [s for s in self.statements if s.startswith('DELETE')]
+        self.assertEqual(len(deletes), 1)
+        self.assertLess(len(self.statements), 10)
+
+        self.assertEqual(self.count(OrderDetail, OrderDetail.orderid == self.order_ids[0]), 0)
+        self.assertEqual(self.count(OutboxEvent, OutboxEvent.op == 'deleted'), 2001)
+        self.assertEqual(self.app.get(f'/orderdetails/{detail_id}').status_code, 404)
+
+    def test_other_integrity_errors_not_a_conflict(self):
+        """Test that only the one-line-per-item index turns a failed detail create into a 409"""
+        db.session.execute(text(
+            "CREATE TRIGGER refuse_lines BEFORE INSERT ON order_details "
+            "BEGIN SELECT RAISE(ABORT, 'CHECK constraint failed: refuse_lines'); END"))
+        db.session.commit()
+        response = self.app.post(f'/orders/{self.order_ids[2]}/details',
+                                 json={'orderitemid': 7, 'quantity': 1, 'unitrate': 1})
+        self.assertEqual(response.status_code, 500)
+        self.assertIn('refuse_lines', response.get_json()['message'])
+
+    def test_bulk_delete_by_ids_and_filter(self):
+        """Test deleting several orders by ids and by customer"""
+        response = self.app.delete(f'/orders?ids={self.order_ids[1]},{self.order_ids[2]},999')
+        self.assertEqual(json.loads(response.data)['data']['deleted'], 2)
+        self.assertEqual(self.count(OrderHeader), 1)
+        self.assertEqual(self.count(OrderDetail), 2000)
+        events = db.session.scalars(select(OutboxEvent).order_by(OutboxEvent.seq)).all()
+        self.assertEqual([(e.entity, e.customerid) for e in events][-2:], [('order', 1001), ('order', 2002)])
+
+        # A cached list page is invalidated
+        self.assertEqual(json.loads(self.app.get('/orders?customer_id=1001').data)['data']['total'], 1)
+        response = self.app.delete('/orders?customer_id=1001')
+        self.assertEqual(json.loads(response.data)['data']['deleted'], 1)
+        self.assertEqual(json.loads(self.app.get('/orders?customer_id=1001').data)['data']['total'], 0)
+        self.assertEqual(self.count(OrderDetail), 0)
+
+    def test_bulk_delete_requires_filter(self):
+        """Test that a bulk delete without filters, or with bad ones, is rejected"""
+        self.assertEqual(self.app.delete('/orders').status_code, 400)
+        self.assertEqual(self.app.delete('/orders?ids=1,x').status_code, 400)
+        self.assertEqual(self.app.delete('/orders?before=yesterday').status_code, 400)
+        self.assertEqual(self.count(OrderHeader), 3)
+
+if __name__ == '__main__':
+    unittest.main()
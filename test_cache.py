@@ -0,0 +1,115 @@
+import unittest
+import json
+import time
+from datetime import datetime
+from models import db, OrderHeader, OrderDetail
+from testing import make_test_app, close_test_app
+from cache import MemoryBackend
+
+class ResponseCacheTestCase(unittest.TestCase):
+    """Test case for the response cache on the order read endpoints"""
+
+    def setUp(self):
+        """Set up a test app with one order and one detail"""
+        test_app = make_test_app()
+        self.test_app = test_app
+
+        self.app = test_app.test_client()
+        self.app_context = test_app.app_context()
+        self.app_context.push()
+
+        order = OrderHeader(ordercustomerid=1001, orderdate=datetime(2024, 1, 1))
+        db.session.add(order)
+        db.session.commit()
+        detail = OrderDetail(orderid=order.orderid, orderitemid=101,
+                             quantity=5, unitrate=10.0, rowtotal=50.0)
+        db.session.add(detail)
+        db.session.commit()
+        self.order_id = order.orderid
+        self.detail_id = detail.orderdetailid
+
+    def tearDown(self):
+        """Clean up after each test"""
+        self.app_context.pop()
+        close_test_app(self.test_app)
+
+    def cache_stats(self):
+        response = self.app.get('/metrics')
+        return json.loads(response.data)['data']['response_cache']
+
+    def test_repeated_reads_hit_cache(self):
+        """Test that the second identical read is served from the cache"""
+        self.app.get(f'/orders/{self.order_id}')
+        self.app.get(f'/orders/{self.order_id}')
+        # Query argument order doesn't matter
+        self.app.get('/orders?customer_id=1001&page=1')
+        self.app.get('/orders?page=1&customer_id=1001')
+
+        stats = self.cache_stats()
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(stats['misses'], 2)
+        self.assertEqual(stats['size'], 2)
+
+    def test_detail_write_evicts_only_affected_entries(self):
+        """Test that updating a detail evicts its order's pages but not other orders"""
+        other = OrderHeader(ordercustomerid=1002)
+        db.session.add(other)
+        db.session.commit()
+        self.app.get(f'/orders/{other.orderid}')
+        self.app.get(f'/orders/{self.order_id}')
+        self.app.get(f'/orders/{self.order_id}/details')
+        self.app.get(f'/orderdetails/{self.detail_id}')
+
+        self.app.put(f'/orderdetails/{self.detail_id}',
+                     data=json.dumps({'quantity': 2}), content_type='application/json')
+
+        self.assertEqual(self.cache_stats()['size'], 1)
+        details = json.loads(self.app.get(f'/orders/{self.order_id}/details').data)
+        self.assertEqual(details[0]['rowtotal'], 20.0)
+        detail = json.loads(self.app.get(f'/orderdetails/{self.detail_id}').data)
+        self.assertEqual(detail['quantity'], 2)
+
+    def test_order_write_evicts_lists(self):
+        """Test that creating an order evicts list pages for that customer"""
+        self.app.get('/orders?customer_id=1001')
+        self.app.get('/orders?customer_id=2002')
+        self.app.post('/orders', data=json.dumps({'ordercustomerid': 1001}),
+                      content_type='application/json')
+
+        data = json.loads(self.app.get('/orders?customer_id=1001').data)
+        self.assertEqual(data['data']['total'], 2)
+        # The other customer's page was left alone
+        self.app.get('/orders?customer_id=2002')
+        self.assertEqual(self.cache_stats()['hits'], 1)
+
+    def test_backend_lru_and_ttl(self):
+        """Test that the backend evicts least recently used and expired entries"""
+        backend = MemoryBackend(max_entries=2, default_ttl=60)
+        backend.set('a', 1)
+        backend.set('b', 2)
+        backend.get('a')
+        backend.set('c', 3)
+        self.assertIsNone(backend.get('b'))
+        self.assertEqual(backend.get('a'), 1)
+        self.assertEqual(backend.stats()['evictions'], 1)
+
+        backend.set('d', 4, ttl=0.01)
+        time.sleep(0.02)
+        self.assertIsNone(backend.get('d'))
+        self.assertEqual(backend.stats()['expirations'], 1)
+
+    def test_backend_drops_renders_overlapping_invalidations(self):
+        """Test that an entry rendered before a write to one of its tags isn't stored"""
+        backend = MemoryBackend(default_ttl=60)
+        generation = backend.generation()
+        backend.invalidate(['order:1'])
+        self.assertFalse(backend.set('/orders/1', 'old', ['order:1'], generation=generation))
+        self.assertIsNone(backend.get('/orders/1'))
+
+        # Other tags, and renders started after the write, are stored
+        self.assertTrue(backend.set('/orders/2', 'two', ['order:2'], generation=generation))
+        self.assertTrue(backend.set('/orders/1', 'new', ['order:1'], generation=backend.generation()))
+        self.assertEqual(backend.get('/orders/1'), 'new')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+import json
+from sqlalchemy import event, select
+from models import db, OrderHeader, OrderDetail, OutboxEvent
+from testing import make_test_app, close_test_app
+
+class CloneTestCase(unittest.TestCase):
+    """Test case for POST /orders/<id>/clone"""
+
+    def setUp(self):
+        """Set up a test app with one order of three lines"""
+        test_app = make_test_app()
+        self.test_app = test_app
+
+        self.app = test_app.test_client()
+        self.app_context = test_app.app_context()
+        self.app_context.push()
+
+        order = OrderHeader(ordercustomerid=1001)
+        db.session.add(order)
+        db.session.flush()
+        db.session.add_all([OrderDetail(orderid=order.orderid, orderitemid=item, quantity=item % 5 + 1,
+                                        unitrate=2.0, rowtotal=(item % 5 + 1) * 2.0) for item in (101, 102, 103)])
+        db.session.commit()
+        self.order_id = order.orderid
+        db.session.remove()
+
+        self.statements = []
+        event.listen(db.engine, 'before_cursor_execute', self._record)
+
+    def tearDown(self):
+        """Clean up after each test"""
+        event.remove(db.engine, 'before_cursor_execute', self._record)
+        self.app_context.pop()
+        close_test_app(self.test_app)
+
+    def _record(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def test_clone_copies_lines_in_one_statement(self):
+        """Test that the clone gets a new header and a copy of every line"""
+        self.assertEqual(json.loads(self.app.get('/orders?customer_id=1001').data)['data']['total'], 1)
+        self.statements.clear()
+
+        response = self.app.post(f'/orders/{self.order_id}/clone')
+        self.assertEqual(response.status_code, 201)
+        order = json.loads(response.data)['data']
+        self.assertNotEqual(order['orderid'], self.order_id)
+        self.assertEqual(order['ordercustomerid'], 1001)
+        self.assertEqual([(d['orderitemid'], d['quantity'], d['rowtotal']) for d in order['details']],
+                         [(101, 2.0, 4.0), (102, 3.0, 6.0), (103, 4.0, 8.0)])
+        inserts = [s for s in self.statements if s.startswith('INSERT INTO order_details')]
+        self.assertEqual(len(inserts), 1)
+
+        details = json.loads(self.app.get(f"/orders/{order['orderid']}/details").data)
+        self.assertEqual(len(details), 3)
+        self.assertEqual(json.loads(self.app.get('/orders?customer_id=1001').data)['data']['total'], 2)
+        events = db.session.scalars(select(OutboxEvent).where(OutboxEvent.orderid == order['orderid'])).all()
+        self.assertEqual([(e.entity, e.op) for e in events], [('order', 'created')] + [('detail', 'created')] * 3)
+
+    def test_clone_for_another_customer(self):
+        """Test cloning for another customer and on a given date"""
+        response = self.app.post(f'/orders/{self.order_id}/clone',
+                                 json={'ordercustomerid': 2002, 'orderdate': '2024-05-01T09:00:00'})
+        order = json.loads(response.data)['data']
+        self.assertEqual(order['ordercustomerid'], 2002)
+        self.assertEqual(order['orderdate'], '2024-05-01T09:00:00')
+
+    def test_clone_missing_or_invalid(self):
+        """Test 404 for a missing order and 400 for an invalid customer"""
+        self.assertEqual(self.app.post('/orders/999/clone').status_code, 404)
+        response = self.app.post(f'/orders/{self.order_id}/clone', json={'ordercustomerid': 'x'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(db.session.execute(select(OrderHeader.orderid)).all(), [(self.order_id,)])
+
+if __name__ == '__main__':
+    unittest.main()
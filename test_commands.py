@@ -0,0 +1,185 @@
+import unittest
+from datetime import timedelta
+from sqlalchemy import event, inspect, select, func, text, update
+from models import db, OrderHeader, OrderDetail, OutboxEvent, IntakeJob, utcnow
+from testing import make_test_app, close_test_app
+from commands import register_commands
+
+class CommandsTestCase(unittest.TestCase):
+    """Test case for the database CLI commands"""
+
+    def setUp(self):
+        """Set up a test app with the commands registered"""
+        test_app = make_test_app(prefix=None, create=False)
+        self.test_app = test_app
+        register_commands(test_app)
+
+        self.runner = test_app.test_cli_runner()
+        self.app_context = test_app.app_context()
+        self.app_context.push()
+
+    def tearDown(self):
+        """Clean up after each test"""
+        self.app_context.pop()
+        close_test_app(self.test_app)
+
+    def test_init_db_and_seed(self):
+        """Test that init-db creates the schema and seed runs only once"""
+        result = self.runner.invoke(args=['init-db'])
+        self.assertEqual(result.exit_code, 0)
+
+        result = self.runner.invoke(args=['seed'])
+        self.assertIn('Sample data added', result.output)
+        self.assertEqual(db.session.execute(select(func.count(OrderHeader.orderid))).scalar(), 2)
+        self.assertEqual(db.session.execute(select(func.count(OrderDetail.orderdetailid))).scalar(), 3)
+
+        result = self.runner.invoke(args=['seed'])
+        self.assertIn('skipping seed', result.output)
+        self.assertEqual(db.session.execute(select(func.count(OrderHeader.orderid))).scalar(), 2)
+
+    def test_init_db_adds_missing_columns(self):
+        """Test that init-db upgrades tables created before new columns were added"""
+        with db.engine.begin() as connection:
+            connection.execute(text(
+                'CREATE TABLE order_headers (orderid INTEGER PRIMARY KEY, '
+                'orderdate DATETIME NOT NULL, ordercustomerid INTEGER NOT NULL)'))
+            connection.execute(text(
+                "INSERT INTO order_headers VALUES (1, '2024-01-01 00:00:00.000000', 1001)"))
+
+        result = self.runner.invoke(args=['init-db'])
+        self.assertIn('Added column order_headers.version', result.output)
+        order = db.session.get(OrderHeader, 1)
+        self.assertEqual(order.version, 1)
+        self.assertIsNotNone(order.updated_at)
+
+    def test_init_db_adds_cascading_foreign_keys(self):
+        """Test that init-db rebuilds order_details with ON DELETE CASCADE, keeping its rows"""
+        db.create_all()
+        with db.engine.begin() as connection:
+            connection.execute(text('DROP TABLE order_details'))
+            connection.execute(text(
+                'CREATE TABLE order_details (orderdetailid INTEGER PRIMARY KEY, '
+                'orderid INTEGER NOT NULL REFERENCES order_headers (orderid), orderitemid INTEGER NOT NULL, '
+                'quantity FLOAT NOT NULL, unitrate FLOAT NOT NULL, rowtotal FLOAT NOT NULL)'))
+            connection.execute(text('CREATE INDEX ix_order_details_orderid ON order_details (orderid)'))
+            connection.execute(text(
+                "INSERT INTO order_headers (orderid, orderdate, ordercustomerid, version, updated_at) "
+                "VALUES (1, '2024-01-01 00:00:00.000000', 1001, 1, '2024-01-01 00:00:00.000000')"))
+            connection.execute(text('INSERT INTO order_details VALUES (7, 1, 101, 2, 5.0, 10.0)'))
+
+        result = self.runner.invoke(args=['init-db'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('Rebuilt order_details with ON DELETE CASCADE', result.output)
+        self.assertEqual(db.session.get(OrderDetail, 7).rowtotal, 10.0)
+        self.assertIn('ix_order_details_orderid',
+                      {index['name'] for index in inspect(db.engine).get_indexes('order_details')})
+        db.session.remove()
+
+        db.session.execute(text('DELETE FROM order_headers WHERE orderid = 1'))
+        db.session.commit()
+        self.assertEqual(db.session.execute(select(func.count(OrderDetail.orderdetailid))).scalar(), 0)
+
+        result = self.runner.invoke(args=['init-db'])
+        self.assertNotIn('Rebuilt', result.output)
+
+    def test_init_db_adds_unique_line_index(self):
+        """Test that init-db creates the unique line index on a database whose foreign keys are current"""
+        self.runner.invoke(args=['init-db'])
+        with db.engine.begin() as connection:
+            connection.execute(text('DROP INDEX ux_order_details_order_item'))
+
+        result = self.runner.invoke(args=['init-db'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertNotIn('Rebuilt', result.output)
+        self.assertIn('Created index ux_order_details_order_item', result.output)
+        names = {index['name'] for index in inspect(db.engine).get_indexes('order_details')}
+        self.assertIn('ux_order_details_order_item', names)
+
+    def test_create_indexes(self):
+        """Test that create-indexes adds indexes missing from an existing database"""
+        self.runner.invoke(args=['init-db'])
+        with db.engine.begin() as connection:
+            connection.execute(text('DROP INDEX ix_order_details_orderid'))
+
+        result = self.runner.invoke(args=['create-indexes'])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn('Created index ix_order_details_orderid', result.output)
+        names = {index['name'] for index in inspect(db.engine).get_indexes('order_details')}
+        self.assertIn('ix_order_details_orderid', names)
+
+    def test_create_indexes_merges_duplicate_lines(self):
+        """Test that duplicate lines are folded together before the unique line index is built"""
+        self.runner.invoke(args=['init-db'])
+        with db.engine.begin() as connection:
+            connection.execute(text('DROP INDEX ux_order_details_order_item'))
+            connection.execute(text(
+                "INSERT INTO order_headers (orderid, orderdate, ordercustomerid, version, updated_at) "
+                "VALUES (1, '2024-01-01 00:00:00.000000', 1001, 1, '2024-01-01 00:00:00.000000')"))
+            connection.execute(text(
+                'INSERT INTO order_details VALUES (1, 1, 101, 2, 5.0, 10.0), (2, 1, 101, 3, 10.0, 30.0), '
+                '(3, 1, 102, 1, 1.0, 1.0)'))
+
+        result = self.runner.invoke(args=['create-indexes'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('Merged 1 duplicate order line(s)', result.output)
+        line = db.session.get(OrderDetail, 1)
+        self.assertEqual((line.quantity, line.unitrate, line.rowtotal), (5, 8.0, 40.0))
+        self.assertEqual(db.session.execute(select(func.count(OrderDetail.orderdetailid))).scalar(), 2)
+
+    def test_generate_data(self):
+        """Test that generate-data bulk-loads orders with lines in chunks"""
+        self.runner.invoke(args=['init-db'])
+        self.runner.invoke(args=['seed'])
+        inserts = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith('INSERT'):
+                inserts.append(executemany)
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            result = self.runner.invoke(args=[
+                'generate-data', '--orders', '250', '--chunk-size', '100', '--seed', '1'])
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('Generated 250 orders', result.output)
+        # Multi-row INSERT ... VALUES statements, not executemany
+        self.assertTrue(inserts)
+        self.assertFalse(any(inserts))
+
+        latest = db.session.execute(select(func.max(OrderHeader.orderdate))).scalar()
+        self.assertLess(abs(latest - utcnow().replace(tzinfo=None)), timedelta(minutes=1))
+        self.assertEqual(db.session.execute(
+            select(func.count()).where(OrderHeader.updated_at.is_(None))).scalar(), 0)
+
+        self.assertEqual(db.session.execute(select(func.count(OrderHeader.orderid))).scalar(), 252)
+        # Every generated order has at least one line and no item appears twice on an order
+        lines = db.session.execute(
+            select(OrderDetail.orderid, func.count(), func.count(OrderDetail.orderitemid.distinct()))
+            .group_by(OrderDetail.orderid)).all()
+        self.assertEqual(len(lines), 252)
+        self.assertTrue(all(count == distinct for _, count, distinct in lines))
+
+    def test_prune(self):
+        """Test that prune deletes events and finished jobs past their retention only"""
+        self.runner.invoke(args=['init-db'])
+        self.runner.invoke(args=['seed'])
+        old = utcnow() - timedelta(days=8)
+        events = db.session.execute(select(func.count()).select_from(OutboxEvent)).scalar()
+        db.session.execute(update(OutboxEvent).where(OutboxEvent.seq <= 2).values(created_at=old))
+        db.session.add_all([
+            IntakeJob(kind='order', payload={}, status='done', completed_at=old),
+            IntakeJob(kind='order', payload={}, status='failed', completed_at=utcnow()),
+            IntakeJob(kind='order', payload={}, status='queued', created_at=old),
+        ])
+        db.session.commit()
+
+        result = self.runner.invoke(args=['prune'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('Deleted 2 outbox events and 1 finished jobs', result.output)
+        self.assertEqual(db.session.execute(select(func.count()).select_from(OutboxEvent)).scalar(), events - 2)
+        self.assertEqual(sorted(db.session.scalars(select(IntakeJob.status))), ['failed', 'queued'])
+
+if __name__ == '__main__':
+    unittest.main()
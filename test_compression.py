@@ -0,0 +1,74 @@
+import unittest
+import gzip
+from flask import Flask, Response, jsonify
+from compression import Compression
+
+class CompressionTestCase(unittest.TestCase):
+    """Test case for the compression middleware"""
+
+    def setUp(self):
+        """Set up a test app with small, large, streamed and cached pages"""
+        test_app = Flask(__name__)
+        test_app.config['TESTING'] = True
+        test_app.config['COMPRESS_ALGORITHMS'] = ['gzip']
+        compression = Compression(test_app)
+        self.renders = 0
+
+        @test_app.route('/small')
+        def small():
+            return jsonify({'status': 'success'})
+
+        @test_app.route('/large')
+        def large():
+            return jsonify({'items': list(range(1000))})
+
+        @test_app.route('/stream')
+        def stream():
+            return Response((f'line {i}\n' for i in range(100)), mimetype='text/plain')
+
+        @test_app.route('/page')
+        @compression.cached
+        def page():
+            self.renders += 1
+            return '<html>' + 'x' * 2000 + '</html>'
+
+        self.app = test_app.test_client()
+
+    def test_large_response_is_compressed(self):
+        """Test that large JSON bodies are gzipped when accepted"""
+        response = self.app.get('/large', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertIn(b'999', gzip.decompress(response.data))
+
+        # Not compressed when the client doesn't ask for it
+        response = self.app.get('/large')
+        self.assertNotIn('Content-Encoding', response.headers)
+
+    def test_small_response_is_not_compressed(self):
+        """Test that bodies under the threshold are sent as-is"""
+        response = self.app.get('/small', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', response.headers)
+
+    def test_streamed_response(self):
+        """Test that streamed bodies are compressed incrementally"""
+        response = self.app.get('/stream', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertTrue(gzip.decompress(response.data).startswith(b'line 0\nline 1\n'))
+
+    def test_cached_page(self):
+        """Test that cached pages are rendered once and support 304s"""
+        first = self.app.get('/page', headers={'Accept-Encoding': 'gzip'})
+        second = self.app.get('/page', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(self.renders, 1)
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(second.headers['Content-Encoding'], 'gzip')
+
+        response = self.app.get('/page', headers={
+            'Accept-Encoding': 'gzip',
+            'If-None-Match': first.headers['ETag']
+        })
+        self.assertEqual(response.status_code, 304)
+
+if __name__ == '__main__':
+    unittest.main()
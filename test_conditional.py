@@ -0,0 +1,90 @@
+import unittest
+import json
+from datetime import datetime
+from sqlalchemy import event
+from models import db, OrderHeader, OrderDetail
+from testing import make_test_app, close_test_app
+
+class ConditionalGetTestCase(unittest.TestCase):
+    """Test case for ETag / Last-Modified handling on order reads"""
+
+    def setUp(self):
+        """Set up a test app with one order and one detail"""
+        test_app = make_test_app()
+        self.test_app = test_app
+
+        self.app = test_app.test_client()
+        self.app_context = test_app.app_context()
+        self.app_context.push()
+
+        order = OrderHeader(ordercustomerid=1001, orderdate=datetime(2024, 1, 1))
+        db.session.add(order)
+        db.session.commit()
+        detail = OrderDetail(orderid=order.orderid, orderitemid=101,
+                             quantity=5, unitrate=10.0, rowtotal=50.0)
+        db.session.add(detail)
+        db.session.commit()
+        self.order_id = order.orderid
+        self.detail_id = detail.orderdetailid
+
+    def tearDown(self):
+        """Clean up after each test"""
+        self.app_context.pop()
+        close_test_app(self.test_app)
+
+    def test_etag_and_not_modified(self):
+        """Test that a matching If-None-Match returns 304 with a single query"""
+        response = self.app.get(f'/orders/{self.order_id}/details')
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers['ETag']
+        self.assertIn('Last-Modified', response.headers)
+
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            response = self.app.get(f'/orders/{self.order_id}/details',
+                                    headers={'If-None-Match': etag})
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(statements), 1)
+        self.assertNotIn('order_details', statements[0])
+
+        # Compressed representations carry an encoding suffix
+        response = self.app.get(f'/orders/{self.order_id}/details',
+                                headers={'If-None-Match': etag[:-1] + '-gzip"'})
+        self.assertEqual(response.status_code, 304)
+
+    def test_detail_write_changes_etag(self):
+        """Test that changing a detail bumps the order's version"""
+        header_etag = self.app.get(f'/orders/{self.order_id}').headers['ETag']
+        details_etag = self.app.get(f'/orders/{self.order_id}/details').headers['ETag']
+
+        self.app.put(f'/orderdetails/{self.detail_id}',
+                     data=json.dumps({'quantity': 2}), content_type='application/json')
+
+        response = self.app.get(f'/orders/{self.order_id}', headers={'If-None-Match': header_etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], header_etag)
+        response = self.app.get(f'/orders/{self.order_id}/details',
+                                headers={'If-None-Match': details_etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)[0]['quantity'], 2)
+        self.assertEqual(db.session.get(OrderHeader, self.order_id).version, 3)
+
+    def test_if_modified_since(self):
+        """Test that If-Modified-Since after the last change returns 304"""
+        response = self.app.get(f'/orders/{self.order_id}')
+        response = self.app.get(f'/orders/{self.order_id}', headers={
+            'If-Modified-Since': response.headers['Last-Modified']
+        })
+        self.assertEqual(response.status_code, 304)
+
+        response = self.app.get(f'/orders/{self.order_id}', headers={
+            'If-Modified-Since': 'Mon, 01 Jan 2001 00:00:00 GMT'
+        })
+        self.assertEqual(response.status_code, 200)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+import json
+import time
+from flask import jsonify
+from models import db, OrderHeader
+from testing import make_test_app, close_test_app
+
+# Never finishes on its own
+RUNAWAY_QUERY = db.text('WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n) SELECT count(*) FROM n')
+
+class DeadlinesTestCase(unittest.TestCase):
+    """Test case for per-request deadlines enforced inside SQLite"""
+
+    def setUp(self):
+        """Set up a test app with a route running a runaway query"""
+        test_app = make_test_app(REQUEST_DEADLINE=0.2)
+
+        @test_app.route('/runaway')
+        def runaway():
+            try:
+                return jsonify({'count': db.session.execute(RUNAWAY_QUERY).scalar()})
+            except Exception as e:
+                db.session.rollback()
+                return jsonify({'status': 'error', 'message': f'Database error: {str(e)}'}), 500
+
+        self.test_app = test_app
+        self.app = test_app.test_client()
+        self.app_context = test_app.app_context()
+        self.app_context.push()
+        db.session.add(OrderHeader(ordercustomerid=1001))
+        db.session.commit()
+
+    def tearDown(self):
+        """Clean up after each test"""
+        self.app_context.pop()
+        close_test_app(self.test_app)
+
+    def test_runaway_query_interrupted(self):
+        """Test that a query past the deadline is interrupted and answered with 504"""
+        started = time.monotonic()
+        response = self.app.get('/runaway')
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual(response.status_code, 504)
+        self.assertIn('0.2s', json.loads(response.data)['message'])
+
+        # The connection is still usable afterwards
+        self.assertEqual(self.app.get('/orders').status_code, 200)
+        metrics = json.loads(self.app.get('/metrics').data)['data']
+        self.assertEqual(metrics['deadlines']['interrupted'], 1)
+
+    def test_header_and_endpoint_budgets(self):
+        """Test that the budget comes from the endpoint config and can be changed by header"""
+        self.test_app.config['REQUEST_DEADLINES'] = {'runaway': 0.05}
+        response = self.app.get('/runaway')
+        self.assertIn('0.05s', json.loads(response.data)['message'])
+
+        response = self.app.get('/runaway', headers={'X-Request-Timeout': '0.1'})
+        self.assertIn('0.1s', json.loads(response.data)['message'])
+
+        self.test_app.config['REQUEST_DEADLINE_MAX'] = 0.15
+        response = self.app.get('/runaway', headers={'X-Request-Timeout': '60'})
+        self.assertIn('0.15s', json.loads(response.data)['message'])
+
+    def test_queries_outside_requests_unlimited(self):
+        """Test that queries outside a request (CLI, workers) have no deadline"""
+        result = db.session.execute(db.text(
+            'WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < 200000) '
+            'SELECT count(*) FROM n')).scalar()
+        self.assertEqual(result, 200000)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+import json
+from datetime import datetime
+from sqlalchemy import event
+from models import db, OrderHeader, OrderDetail
+from testing import make_test_app, close_test_app
+from entity_cache import cached_get, get_entity_cache
+
+class EntityCacheTestCase(unittest.TestCase):
+    """Test case for the primary-key entity cache"""
+
+    def setUp(self):
+        """Set up a test app with the response cache off so reads reach the views"""
+        test_app = make_test_app(RESPONSE_CACHE_ENABLED=False)
+        self.test_app = test_app
+
+        self.app = test_app.test_client()
+        self.app_context = test_app.app_context()
+        self.app_context.push()
+
+        order = OrderHeader(ordercustomerid=1001, orderdate=datetime(2024, 1, 1))
+        db.session.add(order)
+        db.session.commit()
+        detail = OrderDetail(orderid=order.orderid, orderitemid=101,
+                             quantity=5, unitrate=10.0, rowtotal=50.0)
+        db.session.add(detail)
+        db.session.commit()
+        self.order_id = order.orderid
+        self.detail_id = detail.orderdetailid
+        db.session.remove()
+
+        self.statements = []
+        event.listen(db.engine, 'before_cursor_execute', self._record)
+
+    def tearDown(self):
+        """Clean up after each test"""
+        event.remove(db.engine, 'before_cursor_execute', self._record)
+        self.app_context.pop()
+        close_test_app(self.test_app)
+
+    def _record(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def test_hit_skips_database(self):
+        """Test that a second request for the same detail issues no query"""
+        self.app.get(f'/orderdetails/{self.detail_id}')
+        self.statements.clear()
+
+        response = self.app.get(f'/orderdetails/{self.detail_id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['rowtotal'], 50.0)
+        self.assertEqual(self.statements, [])
+        self.assertEqual(get_entity_cache().stats()['hits'], 1)
+
+    def test_update_and_delete_evict(self):
+        """Test that updates and deletes through the session evict the cached row"""
+        self.app.get(f'/orderdetails/{self.detail_id}')
+        self.app.put(f'/orderdetails/{self.detail_id}',
+                     data=json.dumps({'quantity': 2}), content_type='application/json')
+        data = json.loads(self.app.get(f'/orderdetails/{self.detail_id}').data)
+        self.assertEqual(data['rowtotal'], 20.0)
+
+        self.app.delete(f'/orderdetails/{self.detail_id}')
+        response = self.app.get(f'/orderdetails/{self.detail_id}')
+        self.assertEqual(response.status_code, 404)
+
+    def test_cached_instance_is_usable(self):
+        """Test that a cached header can be used to create a detail"""
+        self.app.get(f'/orders/{self.order_id}')
+        response = self.app.post(f'/orders/{self.order_id}/details',
+                                 data=json.dumps({'orderitemid': 102, 'quantity': 1, 'unitrate': 2.0}),
+                                 content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        db.session.remove()
+        self.assertEqual(cached_get(OrderHeader, self.order_id).version, 3)
+
+    def test_stale_read_is_not_cached(self):
+        """Test that a row read before an eviction is not put back in the cache"""
+        cache = get_entity_cache()
+        generation = cache.generation
+        cache.evict([('OrderHeader', self.order_id)])
+        cache.set(('OrderHeader', self.order_id), {'orderid': self.order_id}, generation)
+        self.assertIsNone(cache.get(('OrderHeader', self.order_id)))
+
+if __name__ == '__main__':
+    unittest.main()
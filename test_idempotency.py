@@ -0,0 +1,103 @@
+import unittest
+import json
+import tempfile
+import threading
+import time
+from models import db, OrderHeader, OrderDetail
+from testing import make_test_app, close_test_app
+from idempotency import idempotency
+
+class IdempotencyTestCase(unittest.TestCase):
+    """Test case for Idempotency-Key handling on the create endpoints"""
+
+    def setUp(self):
+        """Set up a test app on a file database so requests can run in threads"""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        test_app = make_test_app(f'sqlite:///{self.tmpdir.name}/orders.db')
+        self.test_app = test_app
+        self.app = test_app.test_client()
+
+        with test_app.app_context():
+            order = OrderHeader(ordercustomerid=1001)
+            db.session.add(order)
+            db.session.commit()
+            self.order_id = order.orderid
+
+    def tearDown(self):
+        """Clean up after each test"""
+        close_test_app(self.test_app)
+        self.tmpdir.cleanup()
+
+    def post(self, url, payload, key):
+        return self.test_app.test_client().post(url, data=json.dumps(payload), content_type='application/json',
+                                                headers={'Idempotency-Key': key})
+
+    def count(self, model):
+        with self.test_app.app_context():
+            return db.session.query(model).count()
+
+    def test_retry_replays_first_response(self):
+        """Test that a retried create returns the stored response without writing again"""
+        payload = {'orderitemid': 101, 'quantity': 2, 'unitrate': 5.0}
+        url = f'/orders/{self.order_id}/details'
+        first = self.post(url, payload, 'retry-1')
+        second = self.post(url, payload, 'retry-1')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second.headers['Idempotent-Replayed'], 'true')
+        self.assertEqual(self.count(OrderDetail), 1)
+
+        # A new key is a new request
+        self.assertEqual(self.post(url, dict(payload, orderitemid=102), 'retry-2').status_code, 201)
+        self.assertEqual(self.count(OrderDetail), 2)
+
+    def test_key_reused_with_different_body(self):
+        """Test that reusing a key for a different request is rejected"""
+        self.post('/orders', {'ordercustomerid': 2002}, 'reused')
+        response = self.post('/orders', {'ordercustomerid': 3003}, 'reused')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(self.count(OrderHeader), 2)
+
+    def test_concurrent_duplicates_wait_for_first(self):
+        """Test that concurrent requests with one key create one order and share its response"""
+        @self.test_app.before_request
+        def slow_down():
+            time.sleep(0.05)
+
+        responses = []
+        threads = [threading.Thread(target=lambda: responses.append(
+                       self.post('/orders', {'ordercustomerid': 4004}, 'concurrent')))
+                   for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+
+        self.assertEqual([r.status_code for r in responses], [201] * 6)
+        self.assertEqual(len({json.loads(r.data)['data']['orderid'] for r in responses}), 1)
+        self.assertEqual(self.count(OrderHeader), 2)
+        with self.test_app.app_context():
+            self.assertEqual(idempotency.stats()['replayed'], 5)
+
+    def test_failure_is_not_stored(self):
+        """Test that a failed request can be retried with the same key"""
+        attempts = []
+
+        @self.test_app.route('/flaky', methods=['POST'])
+        @idempotency.idempotent
+        def flaky():
+            attempts.append(1)
+            status = 500 if len(attempts) == 1 else 201
+            return {'attempt': len(attempts)}, status
+
+        self.assertEqual(self.post('/flaky', {}, 'after-failure').status_code, 500)
+        retried = self.post('/flaky', {}, 'after-failure')
+        self.assertEqual(retried.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', retried.headers)
+        self.assertEqual(self.post('/flaky', {}, 'after-failure').data, retried.data)
+        self.assertEqual(len(attempts), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+import json
+import tempfile
+import time
+from models import db, OrderHeader, OrderDetail, IntakeJob
+from testing import make_test_app, close_test_app
+from intake import IntakeWorker
+
+class IntakeTestCase(unittest.TestCase):
+    """Test case for async intake with 202 Accepted and job polling"""
+
+    def setUp(self):
+        """Set up a test app on a file database the intake worker can share"""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        test_app = make_test_app(f'sqlite:///{self.tmpdir.name}/orders.db')
+        self.test_app = test_app
+        self.app = test_app.test_client()
+
+        with test_app.app_context():
+            order = OrderHeader(ordercustomerid=1001)
+            db.session.add(order)
+            db.session.commit()
+            self.order_id = order.orderid
+
+    def tearDown(self):
+        """Clean up after each test"""
+        close_test_app(self.test_app)
+        self.tmpdir.cleanup()
+
+    def post_async(self, url, payload):
+        return self.app.post(url, data=json.dumps(payload), content_type='application/json',
+                             headers={'Prefer': 'respond-async'})
+
+    def wait_for(self, location):
+        for _ in range(100):
+            job = json.loads(self.app.get(location).data)['data']
+            if job['status'] != 'queued':
+                return job
+            time.sleep(0.05)
+        self.fail(f'{location} still queued')
+
+    def test_order_accepted_and_applied(self):
+        """Test that an async order returns 202 and its job reports the created order"""
+        response = self.post_async('/orders', {'ordercustomerid': 2002, 'orderdate': '2024-03-01T10:00:00'})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.headers['Preference-Applied'], 'respond-async')
+        self.assertTrue(response.headers['Location'].endswith(
+            f"/jobs/{json.loads(response.data)['data']['jobid']}"))
+
+        job = self.wait_for(response.headers['Location'])
+        self.assertEqual(job['status'], 'done')
+        self.assertEqual(job['result']['ordercustomerid'], 2002)
+        order = json.loads(self.app.get(f"/orders/{job['result']['orderid']}").data)
+        self.assertEqual(order['orderdate'], '2024-03-01T10:00:00')
+
+    def test_invalid_request_rejected_up_front(self):
+        """Test that async requests are still validated before being accepted"""
+        response = self.post_async(f'/orders/{self.order_id}/details', {'orderitemid': 101})
+        self.assertEqual(response.status_code, 400)
+        response = self.post_async('/orders/9999/details', {'orderitemid': 101, 'quantity': 1, 'unitrate': 1.0})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.app.get('/jobs/9999').status_code, 404)
+
+    def test_batch_isolates_failed_jobs(self):
+        """Test that queued jobs are applied in one batch and a failing job doesn't fail the rest"""
+        with self.test_app.app_context():
+            db.session.add_all([
+                IntakeJob(kind='detail', payload={'orderid': self.order_id, 'orderitemid': 101,
+                                                  'quantity': 2.0, 'unitrate': 5.0}),
+                IntakeJob(kind='detail', payload={'orderid': 9999, 'orderitemid': 102,
+                                                  'quantity': 1.0, 'unitrate': 1.0}),
+                IntakeJob(kind='order', payload={'ordercustomerid': 3003,
+                                                 'orderdate': '2024-03-02T00:00:00'}),
+            ])
+            db.session.commit()
+
+        worker = IntakeWorker(self.test_app)
+        self.assertEqual(worker.drain(), 3)
+        self.assertEqual(worker.drain(), 0)
+
+        with self.test_app.app_context():
+            self.assertEqual([job.status for job in db.session.scalars(db.select(IntakeJob))],
+                             ['done', 'failed', 'done'])
+            self.assertEqual(db.session.scalars(db.select(IntakeJob).where(
+                IntakeJob.status == 'failed')).one().error, 'Order not found')
+            self.assertEqual(db.session.query(OrderDetail).one().rowtotal, 10.0)
+            self.assertEqual(db.session.get(OrderHeader, self.order_id).version, 2)
+            self.assertEqual(worker.stats()['applied'], 2)
+
+    def test_sync_create_unchanged_without_prefer(self):
+        """Test that requests without the Prefer header are still written immediately"""
+        response = self.app.post('/orders', data=json.dumps({'ordercustomerid': 4004}),
+                                 content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+import json
+from datetime import datetime
+from flask import Flask, jsonify
+from sqlalchemy import select
+from models import db, OrderHeader, OrderDetail
+from testing import make_test_app, close_test_app
+from json_provider import OrderJSONProvider, rows_response, ROWS
+
+class JSONProviderTestCase(unittest.TestCase):
+    """Test case for the JSON provider and the row fast path"""
+
+    def setUp(self):
+        """Set up a test app with a couple of orders"""
+        test_app = make_test_app(prefix=None)
+        test_app.json = OrderJSONProvider(test_app)
+        self.test_app = test_app
+
+        self.app_context = test_app.app_context()
+        self.app_context.push()
+
+        order = OrderHeader(ordercustomerid=1001, orderdate=datetime(2024, 1, 2, 3, 4, 5))
+        db.session.add(order)
+        db.session.commit()
+        db.session.add(OrderDetail(orderid=order.orderid, orderitemid=101,
+                                   quantity=3, unitrate=0.1, rowtotal=0.30000000000000004))
+        db.session.commit()
+        self.order_id = order.orderid
+
+    def tearDown(self):
+        """Clean up after each test"""
+        self.app_context.pop()
+        close_test_app(self.test_app)
+
+    def test_rows_match_to_dict(self):
+        """Test that encoded rows are identical to jsonify(to_dict())"""
+        columns = (OrderDetail.orderdetailid, OrderDetail.orderid, OrderDetail.orderitemid,
+                   OrderDetail.quantity, OrderDetail.unitrate, OrderDetail.rowtotal)
+        rows = db.session.execute(select(*columns)).all()
+        details = db.session.execute(select(OrderDetail)).scalars().all()
+
+        fast = rows_response(columns, rows).get_data()
+        slow = jsonify([detail.to_dict() for detail in details]).get_data()
+        self.assertEqual(fast, slow)
+
+    def test_envelope_and_dates(self):
+        """Test that rows are spliced into the envelope and dates use isoformat"""
+        columns = (OrderHeader.orderid, OrderHeader.orderdate, OrderHeader.ordercustomerid)
+        rows = db.session.execute(select(*columns)).all()
+
+        response = rows_response(columns, rows, {'status': 'success', 'data': {'items': ROWS}})
+        data = json.loads(response.get_data())
+        self.assertEqual(data['status'], 'success')
+        self.assertEqual(data['data']['items'], [{
+            'orderid': self.order_id,
+            'orderdate': '2024-01-02T03:04:05',
+            'ordercustomerid': 1001
+        }])
+
+    def test_non_finite_numbers_are_null(self):
+        """Test that inf and nan are written as null so the body stays valid JSON"""
+        columns = (OrderDetail.orderdetailid, OrderDetail.unitrate, OrderDetail.rowtotal)
+        body = rows_response(columns, [(1, float('inf'), float('nan'))]).get_data()
+        self.assertEqual(json.loads(body, parse_constant=self.fail),
+                         [{'orderdetailid': 1, 'unitrate': None, 'rowtotal': None}])
+
+    def test_provider_round_trip(self):
+        """Test that the provider keeps Flask's date handling"""
+        provider = OrderJSONProvider(Flask(__name__))
+        encoded = provider.dumps({'b': 1, 'a': datetime(2024, 1, 2)})
+        self.assertTrue(encoded.startswith('{"a":'))
+        self.assertEqual(provider.loads(encoded)['a'], 'Tue, 02 Jan 2024 00:00:00 GMT')
+
+if __name__ == '__main__':
+    unittest.main()
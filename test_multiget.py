@@ -0,0 +1,80 @@
+import unittest
+import json
+from sqlalchemy import event, insert
+from models import db, OrderHeader, OrderDetail
+from testing import make_test_app, close_test_app
+
+class MultiGetTestCase(unittest.TestCase):
+    """Test case for fetching many orders and details by id"""
+
+    def setUp(self):
+        """Set up a test app with 1200 orders, each with two lines except the last"""
+        test_app = make_test_app()
+        self.test_app = test_app
+
+        self.app = test_app.test_client()
+        self.app_context = test_app.app_context()
+        self.app_context.push()
+
+        db.session.execute(insert(OrderHeader), [
+            {'orderid': orderid, 'ordercustomerid': 1000 + orderid % 7} for orderid in range(1, 1201)])
+        db.session.execute(insert(OrderDetail), [
+            {'orderid': orderid, 'orderitemid': item, 'quantity': 1, 'unitrate': 1.0, 'rowtotal': 1.0}
+            for orderid in range(1, 1200) for item in (1, 2)])
+        db.session.commit()
+        db.session.remove()
+
+        self.statements = []
+        event.listen(db.engine, 'before_cursor_execute', self._record)
+
+    def tearDown(self):
+        """Clean up after each test"""
+        event.remove(db.engine, 'before_cursor_execute', self._record)
+        self.app_context.pop()
+        close_test_app(self.test_app)
+
+    def _record(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def test_orders_by_ids_keep_requested_order(self):
+        """Test that ids come back in the order asked for, with missing ids listed"""
+        data = json.loads(self.app.get('/orders?ids=30,5,9999,5,12').data)['data']
+        self.assertEqual([order['orderid'] for order in data['items']], [30, 5, 12])
+        self.assertEqual(data['missing'], [9999])
+        self.assertNotIn('total', data)
+
+    def test_lookup_queries_in_chunks(self):
+        """Test that a long id list is fetched with one IN query per chunk"""
+        ids = list(range(1200, 0, -1)) + [5000]
+        self.statements.clear()
+        response = self.app.post('/orders/lookup', json={'ids': ids})
+        data = json.loads(response.data)['data']
+        self.assertEqual([order['orderid'] for order in data['items']], ids[:-1])
+        self.assertEqual(data['missing'], [5000])
+        self.assertEqual(len([s for s in self.statements if 'FROM order_headers' in s]), 3)
+
+    def test_details_by_order_ids(self):
+        """Test that details are grouped by order in request order and missing orders are reported"""
+        data = json.loads(self.app.get('/orderdetails?orderids=7,1200,3,8888').data)['data']
+        self.assertEqual([(d['orderid'], d['orderitemid']) for d in data['items']], [(7, 1), (7, 2), (3, 1), (3, 2)])
+        # Order 1200 exists without lines, so it isn't missing
+        self.assertEqual(data['missing'], [8888])
+
+        # The cached page follows detail writes
+        self.app.patch('/orderdetails/bulk', json=[{'id': 13, 'changes': {'quantity': 4}}])
+        data = json.loads(self.app.get('/orderdetails?orderids=7,1200,3,8888').data)['data']
+        self.assertEqual(data['items'][0]['quantity'], 4.0)
+
+        response = self.app.post('/orderdetails/lookup', json={'orderids': list(range(1, 1201))})
+        self.assertEqual(len(json.loads(response.data)['data']['items']), 2398)
+
+    def test_invalid_id_lists(self):
+        """Test that malformed or oversized id lists are rejected"""
+        self.assertEqual(self.app.get('/orders?ids=1,x').status_code, 400)
+        self.assertEqual(self.app.get('/orders?ids=' + ','.join(map(str, range(1001)))).status_code, 400)
+        self.assertEqual(self.app.get('/orderdetails').status_code, 400)
+        self.assertEqual(self.app.post('/orders/lookup', json={'ids': 'nope'}).status_code, 400)
+        self.assertEqual(self.app.post('/orderdetails/lookup', json=[1, 2]).status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+import unittest
+import json
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from sqlalchemy import update, select, func
+from models import db, OrderHeader, OutboxEvent, utcnow
+from testing import make_test_app, close_test_app
+
+class OutboxTestCase(unittest.TestCase):
+    """Test case for the transactional outbox and the change feed"""
+
+    def setUp(self):
+        """Set up a test app on a file database so writes can come from another thread"""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        test_app = make_test_app(f'sqlite:///{self.tmpdir.name}/orders.db')
+        self.test_app = test_app
+        self.app = test_app.test_client()
+
+    def tearDown(self):
+        """Clean up after each test"""
+        close_test_app(self.test_app)
+        self.tmpdir.cleanup()
+
+    def post(self, url, payload):
+        return json.loads(self.app.post(url, data=json.dumps(payload), content_type='application/json').data)
+
+    def changes(self, **args):
+        return json.loads(self.app.get('/changes', query_string=args).data)['data']
+
+    def test_writes_append_events_in_order(self):
+        """Test that creates, updates and deletes each append one event in commit order"""
+        order = self.post('/orders', {'ordercustomerid': 1001})['data']
+        detail = self.post(f"/orders/{order['orderid']}/details",
+                           {'orderitemid': 101, 'quantity': 2, 'unitrate': 5.0})['data']
+        self.app.put(f"/orderdetails/{detail['orderdetailid']}", data=json.dumps({'quantity': 3}),
+                     content_type='application/json')
+        self.app.delete(f"/orders/{order['orderid']}")
+
+        feed = self.changes()
+        self.assertEqual([(e['entity'], e['op']) for e in feed['events']], [
+            ('order', 'created'), ('detail', 'created'), ('detail', 'updated'),
+            ('detail', 'deleted'), ('order', 'deleted')])
+        self.assertEqual(feed['events'][2]['data']['rowtotal'], 15.0)
+        self.assertIsNone(feed['events'][4]['data'])
+        self.assertEqual({e['orderid'] for e in feed['events']}, {order['orderid']})
+        self.assertEqual(feed['next'], feed['events'][-1]['seq'])
+
+        # Nothing new after the cursor
+        self.assertEqual(self.changes(since=feed['next'])['events'], [])
+
+    def test_cursor_and_limit(self):
+        """Test paging through the feed with since and limit"""
+        for customer_id in (1, 2, 3):
+            self.post('/orders', {'ordercustomerid': customer_id})
+        first = self.changes(limit=2)
+        self.assertEqual(len(first['events']), 2)
+        self.assertTrue(first['has_more'])
+        second = self.changes(since=first['next'], limit=2)
+        self.assertEqual([e['data']['ordercustomerid'] for e in second['events']], [3])
+        self.assertFalse(second['has_more'])
+        self.assertEqual(self.app.get('/changes?since=-1').status_code, 400)
+
+    def test_rolled_back_write_has_no_event(self):
+        """Test that events only exist for committed changes"""
+        with self.test_app.app_context():
+            db.session.add(OrderHeader(ordercustomerid=1001))
+            db.session.flush()
+            db.session.rollback()
+            self.assertEqual(db.session.query(OutboxEvent).count(), 0)
+
+    def test_long_poll_wakes_on_commit(self):
+        """Test that a waiting reader returns as soon as a change commits"""
+        def write_later():
+            time.sleep(0.2)
+            self.test_app.test_client().post('/orders', data=json.dumps({'ordercustomerid': 1001}),
+                                             content_type='application/json')
+
+        writer = threading.Thread(target=write_later)
+        writer.start()
+        started = time.monotonic()
+        feed = self.changes(wait=5)
+        writer.join()
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual([e['op'] for e in feed['events']], ['created'])
+
+        started = time.monotonic()
+        self.assertEqual(self.changes(since=feed['next'], wait=0.2)['events'], [])
+        self.assertGreaterEqual(time.monotonic() - started, 0.2)
+
+    def test_long_polls_capped(self):
+        """Test that readers past CHANGES_MAX_WAITERS get 429 instead of holding another thread"""
+        self.test_app.config['CHANGES_MAX_WAITERS'] = 1
+        waiter = threading.Thread(target=lambda: self.test_app.test_client().get('/changes?wait=0.5'))
+        waiter.start()
+        time.sleep(0.1)
+        response = self.app.get('/changes?wait=0.5')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers['Retry-After'], '1')
+        # Readers with nothing to wait for still get an answer
+        self.assertEqual(self.app.get('/changes').status_code, 200)
+        self.post('/orders', {'ordercustomerid': 1001})
+        self.assertEqual(len(self.changes(wait=0.5)['events']), 1)
+        waiter.join()
+        metrics = json.loads(self.app.get('/metrics').data)['data']['changes']
+        self.assertEqual(metrics, {'waiting': 0, 'turned_away': 1})
+
+    def test_requests_keep_pruning_going(self):
+        """Test that old events are pruned once PRUNE_INTERVAL passes, without async intake"""
+        self.test_app.config['PRUNE_INTERVAL'] = 0.1
+        self.post('/orders', {'ordercustomerid': 1001})
+        with self.test_app.app_context():
+            db.session.execute(update(OutboxEvent).values(created_at=utcnow() - timedelta(days=8)))
+            db.session.commit()
+        self.post('/orders', {'ordercustomerid': 1002})
+        time.sleep(0.2)
+        self.changes()
+
+        with self.test_app.app_context():
+            for _ in range(50):
+                remaining = db.session.execute(select(func.count()).select_from(OutboxEvent)).scalar()
+                if remaining == 1:
+                    break
+                db.session.rollback()
+                time.sleep(0.05)
+            self.assertEqual(remaining, 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+import unittest
+import json
+from sqlalchemy import event, select
+from models import db, OrderHeader, OrderDetail, OutboxEvent
+from testing import make_test_app, close_test_app
+
+class PatchTestCase(unittest.TestCase):
+    """Test case for single-statement PATCH updates"""
+
+    def setUp(self):
+        """Set up a test app with one order and one detail"""
+        test_app = make_test_app()
+        self.test_app = test_app
+
+        self.app = test_app.test_client()
+        self.app_context = test_app.app_context()
+        self.app_context.push()
+
+        order = OrderHeader(ordercustomerid=1001)
+        db.session.add(order)
+        db.session.commit()
+        detail = OrderDetail(orderid=order.orderid, orderitemid=5, quantity=2, unitrate=10.0, rowtotal=20.0)
+        db.session.add(detail)
+        db.session.commit()
+        self.order_id, self.detail_id = order.orderid, detail.orderdetailid
+        db.session.remove()
+
+        self.statements = []
+        event.listen(db.engine, 'before_cursor_execute', self._record)
+
+    def tearDown(self):
+        """Clean up after each test"""
+        event.remove(db.engine, 'before_cursor_execute', self._record)
+        self.app_context.pop()
+        close_test_app(self.test_app)
+
+    def _record(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def test_patch_detail_recomputes_rowtotal_in_sql(self):
+        """Test that a detail is updated without a SELECT and its rowtotal follows"""
+        self.app.get(f'/orderdetails/{self.detail_id}')
+        self.statements.clear()
+
+        response = self.app.patch(f'/orderdetails/{self.detail_id}', json={'quantity': 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['rowtotal'], 30.0)
+        self.assertFalse([s for s in self.statements if s.startswith('SELECT')])
+
+        # The cached page and cached row are both refreshed
+        self.assertEqual(json.loads(self.app.get(f'/orderdetails/{self.detail_id}').data)['rowtotal'], 30.0)
+        response = self.app.patch(f'/orderdetails/{self.detail_id}', json={'unitrate': 1.5})
+        self.assertEqual(json.loads(response.data)['rowtotal'], 4.5)
+
+    def test_patch_detail_bumps_version_and_records_event(self):
+        """Test that the order's version moves and an outbox event is written"""
+        version = db.session.get(OrderHeader, self.order_id).version
+        db.session.remove()
+        self.app.patch(f'/orderdetails/{self.detail_id}', json={'orderitemid': 7})
+        self.assertEqual(db.session.get(OrderHeader, self.order_id).version, version + 1)
+        event = db.session.scalars(select(OutboxEvent).order_by(OutboxEvent.seq.desc())).first()
+        self.assertEqual((event.entity, event.op, event.customerid), ('detail', 'updated', 1001))
+        self.assertEqual(event.data['orderitemid'], 7)
+
+    def test_patch_missing_or_invalid(self):
+        """Test 404 for missing rows and 400 for invalid values"""
+        self.assertEqual(self.app.patch('/orderdetails/999', json={'quantity': 1}).status_code, 404)
+        self.assertEqual(self.app.patch('/orders/999', json={'ordercustomerid': 1}).status_code, 404)
+        response = self.app.patch(f'/orderdetails/{self.detail_id}', json={'quantity': 0})
+        self.assertEqual(response.status_code, 400)
+        response = self.app.patch(f'/orders/{self.order_id}', json={'orderdate': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_non_finite_numbers_rejected(self):
+        """Test that inf and nan quantities and rates are refused before anything is stored"""
+        for body in ({'quantity': 'inf'}, {'unitrate': 'nan'}, {'quantity': '-Infinity'}):
+            response = self.app.patch(f'/orderdetails/{self.detail_id}', json=body)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('finite', response.get_json()['error'])
+        response = self.app.post(f'/orders/{self.order_id}/details',
+                                 json={'orderitemid': 6, 'quantity': 'inf', 'unitrate': 1.0})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()['message'], 'Quantity must be a finite number')
+        detail = db.session.get(OrderDetail, self.detail_id)
+        self.assertEqual((detail.quantity, detail.unitrate), (2, 10.0))
+
+    def test_patch_order_moves_between_customer_pages(self):
+        """Test that reassigning an order evicts the old customer's cached page"""
+        self.assertEqual(json.loads(self.app.get('/orders?customer_id=1001').data)['data']['total'], 1)
+        response = self.app.patch(f'/orders/{self.order_id}', json={'ordercustomerid': 2002})
+        self.assertEqual(json.loads(response.data)['data']['ordercustomerid'], 2002)
+        self.assertEqual(json.loads(self.app.get('/orders?customer_id=1001').data)['data']['total'], 0)
+        self.assertEqual(json.loads(self.app.get('/orders?customer_id=2002').data)['data']['total'], 1)
+
+    def test_bulk_patch_details_reports_each_item(self):
+        """Test that bulk detail changes run as one UPDATE and report per item"""
+        other = OrderDetail(orderid=self.order_id, orderitemid=6, quantity=1, unitrate=4.0, rowtotal=4.0)
+        db.session.add(other)
+        db.session.commit()
+        other_id = other.orderdetailid
+        version = db.session.get(OrderHeader, self.order_id).version
+        db.session.remove()
+        self.statements.clear()
+
+        response = self.app.patch('/orderdetails/bulk', json=[
+            {'id': self.detail_id, 'changes': {'quantity': 5}},
+            {'id': other_id, 'changes': {'unitrate': 2.5, 'orderitemid': 9}},
+            {'id': 999, 'changes': {'quantity': 1}},
+            {'id': 998, 'changes': {'quantity': -1}},
+            {'id': self.detail_id, 'changes': {'quantity': 7}},
+        ])
+        data = json.loads(response.data)['data']
+        self.assertEqual(data['updated'], 2)
+        self.assertEqual([r['status'] for r in data['results']],
+                         ['updated', 'updated', 'not_found', 'invalid', 'invalid'])
+        self.assertEqual(data['results'][4]['error'], 'duplicate id')
+        self.assertEqual(data['results'][0]['data']['rowtotal'], 50.0)
+        self.assertEqual(data['results'][1]['data']['rowtotal'], 2.5)
+        self.assertEqual(len([s for s in self.statements if s.startswith('UPDATE order_details')]), 1)
+
+        self.assertEqual(db.session.get(OrderHeader, self.order_id).version, version + 1)
+        events = db.session.scalars(select(OutboxEvent).where(OutboxEvent.op == 'updated')).all()
+        self.assertEqual(len(events), 2)
+
+    def test_bulk_patch_orders(self):
+        """Test bulk header changes and invalid bodies"""
+        self.assertEqual(self.app.patch('/orders/bulk', json={'items': []}).status_code, 400)
+        self.assertEqual(self.app.patch('/orders/bulk', json=[{'id': 1}] * 1001).status_code, 400)
+        self.assertEqual(json.loads(self.app.get('/orders?customer_id=1001').data)['data']['total'], 1)
+
+        response = self.app.patch('/orders/bulk', json={'items': [
+            {'id': self.order_id, 'changes': {'ordercustomerid': 3003}},
+            {'id': 'x', 'changes': {}},
+        ]})
+        data = json.loads(response.data)['data']
+        self.assertEqual([r['status'] for r in data['results']], ['updated', 'invalid'])
+        self.assertEqual(data['results'][0]['data']['ordercustomerid'], 3003)
+        self.assertEqual(json.loads(self.app.get('/orders?customer_id=1001').data)['data']['total'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
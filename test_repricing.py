@@ -0,0 +1,112 @@
+import unittest
+import json
+import tempfile
+import time
+from datetime import datetime
+from sqlalchemy import insert, select
+from models import db, OrderHeader, OrderDetail, OutboxEvent, IntakeJob
+from testing import make_test_app, close_test_app
+from repricing import get_repricer
+
+class RepricingTestCase(unittest.TestCase):
+    """Test case for chunked mass repricing of an item"""
+
+    def setUp(self):
+        """Set up a test app on a file database the repricing worker can share"""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        test_app = make_test_app(f'sqlite:///{self.tmpdir.name}/orders.db', REPRICE_CHUNK_SIZE=7, REPRICE_PAUSE=0)
+        self.test_app = test_app
+        self.app = test_app.test_client()
+
+        with test_app.app_context():
+            # 20 orders in each of three groups, with a line of item 42 and one of item 7
+            orders = [OrderHeader(ordercustomerid=customer_id, orderdate=datetime.fromisoformat(date))
+                      for customer_id, date in ((1001, '2024-01-10'), (1001, '2024-03-10'), (2002, '2024-03-10'))
+                      for _ in range(20)]
+            db.session.add_all(orders)
+            db.session.commit()
+            self.order_ids = [order.orderid for order in orders][::20]
+            db.session.execute(insert(OrderDetail), [
+                {'orderid': order.orderid, 'orderitemid': item, 'quantity': 2, 'unitrate': 1.0, 'rowtotal': 2.0}
+                for order in orders for item in (42, 7)])
+            db.session.commit()
+
+    def tearDown(self):
+        """Clean up after each test"""
+        close_test_app(self.test_app)
+        self.tmpdir.cleanup()
+
+    def wait_for(self, location):
+        for _ in range(100):
+            job = json.loads(self.app.get(location).data)['data']
+            if job['status'] in ('done', 'failed'):
+                return job
+            time.sleep(0.05)
+        self.fail(f'{location} did not finish')
+
+    def rates(self, orderid, item=42):
+        return {detail['unitrate'] for detail in json.loads(self.app.get(f'/orders/{orderid}/details').data)
+                if detail['orderitemid'] == item}
+
+    def test_reprice_in_chunks_with_progress(self):
+        """Test that every line of the item is repriced in chunks and progress is reported"""
+        self.assertEqual(self.rates(self.order_ids[0]), {1.0})
+        response = self.app.post('/items/42/reprice', json={'unitrate': 2.5})
+        self.assertEqual(response.status_code, 202)
+
+        job = self.wait_for(response.headers['Location'])
+        self.assertEqual(job['status'], 'done')
+        self.assertEqual(job['result']['matched'], 60)
+        self.assertEqual(job['result']['updated'], 60)
+        self.assertEqual(job['result']['chunks'], 9)
+
+        # Cached detail pages are invalidated, other items are untouched
+        self.assertEqual(self.rates(self.order_ids[0]), {2.5})
+        self.assertEqual(self.rates(self.order_ids[0], item=7), {1.0})
+        with self.test_app.app_context():
+            totals = db.session.scalars(select(OrderDetail.rowtotal).where(OrderDetail.orderitemid == 42)).all()
+            self.assertEqual(set(totals), {5.0})
+            self.assertEqual(db.session.get(OrderHeader, self.order_ids[0]).version, 2)
+            self.assertEqual(len(db.session.scalars(select(OutboxEvent).where(OutboxEvent.op == 'updated')).all()), 60)
+
+    def test_reprice_with_filters(self):
+        """Test that customer and date filters limit the lines repriced"""
+        response = self.app.post('/items/42/reprice', json={
+            'unitrate': 3, 'customer_id': 1001, 'since': '2024-02-01'})
+        job = self.wait_for(response.headers['Location'])
+        self.assertEqual(job['result']['updated'], 20)
+        self.assertEqual(self.rates(self.order_ids[0]), {1.0})
+        self.assertEqual(self.rates(self.order_ids[1]), {3.0})
+        self.assertEqual(self.rates(self.order_ids[2]), {1.0})
+
+    def test_stalled_job_resumed_from_cursor(self):
+        """Test that a job left running by a dead worker is taken over once its lease runs out"""
+        with self.test_app.app_context():
+            lines = db.session.scalars(select(OrderDetail).where(OrderDetail.orderitemid == 42)
+                                       .order_by(OrderDetail.orderdetailid)).all()
+            for line in lines[:30]:
+                line.unitrate, line.rowtotal = 4.0, 8.0
+            job = IntakeJob(kind='reprice', payload={'orderitemid': 42, 'unitrate': 4.0}, status='running',
+                            result={'matched': 60, 'updated': 30, 'chunks': 5, 'cursor': lines[29].orderdetailid})
+            db.session.add(job)
+            db.session.commit()
+            jobid = job.jobid
+        repricer = get_repricer(self.test_app)
+
+        # Still within its lease: left alone
+        self.assertFalse(repricer.drain())
+        repricer.lease = 0
+        job = self.wait_for(f'/jobs/{jobid}')
+        self.assertEqual(job['status'], 'done')
+        self.assertEqual((job['result']['matched'], job['result']['updated']), (60, 60))
+        self.assertEqual(repricer.stats()['resumed'], 1)
+        self.assertEqual(self.rates(self.order_ids[2]), {4.0})
+
+    def test_reprice_validation(self):
+        """Test that invalid repricing requests are rejected"""
+        self.assertEqual(self.app.post('/items/42/reprice', json={}).status_code, 400)
+        self.assertEqual(self.app.post('/items/42/reprice', json={'unitrate': -1}).status_code, 400)
+        self.assertEqual(self.app.post('/items/42/reprice', json={'unitrate': 1, 'before': 'soon'}).status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
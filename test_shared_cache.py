@@ -0,0 +1,131 @@
+import unittest
+import json
+import multiprocessing
+import os
+import pickle
+import sqlite3
+import tempfile
+from models import db, OrderHeader, OrderDetail
+from testing import make_test_app, close_test_app
+from cache import SQLiteBackend
+
+def _set_in_child(path):
+    SQLiteBackend(path).set('/orders/1', b'from child', ['order:1'])
+
+TRIPPED = []
+
+def _tripwire():
+    TRIPPED.append(True)
+
+class _Payload:
+    def __reduce__(self):
+        return _tripwire, ()
+
+class SharedCacheTestCase(unittest.TestCase):
+    """Test case for the SQLite-backed cache shared between workers"""
+
+    def setUp(self):
+        """Set up two apps standing in for two workers on one host"""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.tmpdir.name, 'cache.db')
+        self.workers = []
+        for _ in range(2):
+            self.workers.append(make_test_app(
+                f'sqlite:///{self.tmpdir.name}/orders.db', RESPONSE_CACHE_BACKEND='sqlite',
+                RESPONSE_CACHE_PATH=self.cache_path,
+                IDEMPOTENCY_PATH=os.path.join(self.tmpdir.name, 'idempotency.db')))
+
+        with self.workers[0].app_context():
+            order = OrderHeader(ordercustomerid=1001)
+            db.session.add(order)
+            db.session.commit()
+            detail = OrderDetail(orderid=order.orderid, orderitemid=101,
+                                 quantity=5, unitrate=10.0, rowtotal=50.0)
+            db.session.add(detail)
+            db.session.commit()
+            self.order_id = order.orderid
+            self.detail_id = detail.orderdetailid
+
+    def tearDown(self):
+        """Clean up after each test"""
+        for test_app in self.workers:
+            close_test_app(test_app)
+        self.tmpdir.cleanup()
+
+    def test_backend_shared_between_instances(self):
+        """Test that entries, invalidations and LRU eviction are seen by every instance"""
+        first = SQLiteBackend(self.cache_path, max_entries=2)
+        second = SQLiteBackend(self.cache_path, max_entries=2)
+
+        first.set('a', b'1', ['order:1'])
+        self.assertEqual(second.get('a'), b'1')
+        second.invalidate(['order:1'])
+        self.assertIsNone(first.get('a'))
+
+        first.set('b', b'2')
+        first.set('c', b'3')
+        second.set('d', b'4')
+        self.assertIsNone(first.get('b'))
+        self.assertEqual(first.get('d'), b'4')
+
+        first.bump('entity_cache')
+        self.assertEqual(second.counter('entity_cache'), 1)
+
+    def test_backend_drops_renders_overlapping_invalidations(self):
+        """Test that a write seen by another worker keeps an earlier render out of the cache"""
+        first = SQLiteBackend(self.cache_path)
+        second = SQLiteBackend(self.cache_path)
+        generation = first.generation()
+        second.invalidate(['order:1'])
+        self.assertFalse(first.set('/orders/1', b'old', ['order:1'], generation=generation))
+        self.assertIsNone(second.get('/orders/1'))
+        self.assertTrue(first.set('/orders/2', b'two', ['order:2'], generation=generation))
+        self.assertTrue(first.set('/orders/1', b'new', ['order:1'], generation=first.generation()))
+
+    def test_backend_never_unpickles(self):
+        """Test that entries round-trip as data and a pickle planted in the file is only a miss"""
+        backend = SQLiteBackend(self.cache_path)
+        backend.set('entry', ('done', b'\x00body', 201, [('ETag', '"1"')]))
+        self.assertEqual(backend.get('entry'), ['done', b'\x00body', 201, [['ETag', '"1"']]])
+
+        with sqlite3.connect(self.cache_path) as connection:
+            connection.execute("UPDATE entries SET value = ? WHERE key = 'entry'", (pickle.dumps(_Payload()),))
+        self.assertIsNone(backend.get('entry'))
+        self.assertEqual(TRIPPED, [])
+        self.assertEqual(backend.stats()['errors'], 1)
+
+    def test_backend_shared_between_processes(self):
+        """Test that an entry written by another process is visible"""
+        backend = SQLiteBackend(self.cache_path)
+        process = multiprocessing.get_context('spawn').Process(target=_set_in_child, args=(self.cache_path,))
+        process.start()
+        process.join(30)
+        self.assertEqual(backend.get('/orders/1'), b'from child')
+
+    def test_workers_share_responses(self):
+        """Test that one worker's cached response is served by the other, and writes reach both"""
+        first, second = (test_app.test_client() for test_app in self.workers)
+        first.get(f'/orders/{self.order_id}/details')
+        second.get(f'/orders/{self.order_id}/details')
+        stats = json.loads(second.get('/metrics').data)['data']['response_cache']
+        self.assertEqual(stats['hits'], 1)
+
+        second.put(f'/orderdetails/{self.detail_id}',
+                   data=json.dumps({'quantity': 1}), content_type='application/json')
+        data = json.loads(first.get(f'/orders/{self.order_id}/details').data)
+        self.assertEqual(data[0]['rowtotal'], 10.0)
+
+    def test_entity_cache_follows_other_workers(self):
+        """Test that a worker drops entity cache rows another worker changed"""
+        for test_app in self.workers:
+            test_app.config['RESPONSE_CACHE_ENABLED'] = False
+        first, second = (test_app.test_client() for test_app in self.workers)
+
+        first.get(f'/orderdetails/{self.detail_id}')
+        second.put(f'/orderdetails/{self.detail_id}',
+                   data=json.dumps({'quantity': 2}), content_type='application/json')
+        data = json.loads(first.get(f'/orderdetails/{self.detail_id}').data)
+        self.assertEqual(data['quantity'], 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+import threading
+import time
+from flask import Flask, jsonify
+from cache import response_cache
+from singleflight import SingleFlight, get_singleflight
+
+class SingleFlightTestCase(unittest.TestCase):
+    """Test case for coalescing identical concurrent reads"""
+
+    def run_concurrently(self, target, count=8):
+        threads = [threading.Thread(target=target) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+
+    def test_concurrent_calls_share_one_result(self):
+        """Test that concurrent callers with one key run the computation once"""
+        group = SingleFlight()
+        calls = []
+        results = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'result'
+
+        self.run_concurrently(lambda: results.append(group.do('key', compute)))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['result'] * 8)
+        self.assertEqual(group.stats()['coalesced'], 7)
+        self.assertEqual(group.stats()['in_flight'], 0)
+
+    def test_timeout_and_failure_fall_back(self):
+        """Test that waiters compute for themselves when the leader is slow or fails"""
+        group = SingleFlight()
+        started = threading.Event()
+
+        def slow():
+            started.set()
+            time.sleep(0.3)
+            return 'slow'
+
+        leader = threading.Thread(target=lambda: group.do('key', slow))
+        leader.start()
+        started.wait(1)
+        self.assertEqual(group.do('key', lambda: 'own', timeout=0.01), 'own')
+        leader.join()
+        self.assertEqual(group.stats()['timeouts'], 1)
+
+        def failing():
+            raise ValueError('boom')
+
+        with self.assertRaises(ValueError):
+            group.do('key', failing)
+        self.assertEqual(group.do('key', lambda: 'fine'), 'fine')
+
+    def test_cached_view_coalesces_misses(self):
+        """Test that concurrent misses on a cached view call the view once"""
+        test_app = Flask(__name__)
+        test_app.config['TESTING'] = True
+        calls = []
+
+        @test_app.route('/report')
+        @response_cache.cached()
+        def report():
+            calls.append(1)
+            time.sleep(0.2)
+            return jsonify({'status': 'success'})
+
+        statuses = []
+        self.run_concurrently(
+            lambda: statuses.append(test_app.test_client().get('/report').status_code))
+        self.assertEqual(statuses, [200] * 8)
+        self.assertEqual(len(calls), 1)
+        with test_app.app_context():
+            self.assertEqual(get_singleflight().stats()['coalesced'], 7)
+
+    def test_cached_view_error_not_shared(self):
+        """Test that waiters render for themselves when the leader's response is an error"""
+        test_app = Flask(__name__)
+        test_app.config['TESTING'] = True
+        calls = []
+
+        @test_app.route('/report')
+        @response_cache.cached()
+        def report():
+            calls.append(1)
+            time.sleep(0.2)
+            if len(calls) == 1:
+                return jsonify({'status': 'error'}), 500
+            return jsonify({'status': 'success'})
+
+        statuses = []
+        self.run_concurrently(
+            lambda: statuses.append(test_app.test_client().get('/report').status_code))
+        self.assertEqual(sorted(statuses), [200] * 7 + [500])
+        self.assertGreater(len(calls), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+import json
+import tempfile
+from models import db, OrderHeader
+from testing import make_test_app, close_test_app
+from sse import get_broadcaster
+
+class SSETestCase(unittest.TestCase):
+    """Test case for the Server-Sent Events stream of order changes"""
+
+    def setUp(self):
+        """Set up a test app on a file database shared with the broadcaster thread"""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        test_app = make_test_app(f'sqlite:///{self.tmpdir.name}/orders.db', SSE_HEARTBEAT=0.1)
+        self.test_app = test_app
+        self.app = test_app.test_client()
+        self.streams = []
+
+        with test_app.app_context():
+            orders = [OrderHeader(ordercustomerid=1001), OrderHeader(ordercustomerid=2002)]
+            db.session.add_all(orders)
+            db.session.commit()
+            self.order_ids = [order.orderid for order in orders]
+
+    def tearDown(self):
+        """Clean up after each test"""
+        for response in self.streams:
+            response.close()
+        close_test_app(self.test_app)
+        self.tmpdir.cleanup()
+
+    def open_stream(self, url='/events', **kwargs):
+        response = self.test_app.test_client().get(url, buffered=False, **kwargs)
+        self.streams.append(response)
+        return response, iter(response.response)
+
+    def next_event(self, chunks):
+        """The next event as (id, name, data), skipping keep-alive comments"""
+        for _ in range(50):
+            message = next(chunks)
+            message = message.decode() if isinstance(message, bytes) else message
+            if not message.startswith(':'):
+                fields = dict(line.split(': ', 1) for line in message.strip().split('\n'))
+                return fields.get('id'), fields['event'], json.loads(fields['data'])
+        self.fail('no event received')
+
+    def update(self, orderid, customer_id):
+        self.app.put(f'/orders/{orderid}', data=json.dumps({'ordercustomerid': customer_id}),
+                     content_type='application/json')
+
+    def test_stream_pushes_filtered_changes(self):
+        """Test that subscribers receive matching create, update and delete events"""
+        response, chunks = self.open_stream(f'/events?order_id={self.order_ids[0]}')
+        self.assertEqual(response.mimetype, 'text/event-stream')
+
+        self.update(self.order_ids[1], 2003)  # another order: filtered out
+        self.update(self.order_ids[0], 1002)
+        self.app.post(f'/orders/{self.order_ids[0]}/details', content_type='application/json',
+                      data=json.dumps({'orderitemid': 101, 'quantity': 1, 'unitrate': 2.0}))
+
+        _, name, data = self.next_event(chunks)
+        self.assertEqual(name, 'order.updated')
+        self.assertEqual(data['data']['ordercustomerid'], 1002)
+        _, name, data = self.next_event(chunks)
+        self.assertEqual(name, 'detail.created')
+        self.assertEqual(data['customerid'], 1002)
+
+        with self.test_app.app_context():
+            self.assertEqual(get_broadcaster().stats()['subscribers'], 1)
+        response.close()
+        with self.test_app.app_context():
+            self.assertEqual(get_broadcaster().stats()['subscribers'], 0)
+
+    def test_resume_with_last_event_id(self):
+        """Test that a reconnecting client gets the events it missed, filtered by customer"""
+        self.update(self.order_ids[0], 1001)  # no net change: no event
+        self.update(self.order_ids[0], 1005)
+        self.update(self.order_ids[1], 2005)
+        self.update(self.order_ids[0], 1006)
+
+        _, chunks = self.open_stream('/events?customer_id=1006', headers={'Last-Event-ID': '2'})
+        event_id, name, data = self.next_event(chunks)
+        self.assertEqual((event_id, name), ('5', 'order.updated'))
+        self.assertEqual(data['customerid'], 1006)
+
+    def test_backlog_limit_and_slow_subscriber_reset(self):
+        """Test that a cut-off backlog and a subscriber that falls behind both get a reset"""
+        self.test_app.config['SSE_BACKLOG_LIMIT'] = 1
+        for customer_id in (1, 2):
+            self.update(self.order_ids[0], customer_id)
+        _, chunks = self.open_stream('/events', headers={'Last-Event-ID': '0'})
+        self.assertEqual(self.next_event(chunks)[0], '1')
+        self.assertEqual(self.next_event(chunks)[:2], ('1', 'reset'))
+
+        self.test_app.config['SSE_BUFFER_SIZE'] = 2
+        self.test_app.extensions.pop('broadcaster')
+        with self.test_app.app_context():
+            broadcaster = get_broadcaster()
+            subscription = broadcaster.subscribe()
+            broadcaster.publish([{'seq': seq, 'customerid': 1, 'orderid': 1} for seq in range(3)])
+            self.assertTrue(subscription.overflowed)
+            self.assertEqual(broadcaster.stats(), {'subscribers': 0, 'published': 3, 'dropped': 1})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+import json
+from sqlalchemy import select, func
+from models import db, OrderHeader, OrderDetail, OutboxEvent
+from testing import make_test_app, close_test_app
+
+class UpsertTestCase(unittest.TestCase):
+    """Test case for one line per item and the order item upsert"""
+
+    def setUp(self):
+        """Set up a test app with one empty order"""
+        test_app = make_test_app()
+        self.test_app = test_app
+
+        self.app = test_app.test_client()
+        self.app_context = test_app.app_context()
+        self.app_context.push()
+
+        order = OrderHeader(ordercustomerid=1001)
+        db.session.add(order)
+        db.session.commit()
+        self.order_id = order.orderid
+        self.url = f'/orders/{self.order_id}/items'
+        db.session.remove()
+
+    def tearDown(self):
+        """Clean up after each test"""
+        self.app_context.pop()
+        close_test_app(self.test_app)
+
+    def lines(self):
+        return db.session.execute(select(func.count()).select_from(OrderDetail)).scalar()
+
+    def test_upsert_adds_to_existing_line(self):
+        """Test that posting the same item twice keeps one line with the summed quantity"""
+        response = self.app.post(self.url, json={'orderitemid': 101, 'quantity': 2, 'unitrate': 5.0})
+        self.assertEqual(response.status_code, 201)
+        line_id = json.loads(response.data)['data']['orderdetailid']
+
+        # Cache the order's details page so the update has to invalidate it
+        self.app.get(f'/orders/{self.order_id}/details')
+        response = self.app.post(self.url, json={'orderitemid': 101, 'quantity': 3, 'unitrate': 4.0})
+        self.assertEqual(response.status_code, 200)
+        line = json.loads(response.data)['data']
+        self.assertEqual((line['orderdetailid'], line['quantity'], line['rowtotal']), (line_id, 5.0, 20.0))
+        self.assertEqual(self.lines(), 1)
+        self.assertEqual(json.loads(self.app.get(f'/orders/{self.order_id}/details').data)[0]['quantity'], 5.0)
+
+        ops = db.session.scalars(select(OutboxEvent.op).where(OutboxEvent.entity == 'detail')
+                                 .order_by(OutboxEvent.seq)).all()
+        self.assertEqual(ops, ['created', 'updated'])
+
+    def test_upsert_replace_and_validation(self):
+        """Test replace mode, invalid bodies and a missing order"""
+        self.app.post(self.url, json={'orderitemid': 101, 'quantity': 2, 'unitrate': 5.0})
+        response = self.app.post(self.url, json={'orderitemid': 101, 'quantity': 7, 'unitrate': 5.0,
+                                                 'mode': 'replace'})
+        self.assertEqual(json.loads(response.data)['data']['rowtotal'], 35.0)
+
+        self.assertEqual(self.app.post(self.url, json={'orderitemid': 101}).status_code, 400)
+        self.assertEqual(self.app.post(self.url, json={'orderitemid': 101, 'quantity': 1, 'unitrate': 1,
+                                                       'mode': 'merge'}).status_code, 400)
+        self.assertEqual(self.app.post('/orders/999/items', json={'orderitemid': 1, 'quantity': 1,
+                                                                  'unitrate': 1}).status_code, 404)
+
+    def test_duplicate_line_is_a_conflict(self):
+        """Test that creating or moving a line onto an item already on the order returns 409"""
+        url = f'/orders/{self.order_id}/details'
+        self.assertEqual(self.app.post(url, json={'orderitemid': 101, 'quantity': 1, 'unitrate': 1}).status_code, 201)
+        self.assertEqual(self.app.post(url, json={'orderitemid': 101, 'quantity': 1, 'unitrate': 1}).status_code, 409)
+
+        response = self.app.post(url, json={'orderitemid': 102, 'quantity': 1, 'unitrate': 1})
+        line_id = json.loads(response.data)['data']['orderdetailid']
+        self.assertEqual(self.app.patch(f'/orderdetails/{line_id}', json={'orderitemid': 101}).status_code, 409)
+        self.assertEqual(self.app.put(f'/orderdetails/{line_id}', json={'orderitemid': 101}).status_code, 409)
+        self.assertEqual(self.lines(), 2)
+
+if __name__ == '__main__':
+    unittest.main()
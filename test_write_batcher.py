@@ -0,0 +1,137 @@
+import unittest
+import json
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from unittest import mock
+from models import db, OrderHeader
+from testing import make_test_app, close_test_app
+from write_batcher import get_write_batcher, run_write
+
+class WriteBatcherTestCase(unittest.TestCase):
+    """Test case for group-committing inserts"""
+
+    def setUp(self):
+        """Set up a test app on a file database with write batching on"""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        test_app = make_test_app(f'sqlite:///{self.tmpdir.name}/orders.db',
+                                 WRITE_BATCHING_ENABLED=True, WRITE_BATCH_MAX_WAIT=0.05)
+        self.test_app = test_app
+
+        with test_app.app_context():
+            order = OrderHeader(ordercustomerid=1001)
+            db.session.add(order)
+            db.session.commit()
+            self.order_id = order.orderid
+
+    def tearDown(self):
+        """Clean up after each test"""
+        close_test_app(self.test_app)
+        self.tmpdir.cleanup()
+
+    def test_concurrent_creates_share_commits(self):
+        """Test that concurrent creates are committed together and each gets its own row"""
+        responses = []
+
+        def create(customer_id):
+            client = self.test_app.test_client()
+            responses.append(client.post('/orders', data=json.dumps({'ordercustomerid': customer_id}),
+                                         content_type='application/json'))
+
+        threads = [threading.Thread(target=create, args=(2000 + i,)) for i in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+
+        self.assertEqual([r.status_code for r in responses], [201] * 16)
+        created = [json.loads(r.data)['data'] for r in responses]
+        self.assertEqual(len({order['orderid'] for order in created}), 16)
+        self.assertEqual(sorted(order['ordercustomerid'] for order in created),
+                         [2000 + i for i in range(16)])
+
+        with self.test_app.app_context():
+            self.assertEqual(db.session.query(OrderHeader).count(), 17)
+            stats = get_write_batcher().stats()
+        self.assertEqual(stats['writes'], 16)
+        self.assertLess(stats['batches'], 16)
+
+    def test_failed_write_does_not_fail_batch(self):
+        """Test that one failing insert is retried alone and the rest still commit"""
+        def insert(orderid):
+            def operation(session):
+                order = OrderHeader(orderid=orderid, ordercustomerid=3000)
+                session.add(order)
+                return lambda: order.orderid
+            return operation
+
+        with self.test_app.app_context():
+            batcher = get_write_batcher()
+            futures = [batcher.submit(insert(orderid))
+                       for orderid in (500, self.order_id, 501)]
+            self.assertEqual(futures[0].result(10), 500)
+            self.assertEqual(futures[2].result(10), 501)
+            with self.assertRaises(Exception):
+                futures[1].result(10)
+            self.assertEqual(batcher.stats()['retried_batches'], 1)
+
+            response = self.test_app.test_client().post(
+                f'/orders/{self.order_id}/details',
+                data=json.dumps({'orderitemid': 101, 'quantity': 2, 'unitrate': 5.0}),
+                content_type='application/json')
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(json.loads(response.data)['data']['rowtotal'], 10.0)
+
+    def test_timed_out_write_is_cancelled(self):
+        """Test that a write still queued when its request gives up never commits"""
+        self.test_app.config['WRITE_BATCH_MAX_SIZE'] = 1
+        self.test_app.config['WRITE_BATCH_TIMEOUT'] = 0.1
+        release = threading.Event()
+
+        def insert(customer_id, wait=None):
+            def operation(session):
+                if wait is not None:
+                    wait()
+                order = OrderHeader(ordercustomerid=customer_id)
+                session.add(order)
+                return lambda: order.orderid
+            return operation
+
+        with self.test_app.app_context():
+            blocker = get_write_batcher().submit(insert(4000, lambda: release.wait(5)))
+            with self.assertRaises(TimeoutError):
+                run_write(insert(4001))
+            release.set()
+            blocker.result(10)
+
+            # A write that has already started is waited for instead
+            self.assertIsNotNone(run_write(insert(4002, lambda: time.sleep(0.3))))
+            customers = {order.ordercustomerid for order in db.session.query(OrderHeader)}
+        self.assertEqual(customers, {1001, 4000, 4002})
+
+    def test_restarted_writer_keeps_queued_writes(self):
+        """Test that writes queued for a writer thread that died are run by its replacement"""
+        def insert(customer_id):
+            def operation(session):
+                order = OrderHeader(ordercustomerid=customer_id)
+                session.add(order)
+                return lambda: order.orderid
+            return operation
+
+        with self.test_app.app_context():
+            batcher = get_write_batcher()
+            run_write(insert(5000))
+            # Kill the writer with a malformed entry, leaving a write in its queue
+            with mock.patch.object(threading, 'excepthook', lambda args: None):
+                batcher._queue.put(None)
+                batcher._thread.join(5)
+            self.assertFalse(batcher._thread.is_alive())
+            queued = Future()
+            batcher._queue.put((insert(5001), queued))
+
+            self.assertIsNotNone(run_write(insert(5002)))
+            self.assertIsNotNone(queued.result(5))
+
+if __name__ == '__main__':
+    unittest.main()
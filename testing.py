@@ -0,0 +1,43 @@
+# Shared fixtures for the test modules
+# Each test case builds a fresh app around the models and the API blueprint
+# instead of importing app.py, so config changes and registered hooks don't
+# leak between test cases.
+
+from flask import Flask
+
+from models import db
+from routes import api_bp
+
+MEMORY = 'sqlite:///:memory:'
+
+
+def make_test_app(uri=MEMORY, prefix='', create=True, **config):
+    """
+    A fresh Flask app in testing mode on its own database
+    ---
+    Parameters:
+        uri: SQLAlchemy database URI (default: a private in-memory SQLite database)
+        prefix: URL prefix the API blueprint is mounted at; None leaves it off (default: '')
+        create: Create the tables (default: True)
+        config: Further config values, e.g. REQUEST_DEADLINE=0.2
+    Returns:
+        The app; release it with close_test_app()
+    """
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    app.config.update(config)
+    db.init_app(app)
+    if prefix is not None:
+        app.register_blueprint(api_bp, url_prefix=prefix)
+    if create:
+        with app.app_context():
+            db.create_all()
+    return app
+
+
+def close_test_app(app):
+    """Close an app from make_test_app()'s connections; an in-memory database goes with them"""
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
@@ -0,0 +1,356 @@
+# Partial updates issued as single UPDATE ... RETURNING statements, bulk updates
+# issued as one executemany UPDATE for many rows, and other set-based writes
+# (upserts, order clones)
+# The PATCH endpoints change rows without loading them into the session, so
+# what the session events do for ORM writes is done here explicitly: bump the
+# order's version, append the outbox event and evict the entity cache.
+
+import math
+from datetime import datetime
+
+from sqlalchemy import insert, update, select, literal, bindparam, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import OrderHeader, OrderDetail, utcnow
+from outbox import record_changes
+from entity_cache import evict_rows
+
+HEADER_RETURNING = (OrderHeader.orderid, OrderHeader.orderdate, OrderHeader.ordercustomerid)
+DETAIL_RETURNING = (OrderDetail.orderdetailid, OrderDetail.orderid, OrderDetail.orderitemid,
+                    OrderDetail.quantity, OrderDetail.unitrate, OrderDetail.rowtotal)
+
+# Items accepted by one bulk PATCH request
+BULK_LIMIT = 1000
+
+
+def order_changes(data):
+    """Validated header changes from a JSON body; raises ValueError with the message for the client"""
+    changes = {}
+    if 'ordercustomerid' in data:
+        try:
+            customer_id = int(data['ordercustomerid'])
+        except (ValueError, TypeError):
+            raise ValueError('Customer ID must be a valid integer')
+        if customer_id <= 0:
+            raise ValueError('Customer ID must be a positive integer')
+        changes['ordercustomerid'] = customer_id
+    if 'orderdate' in data:
+        try:
+            changes['orderdate'] = datetime.fromisoformat(data['orderdate'])
+        except (ValueError, TypeError):
+            raise ValueError('Invalid date format. Use ISO format (YYYY-MM-DDTHH:MM:SS)')
+    return changes
+
+
+def detail_changes(data):
+    """Validated detail changes from a JSON body; raises ValueError with the message for the client"""
+    changes = {}
+    if 'orderitemid' in data:
+        try:
+            item_id = int(data['orderitemid'])
+        except (ValueError, TypeError):
+            raise ValueError('Item ID must be a valid integer')
+        if item_id <= 0:
+            raise ValueError('Item ID must be a positive integer')
+        changes['orderitemid'] = item_id
+    if 'quantity' in data:
+        try:
+            quantity = float(data['quantity'])
+        except (ValueError, TypeError):
+            raise ValueError('Quantity must be a valid number')
+        if not math.isfinite(quantity):
+            raise ValueError('Quantity must be a finite number')
+        if quantity <= 0:
+            raise ValueError('Quantity must be positive')
+        changes['quantity'] = quantity
+    if 'unitrate' in data:
+        try:
+            unitrate = float(data['unitrate'])
+        except (ValueError, TypeError):
+            raise ValueError('Unit rate must be a valid number')
+        if not math.isfinite(unitrate):
+            raise ValueError('Unit rate must be a finite number')
+        if unitrate < 0:
+            raise ValueError('Unit rate cannot be negative')
+        changes['unitrate'] = unitrate
+    return changes
+
+
+def order_row(row):
+    """A RETURNING row of HEADER_RETURNING shaped like OrderHeader.to_dict()"""
+    return {'orderid': row.orderid, 'orderdate': row.orderdate.isoformat(), 'ordercustomerid': row.ordercustomerid}
+
+
+def detail_row(row):
+    """A RETURNING row of DETAIL_RETURNING shaped like OrderDetail.to_dict()"""
+    return {column.key: getattr(row, column.key) for column in DETAIL_RETURNING}
+
+
+def row_event(entity, data, customerid, op='updated'):
+    """Outbox values for a row created or changed outside the ORM"""
+    return {
+        'entity': entity,
+        'entityid': data['orderid'] if entity == 'order' else data['orderdetailid'],
+        'orderid': data['orderid'],
+        'customerid': customerid,
+        'op': op,
+        'data': data,
+        'created_at': utcnow(),
+    }
+
+
+def rowtotal_expression(changes):
+    """rowtotal = quantity * unitrate in SQL, using the new value of whichever is being changed"""
+    quantity = literal(changes['quantity'], OrderDetail.quantity.type) if 'quantity' in changes else OrderDetail.quantity
+    unitrate = literal(changes['unitrate'], OrderDetail.unitrate.type) if 'unitrate' in changes else OrderDetail.unitrate
+    return quantity * unitrate
+
+
+def bump_versions(session, orderids):
+    """Bump the version of the given orders; returns {orderid: customer id} for those that exist"""
+    rows = session.execute(
+        update(OrderHeader)
+        .where(OrderHeader.orderid.in_(orderids))
+        .values(version=OrderHeader.version + 1, updated_at=utcnow())
+        .returning(OrderHeader.orderid, OrderHeader.ordercustomerid)
+        .execution_options(synchronize_session=False))
+    evict_rows(session, OrderHeader, orderids)
+    return dict(rows.all())
+
+
+def patch_order(session, orderid, changes):
+    """
+    Apply header changes with one UPDATE ... RETURNING
+    ---
+    Returns:
+        The updated order as a dict, or None if it doesn't exist
+    """
+    row = session.execute(
+        update(OrderHeader)
+        .where(OrderHeader.orderid == orderid)
+        .values(**changes, version=OrderHeader.version + 1, updated_at=utcnow())
+        .returning(*HEADER_RETURNING)
+        .execution_options(synchronize_session=False)).first()
+    if row is None:
+        return None
+    order = order_row(row)
+    evict_rows(session, OrderHeader, [orderid])
+    record_changes(session, [row_event('order', order, order['ordercustomerid'])])
+    return order
+
+
+def patch_detail(session, orderdetailid, changes):
+    """
+    Apply detail changes with one UPDATE ... RETURNING, recomputing rowtotal in SQL
+    ---
+    Returns:
+        The updated detail as a dict, or None if it doesn't exist
+    """
+    values = dict(changes)
+    if 'quantity' in changes or 'unitrate' in changes:
+        values['rowtotal'] = rowtotal_expression(changes)
+    row = session.execute(
+        update(OrderDetail)
+        .where(OrderDetail.orderdetailid == orderdetailid)
+        .values(**values)
+        .returning(*DETAIL_RETURNING)
+        .execution_options(synchronize_session=False)).first()
+    if row is None:
+        return None
+    detail = detail_row(row)
+    customers = bump_versions(session, [detail['orderid']])
+    evict_rows(session, OrderDetail, [orderdetailid])
+    record_changes(session, [row_event('detail', detail, customers.get(detail['orderid']))])
+    return detail
+
+
+def parse_bulk_items(items, validate):
+    """
+    Validate the items of a bulk PATCH body
+    ---
+    Parameters:
+        items: List of {"id": ..., "changes": {...}}
+        validate: order_changes or detail_changes
+    Returns:
+        One (id, changes, error) per item in request order; error is None for valid items
+    Notes:
+        Only the first item for an id is applied; later ones are reported as invalid.
+    """
+    parsed = []
+    seen = set()
+    for item in items:
+        if not isinstance(item, dict) or not isinstance(item.get('changes'), dict):
+            parsed.append((item.get('id') if isinstance(item, dict) else None, None,
+                           'Each item needs an id and a changes object'))
+            continue
+        try:
+            rowid = int(item.get('id'))
+        except (ValueError, TypeError):
+            parsed.append((item.get('id'), None, 'id must be a valid integer'))
+            continue
+        if rowid in seen:
+            parsed.append((rowid, None, 'duplicate id'))
+            continue
+        seen.add(rowid)
+        try:
+            changes = validate(item['changes'])
+        except ValueError as e:
+            parsed.append((rowid, None, str(e)))
+            continue
+        parsed.append((rowid, changes, None if changes else 'No changes given'))
+    return parsed
+
+
+def _coalesced(column, name):
+    # The item's new value, or the current one when the item doesn't change this column
+    return func.coalesce(bindparam(name, type_=column.type), column)
+
+
+def bulk_patch_orders(session, items):
+    """
+    Apply header changes to many orders with one executemany UPDATE
+    ---
+    Parameters:
+        items: List of (orderid, changes) with validated changes
+    Returns:
+        ({orderid: updated order dict}, {orderid: previous customer id}) for the orders that exist
+    """
+    table = OrderHeader.__table__
+    previous = dict(session.execute(
+        select(OrderHeader.orderid, OrderHeader.ordercustomerid)
+        .where(OrderHeader.orderid.in_({orderid for orderid, _ in items}))).all())
+    params = [{'b_id': orderid, **{f'b_{field}': changes.get(field) for field in ('ordercustomerid', 'orderdate')}}
+              for orderid, changes in items if orderid in previous]
+    if not params:
+        return {}, previous
+    session.execute(
+        update(table)
+        .where(table.c.orderid == bindparam('b_id'))
+        .values(ordercustomerid=_coalesced(table.c.ordercustomerid, 'b_ordercustomerid'),
+                orderdate=_coalesced(table.c.orderdate, 'b_orderdate'),
+                version=table.c.version + 1,
+                updated_at=utcnow()),
+        params)
+    orders = {row.orderid: order_row(row) for row in session.execute(
+        select(*HEADER_RETURNING).where(OrderHeader.orderid.in_(previous)))}
+    evict_rows(session, OrderHeader, orders)
+    record_changes(session, [row_event('order', order, order['ordercustomerid']) for order in orders.values()])
+    return orders, previous
+
+
+def bulk_patch_details(session, items):
+    """
+    Apply changes to many order details with one executemany UPDATE, recomputing rowtotal in SQL
+    ---
+    Parameters:
+        items: List of (orderdetailid, changes) with validated changes
+    Returns:
+        {orderdetailid: updated detail dict} for the details that exist
+    """
+    table = OrderDetail.__table__
+    orderids = dict(session.execute(
+        select(OrderDetail.orderdetailid, OrderDetail.orderid)
+        .where(OrderDetail.orderdetailid.in_({detailid for detailid, _ in items}))).all())
+    params = [{'b_id': detailid, **{f'b_{field}': changes.get(field) for field in ('orderitemid', 'quantity', 'unitrate')}}
+              for detailid, changes in items if detailid in orderids]
+    if not params:
+        return {}
+    quantity = _coalesced(table.c.quantity, 'b_quantity')
+    unitrate = _coalesced(table.c.unitrate, 'b_unitrate')
+    session.execute(
+        update(table)
+        .where(table.c.orderdetailid == bindparam('b_id'))
+        .values(orderitemid=_coalesced(table.c.orderitemid, 'b_orderitemid'),
+                quantity=quantity,
+                unitrate=unitrate,
+                rowtotal=quantity * unitrate),
+        params)
+    customers = bump_versions(session, set(orderids.values()))
+    details = {row.orderdetailid: detail_row(row) for row in session.execute(
+        select(*DETAIL_RETURNING).where(OrderDetail.orderdetailid.in_(orderids)))}
+    evict_rows(session, OrderDetail, details)
+    record_changes(session, [row_event('detail', detail, customers.get(detail['orderid']))
+                             for detail in details.values()])
+    return details
+
+
+def upsert_detail(session, orderid, item_id, quantity, unitrate, replace=False):
+    """
+    Add an item to an order, or change the quantity of its existing line
+    ---
+    Relies on the unique (orderid, orderitemid) index: INSERT ... ON CONFLICT DO
+    NOTHING creates the line, and when it already exists an UPDATE adds to (or,
+    with ``replace``, sets) its quantity in SQL. The INSERT takes the write lock,
+    so nothing can change the line in between.
+    Parameters:
+        replace: Set the quantity instead of adding to it
+    Returns:
+        (detail dict, whether the line was created)
+    """
+    table = OrderDetail.__table__
+    row = session.execute(
+        sqlite_insert(table)
+        .values(orderid=orderid, orderitemid=item_id, quantity=quantity,
+                unitrate=unitrate, rowtotal=quantity * unitrate)
+        .on_conflict_do_nothing(index_elements=['orderid', 'orderitemid'])
+        .returning(*DETAIL_RETURNING)).first()
+    created = row is not None
+    if not created:
+        new_quantity = literal(quantity, table.c.quantity.type)
+        if not replace:
+            new_quantity = table.c.quantity + new_quantity
+        row = session.execute(
+            update(table)
+            .where(table.c.orderid == orderid, table.c.orderitemid == item_id)
+            .values(quantity=new_quantity, unitrate=unitrate,
+                    rowtotal=new_quantity * literal(unitrate, table.c.unitrate.type))
+            .returning(*DETAIL_RETURNING)).first()
+    detail = detail_row(row)
+    customers = bump_versions(session, [orderid])
+    evict_rows(session, OrderDetail, [detail['orderdetailid']])
+    record_changes(session, [row_event('detail', detail, customers.get(orderid),
+                                       'created' if created else 'updated')])
+    return detail, created
+
+
+def clone_order(session, orderid, customer_id=None, orderdate=None):
+    """
+    Copy an order and all its lines with two INSERT ... SELECT statements
+    ---
+    Parameters:
+        customer_id: Customer of the new order (default: the original's)
+        orderdate: Date of the new order (default: now)
+    Returns:
+        The new order as a dict with its lines under 'details', or None if the original doesn't exist
+    """
+    headers = OrderHeader.__table__
+    now = utcnow()
+    source = select(
+        literal(orderdate or now, headers.c.orderdate.type),
+        literal(customer_id, headers.c.ordercustomerid.type) if customer_id else headers.c.ordercustomerid,
+        literal(now, headers.c.updated_at.type),
+    ).where(headers.c.orderid == orderid)
+    row = session.execute(
+        insert(headers)
+        .from_select(['orderdate', 'ordercustomerid', 'updated_at'], source)
+        .returning(*HEADER_RETURNING)).first()
+    if row is None:
+        return None
+    order = order_row(row)
+    events = [row_event('order', dict(order), order['ordercustomerid'], 'created')]
+
+    details = OrderDetail.__table__
+    lines = (select(literal(order['orderid'], details.c.orderid.type), details.c.orderitemid,
+                    details.c.quantity, details.c.unitrate, details.c.rowtotal)
+             .where(details.c.orderid == orderid)
+             .order_by(details.c.orderdetailid))
+    copied = session.execute(
+        insert(details)
+        .from_select(['orderid', 'orderitemid', 'quantity', 'unitrate', 'rowtotal'], lines)
+        .returning(*DETAIL_RETURNING)).all()
+    # RETURNING order isn't guaranteed to follow the SELECT's
+    order['details'] = sorted((detail_row(line) for line in copied), key=lambda detail: detail['orderdetailid'])
+
+    events.extend(row_event('detail', detail, order['ordercustomerid'], 'created') for detail in order['details'])
+    record_changes(session, events)
+    return order
@@ -0,0 +1,176 @@
+# Group commit for inserts
+# SQLite serializes writers and each commit costs an fsync, so committing every
+# create request on its own caps write throughput. With WRITE_BATCHING_ENABLED,
+# insert requests are queued to one writer thread that commits them in
+# micro-batches; each request still gets back its own result or error.
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from flask import current_app
+
+from models import db
+from cache import held_invalidations
+
+
+class WriteBatcher:
+    """
+    Dedicated writer thread committing queued operations together
+    ---
+    An operation is a callable taking the session, adding its objects and
+    returning a callable that builds the result once the batch is committed.
+    If the batch commit fails, each operation is retried in its own
+    transaction so one bad request doesn't fail the others.
+    """
+
+    def __init__(self, app, max_batch=64, max_wait=0.005):
+        self.app = app
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.batches = 0
+        self.writes = 0
+        self.retried_batches = 0
+        self.largest_batch = 0
+
+    def submit(self, operation):
+        """Queue an operation and return a Future for its result"""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((operation, future))
+        return future
+
+    def _ensure_started(self):
+        # Threads don't survive a fork, so each worker process starts its own
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                if self._pid != os.getpid():
+                    # The parent's queue and its waiters stay behind; a writer that died
+                    # in this process hands its queued writes to the new one
+                    self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='write-batcher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            batch = [(operation, future) for operation, future in batch
+                     if future.set_running_or_notify_cancel()]
+            if batch:
+                with self.app.app_context():
+                    try:
+                        self._commit(batch)
+                    except Exception as e:
+                        # Never leave a request waiting on a batch that blew up
+                        for _, future in batch:
+                            if not future.done():
+                                future.set_exception(e)
+                    finally:
+                        db.session.remove()
+
+    def _commit(self, batch):
+        pending = []
+        for operation, future in batch:
+            try:
+                pending.append((future, operation(db.session)))
+            except Exception as e:
+                future.set_exception(e)
+
+        try:
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            self.retried_batches += 1
+            for operation, future in batch:
+                if not future.done():
+                    self._commit_one(operation, future)
+            return
+
+        self.batches += 1
+        self.writes += len(pending)
+        self.largest_batch = max(self.largest_batch, len(pending))
+        for future, finish in pending:
+            try:
+                future.set_result(finish())
+            except Exception as e:
+                future.set_exception(e)
+
+    def _commit_one(self, operation, future):
+        try:
+            finish = operation(db.session)
+            db.session.commit()
+            future.set_result(finish())
+        except Exception as e:
+            db.session.rollback()
+            future.set_exception(e)
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'writes': self.writes,
+            'avg_batch': round(self.writes / self.batches, 2) if self.batches else 0.0,
+            'largest_batch': self.largest_batch,
+            'retried_batches': self.retried_batches,
+            'queued': self._queue.qsize(),
+        }
+
+
+def get_write_batcher(app=None):
+    """The app's write batcher, created on first use"""
+    app = app or current_app._get_current_object()
+    batcher = app.extensions.get('write_batcher')
+    if batcher is None:
+        batcher = app.extensions.setdefault('write_batcher', WriteBatcher(
+            app,
+            max_batch=app.config.get('WRITE_BATCH_MAX_SIZE', 64),
+            max_wait=app.config.get('WRITE_BATCH_MAX_WAIT', 0.005)))
+    return batcher
+
+
+def run_write(operation):
+    """
+    Run an insert operation and commit it, batched with others when enabled
+    ---
+    Parameters:
+        operation: Callable taking the session and returning a callable for the result
+    Returns:
+        The operation's result once its transaction has committed
+    Config:
+        WRITE_BATCHING_ENABLED: Send writes through the writer thread (default: False)
+        WRITE_BATCH_MAX_SIZE: Most operations per commit (default: 64)
+        WRITE_BATCH_MAX_WAIT: Seconds the writer waits to fill a batch (default: 0.005)
+        WRITE_BATCH_TIMEOUT: Seconds a request waits for its write to start; one
+            still queued after that is cancelled and TimeoutError raised (default: 10)
+    """
+    app = current_app._get_current_object()
+    # Inside an atomic batch the write has to join the batch's transaction
+    if not app.config.get('WRITE_BATCHING_ENABLED', False) or held_invalidations() is not None:
+        finish = operation(db.session)
+        db.session.commit()
+        return finish()
+
+    future = get_write_batcher(app).submit(operation)
+    try:
+        return future.result(timeout=app.config.get('WRITE_BATCH_TIMEOUT', 10))
+    except TimeoutError:
+        # Still queued: drop it, so a client retrying the error can't get a duplicate
+        if future.cancel():
+            raise
+        # Already being committed: its outcome is coming
+        return future.result()